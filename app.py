@@ -31,6 +31,48 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Answer per-request identity checks from a signed session snapshot instead of the database
+app.config["SESSION_USER_SNAPSHOT"] = os.environ.get("SESSION_USER_SNAPSHOT", "false").lower() == "true"
+app.config["SESSION_USER_SNAPSHOT_TTL"] = int(os.environ.get("SESSION_USER_SNAPSHOT_TTL", "300"))
+# How often each worker re-reads snapshot revocations (role, team or status changes, deletions)
+app.config["SESSION_REVOCATION_POLL"] = float(os.environ.get("SESSION_REVOCATION_POLL", "5"))
+
+# Live board updates over server-sent events. Each open stream holds a worker thread for up to
+# LIVE_EVENTS_MAX_STREAM seconds, so enable only with threaded or gevent gunicorn workers;
+# when off, pages fall back to polling
+app.config["LIVE_EVENTS_ENABLED"] = os.environ.get("LIVE_EVENTS_ENABLED", "false").lower() == "true"
+# 'memory' for a single process, 'postgres' to fan out across workers via LISTEN/NOTIFY
+app.config["LIVE_EVENTS_BACKEND"] = os.environ.get("LIVE_EVENTS_BACKEND", "memory")
+app.config["LIVE_EVENTS_KEEPALIVE"] = int(os.environ.get("LIVE_EVENTS_KEEPALIVE", "15"))
+app.config["LIVE_EVENTS_MAX_STREAM"] = int(os.environ.get("LIVE_EVENTS_MAX_STREAM", "300"))
+
+# Attachment files, stored content-addressed as <root>/ab/cd/<sha256>
+app.config["ATTACHMENT_STORAGE_ROOT"] = os.environ.get("ATTACHMENT_STORAGE_ROOT", "uploads")
+# Attachment downloads: "" streams from the worker; "x-accel" (nginx) or "x-sendfile" (Apache, lighttpd)
+# hands the transfer to the fronting proxy once the permission check has passed
+app.config["ATTACHMENT_SENDFILE"] = os.environ.get("ATTACHMENT_SENDFILE", "")
+# Internal nginx location aliased to ATTACHMENT_STORAGE_ROOT, for x-accel
+app.config["ATTACHMENT_ACCEL_PREFIX"] = os.environ.get("ATTACHMENT_ACCEL_PREFIX", "/protected-attachments/")
+# Chunked, resumable uploads for attachments above the single-request limit
+app.config["MAX_CHUNKED_UPLOAD_SIZE"] = int(os.environ.get("MAX_CHUNKED_UPLOAD_SIZE", str(1024 * 1024 * 1024)))
+app.config["UPLOAD_CHUNK_SIZE"] = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+app.config["UPLOAD_SESSION_TTL_HOURS"] = int(os.environ.get("UPLOAD_SESSION_TTL_HOURS", "24"))
+# Background sweep for orphaned attachments and stale uploads every N hours (0 = only via gc_attachments.py)
+app.config["ATTACHMENT_GC_INTERVAL_HOURS"] = float(os.environ.get("ATTACHMENT_GC_INTERVAL_HOURS", "0"))
+# Files younger than this are never collected, so in-flight uploads are safe
+app.config["ATTACHMENT_GC_GRACE_HOURS"] = float(os.environ.get("ATTACHMENT_GC_GRACE_HOURS", "1"))
+# Transactions recording at least this many task history entries hand them to an outbox drained
+# in the background every TASK_HISTORY_OUTBOX_INTERVAL seconds (0 = always write history inline)
+app.config["TASK_HISTORY_OUTBOX_THRESHOLD"] = int(os.environ.get("TASK_HISTORY_OUTBOX_THRESHOLD", "0"))
+app.config["TASK_HISTORY_OUTBOX_INTERVAL"] = float(os.environ.get("TASK_HISTORY_OUTBOX_INTERVAL", "5"))
+# Fraction of requests whose SQL is profiled into a Server-Timing header and a log line (0 = off, 1 = all)
+app.config["SQL_PROFILER_SAMPLE_RATE"] = float(os.environ.get("SQL_PROFILER_SAMPLE_RATE", "0"))
+app.config["SQL_PROFILER_SLOWEST"] = int(os.environ.get("SQL_PROFILER_SLOWEST", "5"))
+# A statement shape repeated this many times in one request is logged as a likely N+1
+app.config["SQL_PROFILER_REPEAT_THRESHOLD"] = int(os.environ.get("SQL_PROFILER_REPEAT_THRESHOLD", "5"))
+# Statements at least this slow are aggregated into slow_queries with their EXPLAIN plan (0 = off)
+app.config["SLOW_QUERY_THRESHOLD_MS"] = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "0"))
+
 # Initialize the app with the extension
 db.init_app(app)
 
@@ -38,11 +80,41 @@ with app.app_context():
     # Import models after db initialization
     from models import User, Task, Team
     
+    # A database without tables is built from the models and needs no migrations
+    from sqlalchemy import inspect
+    fresh_database = not inspect(db.engine).has_table('tasks')
+    
     # Create all tables
     db.create_all()
+    
+    from schema_migrations import pending_migrations, stamp_migrations
+    if fresh_database:
+        stamp_migrations()
+    elif pending_migrations():
+        logging.warning("Database schema has pending migrations; run migrate.py")
+    
+    # Search uses whichever index structures migrate.py has created
+    from search_index import detect_search_backend
+    detect_search_backend()
 
 # Import routes after app creation to avoid circular imports
 from routes import *
 
+if app.config["ATTACHMENT_GC_INTERVAL_HOURS"] > 0:
+    from attachment_gc import start_periodic_gc
+    start_periodic_gc(app.config["ATTACHMENT_GC_INTERVAL_HOURS"], app.config["ATTACHMENT_GC_GRACE_HOURS"])
+
+if app.config["TASK_HISTORY_OUTBOX_THRESHOLD"] > 0:
+    from task_history import start_history_outbox_worker
+    start_history_outbox_worker(app.config["TASK_HISTORY_OUTBOX_INTERVAL"])
+
+if app.config["SQL_PROFILER_SAMPLE_RATE"] > 0:
+    from sql_profiler import init_sql_profiler
+    init_sql_profiler(app)
+
+if app.config["SLOW_QUERY_THRESHOLD_MS"] > 0:
+    from slow_query_log import init_slow_query_log
+    init_slow_query_log(app)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
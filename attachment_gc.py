@@ -0,0 +1,228 @@
+"""
+Garbage collection for attachment rows, blobs and stored files.
+
+Bulk deletes that bypass the ORM (delete_team removes tasks with a query
+delete) leave task_attachments rows pointing at tasks that no longer exist, and
+a file removal that fails after its row was deleted leaves the file behind. The
+sweep fixes both, in this order:
+
+1. attachment rows whose task is gone, with their blob references released;
+2. attachment_blobs rows no attachment refers to;
+3. files in the store that no attachment of an existing task refers to, found by
+   diffing one walk of the store against the set of referenced keys;
+4. stale chunked-upload sessions and temp files (chunked_upload.cleanup_stale_uploads).
+
+Everything is deleted in batches with a commit per batch. Files younger than the
+grace period are left alone, so uploads that have placed their file but not yet
+committed the row are safe. Each batch of files is removed under the store's
+exclusive lock, after checking again that nothing refers to them and that no
+upload has touched them since the walk (see LocalContentStore._place).
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import exists
+
+from app import app, db
+from models import AttachmentBlob, Task, TaskAttachment
+from attachment_storage import TEMP_DIR, get_storage
+from chunked_upload import cleanup_stale_uploads
+
+GC_BATCH_SIZE = 1000
+GC_LOCK_FILE = '.gc.lock'
+
+
+@contextmanager
+def _exclusive_sweep() -> Iterator[bool]:
+    """True if this process got the sweep lock; one sweep per host at a time"""
+    lock = open(os.path.join(get_storage().root, GC_LOCK_FILE), 'a')
+    try:
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        lock.close()
+
+
+def _release_references(hashes: List[str]) -> int:
+    """Drop one blob reference per entry in hashes; returns the number of blob rows deleted"""
+    by_count = defaultdict(list)
+    for sha256, count in Counter(hashes).items():
+        by_count[count].append(sha256)
+    # One UPDATE per distinct reference count, usually just count 1
+    for count, sha256s in by_count.items():
+        AttachmentBlob.query.filter(AttachmentBlob.sha256.in_(sha256s)).update(
+            {AttachmentBlob.ref_count: AttachmentBlob.ref_count - count}, synchronize_session=False)
+    return AttachmentBlob.query.filter(
+        AttachmentBlob.sha256.in_(set(hashes)), AttachmentBlob.ref_count <= 0
+    ).delete(synchronize_session=False)
+
+
+def _orphaned_attachments(batch_size: int, dry_run: bool) -> Tuple[int, int]:
+    """Delete attachment rows of deleted tasks; returns (attachments, blobs) removed"""
+    query = db.session.query(TaskAttachment.id, TaskAttachment.content_hash).outerjoin(
+        Task, TaskAttachment.task_id == Task.id
+    ).filter(Task.id.is_(None))
+    if dry_run:
+        return query.count(), 0
+
+    attachments = blobs = 0
+    while True:
+        batch = query.order_by(TaskAttachment.id).limit(batch_size).all()
+        if not batch:
+            return attachments, blobs
+        TaskAttachment.query.filter(TaskAttachment.id.in_([row.id for row in batch])).delete(
+            synchronize_session=False)
+        hashes = [row.content_hash for row in batch if row.content_hash]
+        if hashes:
+            blobs += _release_references(hashes)
+        db.session.commit()
+        attachments += len(batch)
+
+
+def _unreferenced_blobs(cutoff: datetime, batch_size: int, dry_run: bool) -> int:
+    """Delete blob rows with no attachment left; returns how many"""
+    query = db.session.query(AttachmentBlob.sha256).filter(
+        ~exists().where(TaskAttachment.content_hash == AttachmentBlob.sha256),
+        AttachmentBlob.created_at < cutoff
+    )
+    if dry_run:
+        return query.count()
+
+    removed = 0
+    while True:
+        batch = [row.sha256 for row in query.limit(batch_size)]
+        if not batch:
+            return removed
+        removed += AttachmentBlob.query.filter(
+            AttachmentBlob.sha256.in_(batch),
+            ~exists().where(TaskAttachment.content_hash == AttachmentBlob.sha256)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def _stored_files(root: str) -> Iterator[Tuple[str, str, os.stat_result]]:
+    """(key, path, stat) for every file in the store, leaving out temp files"""
+    for directory, subdirectories, files in os.walk(root):
+        if directory == root:
+            subdirectories[:] = [name for name in subdirectories if name != TEMP_DIR]
+        for name in files:
+            if name.startswith('.'):
+                continue
+            path = os.path.join(directory, name)
+            yield os.path.relpath(path, root).replace(os.sep, '/'), path, os.stat(path)
+
+
+def _remove_empty_parents(path: str, root: str):
+    directory = os.path.dirname(path)
+    while directory != root:
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+def _delete_file_batch(batch: List[Tuple[str, str, int]], cutoff_timestamp: float) -> Tuple[int, int]:
+    """Remove files still unreferenced and older than the cutoff now; returns (files, bytes)"""
+    storage = get_storage()
+    keys = [key for key, _, _ in batch]
+    files = reclaimed = 0
+    # Uploads placing a file wait here, and any file they touched before is younger than the cutoff
+    with storage.locked(exclusive=True):
+        # Anything that gained a reference since the store was diffed stays
+        referenced = {row.filename for row in db.session.query(TaskAttachment.filename).filter(
+            TaskAttachment.filename.in_(keys))}
+        for key, path, size in batch:
+            if key in referenced:
+                continue
+            try:
+                if os.stat(path).st_mtime >= cutoff_timestamp:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logging.warning(f"Could not remove orphaned attachment file {key}: {e}")
+                continue
+            _remove_empty_parents(path, storage.root)
+            files += 1
+            reclaimed += size
+    return files, reclaimed
+
+
+def _orphaned_files(cutoff: datetime, batch_size: int, dry_run: bool) -> Tuple[int, int]:
+    """Delete stored files no attachment of a live task refers to; returns (files, bytes)"""
+    referenced = {row.filename for row in db.session.query(TaskAttachment.filename).join(
+        Task, TaskAttachment.task_id == Task.id
+    ).yield_per(GC_BATCH_SIZE)}
+    cutoff_timestamp = cutoff.timestamp()
+
+    files = reclaimed = 0
+    batch = []
+    for key, path, stat in _stored_files(get_storage().root):
+        if key in referenced or stat.st_mtime >= cutoff_timestamp:
+            continue
+        if dry_run:
+            files += 1
+            reclaimed += stat.st_size
+            continue
+        batch.append((key, path, stat.st_size))
+        if len(batch) >= batch_size:
+            removed = _delete_file_batch(batch, cutoff_timestamp)
+            files, reclaimed = files + removed[0], reclaimed + removed[1]
+            batch = []
+    if batch:
+        removed = _delete_file_batch(batch, cutoff_timestamp)
+        files, reclaimed = files + removed[0], reclaimed + removed[1]
+    return files, reclaimed
+
+
+def collect_garbage(grace: timedelta = timedelta(hours=1), batch_size: int = GC_BATCH_SIZE,
+                    dry_run: bool = False) -> Optional[Dict[str, int]]:
+    """Run one sweep and return what it removed, or None if another sweep holds the lock"""
+    with _exclusive_sweep() as acquired:
+        if not acquired:
+            return None
+
+        cutoff = datetime.utcnow() - grace
+        result = {}
+        result['attachments'], result['blobs'] = _orphaned_attachments(batch_size, dry_run)
+        result['blobs'] += _unreferenced_blobs(cutoff, batch_size, dry_run)
+        result['files'], result['bytes'] = _orphaned_files(cutoff, batch_size, dry_run)
+
+        result['upload_sessions'] = 0
+        if not dry_run:
+            uploads = cleanup_stale_uploads(timedelta(hours=app.config['UPLOAD_SESSION_TTL_HOURS']), batch_size)
+            result['upload_sessions'] = uploads['sessions']
+            result['files'] += uploads['files']
+            result['bytes'] += uploads['bytes']
+        return result
+
+
+def _sweep_periodically(interval: float, grace: timedelta):
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                result = collect_garbage(grace)
+                if result:
+                    logging.info(f"Attachment GC: {result}")
+        except Exception as e:
+            logging.warning(f"Attachment GC sweep failed: {e}")
+
+
+def start_periodic_gc(interval_hours: float, grace_hours: float = 1):
+    """Sweep every interval_hours in a background thread of this process"""
+    threading.Thread(target=_sweep_periodically, args=(interval_hours * 3600, timedelta(hours=grace_hours)),
+                     name='attachment-gc', daemon=True).start()
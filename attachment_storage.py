@@ -0,0 +1,210 @@
+"""
+Content-addressed storage for task attachments.
+
+Uploads are copied from the request stream in chunks into a temporary file under
+the storage root. They are hashed (SHA-256) and size-checked while streaming,
+then moved to ab/cd/<sha256>, so identical content is stored once however many
+tasks it is attached to. attachment_blobs counts the attachments that reference
+each blob. Files are never removed inline, because a concurrent upload of the
+same content may be reusing one; attachment_gc removes files nothing refers to
+once they are older than its grace period. Placing a file takes a shared lock on
+the store and refreshes its mtime; the collector removes files under the exclusive
+lock and rechecks their age, so a blob being reused is never removed under it.
+
+Attachment keys are paths relative to the root, so files uploaded before this
+layout (flat uuid.ext names) still resolve until migrate_attachments.py moves them.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import BinaryIO, NamedTuple, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from models import AttachmentBlob
+
+CHUNK_SIZE = 1024 * 1024
+TEMP_DIR = 'tmp'
+STORE_LOCK_FILE = '.store.lock'
+
+
+class FileTooLarge(Exception):
+    """The streamed content went over the size limit"""
+
+
+class StoredFile(NamedTuple):
+    key: str
+    sha256: str
+    size: int
+    created: bool  # False if the same content was already stored
+
+
+class AttachmentStorage(ABC):
+    """Interface for attachment storage backends; keys are '/'-separated relative paths"""
+
+    @abstractmethod
+    def save(self, stream: BinaryIO, max_size: Optional[int] = None) -> StoredFile:
+        """Store a stream, raising FileTooLarge past max_size bytes"""
+
+    @abstractmethod
+    def adopt(self, temp_path: str) -> StoredFile:
+        """Store a file already written under the storage's temporary directory"""
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Open a stored file for reading"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether a file is stored under key"""
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Remove a stored file; False if there was none"""
+
+
+class LocalContentStore(AttachmentStorage):
+    """Blobs on the local filesystem in a sharded ab/cd/<sha256> layout"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    @staticmethod
+    def key_for(sha256: str) -> str:
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, *key.split('/')))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Storage key outside the storage root: {key}")
+        return path
+
+    def temp_dir(self) -> str:
+        """Directory for files being written, on the same filesystem as the blobs"""
+        path = os.path.join(self.root, TEMP_DIR)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @contextmanager
+    def locked(self, exclusive: bool = False):
+        """Store-wide lock: shared while placing files, exclusive while the garbage collector removes them"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, STORE_LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _place(self, temp_path: str, sha256: str, size: int) -> StoredFile:
+        key = self.key_for(sha256)
+        path = self.path(key)
+        with self.locked():
+            # Touching the file restarts the garbage collector's grace period while the new
+            # reference is committed; a file it removed just before is written again
+            try:
+                os.utime(path)
+                created = False
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+                os.utime(path)
+                created = True
+        if not created:
+            os.remove(temp_path)
+        return StoredFile(key, sha256, size, created)
+
+    def save(self, stream: BinaryIO, max_size: Optional[int] = None) -> StoredFile:
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_dir(), suffix='.part')
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise FileTooLarge(f"File exceeds {max_size} bytes")
+                    digest.update(chunk)
+                    output.write(chunk)
+
+            return self._place(temp_path, digest.hexdigest(), size)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def adopt(self, temp_path: str) -> StoredFile:
+        """Hash a finished file from temp_dir() and move it into place without copying"""
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_path, 'rb') as source:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                digest.update(chunk)
+        return self._place(temp_path, digest.hexdigest(), size)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path(key), 'rb')
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> LocalContentStore:
+    """Attachment store rooted at ATTACHMENT_STORAGE_ROOT"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = LocalContentStore(app.config.get('ATTACHMENT_STORAGE_ROOT', 'uploads'))
+        return _storage
+
+
+def add_blob_reference(stored: StoredFile):
+    """Count one more attachment using the blob, creating its row on first use"""
+    increment = {AttachmentBlob.ref_count: AttachmentBlob.ref_count + 1}
+    blob = AttachmentBlob.query.filter_by(sha256=stored.sha256)
+    if blob.update(increment, synchronize_session=False):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(AttachmentBlob(sha256=stored.sha256, size=stored.size, ref_count=1,
+                                          created_at=datetime.utcnow()))
+    except IntegrityError:
+        # Another upload of the same content created the row first
+        blob.update(increment, synchronize_session=False)
+
+
+def release_blob_reference(sha256: str) -> bool:
+    """Drop one reference; True if none are left and the blob row was deleted"""
+    blob = AttachmentBlob.query.filter_by(sha256=sha256)
+    blob.update({AttachmentBlob.ref_count: AttachmentBlob.ref_count - 1}, synchronize_session=False)
+    return bool(blob.filter(AttachmentBlob.ref_count <= 0).delete(synchronize_session=False))
+
+
+def delete_stored_file(key: str):
+    """Remove a stored file that is not content-addressed (legacy layouts only)"""
+    try:
+        get_storage().delete(key)
+    except OSError as e:
+        logging.warning(f"Could not remove attachment file {key}: {e}")
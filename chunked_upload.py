@@ -0,0 +1,193 @@
+"""
+Resumable chunked uploads for large attachments.
+
+A client starts an upload session with the file's name and size, PUTs the content
+in chunks, each at the offset the server last acknowledged, then finalizes. Chunks
+are appended to a part file in the attachment store's temp directory straight from
+the request stream, so nothing is buffered in memory. Appends take an exclusive
+lock on the part file and commit the new offset before releasing it. A retried or
+interrupted chunk is therefore written over from the acknowledged offset, and a
+client that lost its place asks for the session and continues from there.
+
+Finalizing hashes the part file, moves it into the content-addressed store and
+creates the TaskAttachment in the same transaction that removes the session. Once
+the part file has been moved the session cannot be resumed, so if that transaction
+fails the session is ended as well and the client starts a new upload.
+Sessions that stop receiving chunks are removed by cleanup_uploads.py.
+"""
+import fcntl
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict
+
+from app import db
+from models import TaskAttachment, UploadSession
+from attachment_storage import CHUNK_SIZE, FileTooLarge, add_blob_reference, get_storage
+
+PART_SUFFIX = '.upload'
+
+
+class UploadConflict(Exception):
+    """The request does not match the session state; offset is where the client should resume"""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+def part_path(upload_id: str) -> str:
+    return os.path.join(get_storage().temp_dir(), f"{upload_id}{PART_SUFFIX}")
+
+
+@contextmanager
+def _locked_part(upload: UploadSession):
+    """Open the part file with an exclusive lock, held across all workers on this host"""
+    try:
+        part = open(part_path(upload.id), 'r+b')
+    except FileNotFoundError:
+        raise UploadConflict('Upload data is no longer available; start a new upload', 0)
+    try:
+        fcntl.flock(part.fileno(), fcntl.LOCK_EX)
+        # Another request may have moved the session on while this one waited for the lock
+        db.session.refresh(upload)
+        yield part
+    finally:
+        part.close()
+
+
+def start_upload(task_id: int, user_id: int, filename: str, total_size: int, file_type: str = None) -> UploadSession:
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        task_id=task_id,
+        user_id=user_id,
+        original_filename=filename,
+        file_type=file_type,
+        total_size=total_size,
+        received=0
+    )
+    open(part_path(upload.id), 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def append_chunk(upload: UploadSession, offset: int, stream: BinaryIO) -> int:
+    """Write a chunk at offset and acknowledge it; returns the new offset"""
+    with _locked_part(upload) as part:
+        if offset != upload.received:
+            raise UploadConflict(f'Expected offset {upload.received}', upload.received)
+
+        # Drop anything written after the last acknowledged offset by an interrupted request
+        part.truncate(offset)
+        part.seek(offset)
+        position = offset
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            position += len(chunk)
+            if position > upload.total_size:
+                part.truncate(offset)
+                raise FileTooLarge(f'Upload is larger than the declared {upload.total_size} bytes')
+            part.write(chunk)
+        part.flush()
+        os.fsync(part.fileno())
+
+        upload.received = position
+        upload.updated_at = datetime.utcnow()
+        db.session.commit()
+        return position
+
+
+def finalize_upload(upload: UploadSession) -> TaskAttachment:
+    """Turn a complete upload into a TaskAttachment and end the session"""
+    with _locked_part(upload) as part:
+        if upload.received != upload.total_size:
+            raise UploadConflict(f'Upload incomplete: {upload.received} of {upload.total_size} bytes',
+                                 upload.received)
+        stored = get_storage().adopt(part.name)
+
+    upload_id = upload.id
+    try:
+        add_blob_reference(stored)
+        attachment = TaskAttachment(
+            task_id=upload.task_id,
+            filename=stored.key,
+            original_filename=upload.original_filename,
+            file_size=stored.size,
+            file_type=upload.file_type,
+            uploaded_by=upload.user_id,
+            content_hash=stored.sha256
+        )
+        db.session.add(attachment)
+        db.session.delete(upload)
+        db.session.commit()
+    except Exception:
+        # The stored file may already be shared by a concurrent upload; attachment_gc removes it if not
+        db.session.rollback()
+        _end_session(upload_id)
+        raise
+    return attachment
+
+
+def _end_session(upload_id: str):
+    """Remove a session whose part file is gone, so it reads as not found rather than resumable"""
+    try:
+        UploadSession.query.filter_by(id=upload_id).delete()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.warning(f"Could not end upload session {upload_id}: {e}")
+
+
+def abort_upload(upload: UploadSession):
+    try:
+        os.remove(part_path(upload.id))
+    except FileNotFoundError:
+        pass
+    db.session.delete(upload)
+    db.session.commit()
+
+
+def cleanup_stale_uploads(max_age: timedelta, batch_size: int = 500) -> Dict[str, int]:
+    """Remove sessions idle for longer than max_age, and part files nobody owns"""
+    cutoff = datetime.utcnow() - max_age
+    temp_dir = get_storage().temp_dir()
+    sessions = files = reclaimed = 0
+
+    while True:
+        stale_ids = [row.id for row in db.session.query(UploadSession.id).filter(
+            UploadSession.updated_at < cutoff
+        ).limit(batch_size)]
+        if not stale_ids:
+            break
+        for upload_id in stale_ids:
+            path = part_path(upload_id)
+            if os.path.exists(path):
+                reclaimed += os.path.getsize(path)
+                os.remove(path)
+                files += 1
+        UploadSession.query.filter(UploadSession.id.in_(stale_ids)).delete(synchronize_session=False)
+        db.session.commit()
+        sessions += len(stale_ids)
+
+    # Part files left by crashed requests: no live session, or an interrupted single-request upload
+    live_ids = {row.id for row in db.session.query(UploadSession.id)}
+    cutoff_timestamp = cutoff.timestamp()
+    with os.scandir(temp_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            upload_id = entry.name[:-len(PART_SUFFIX)] if entry.name.endswith(PART_SUFFIX) else None
+            if upload_id in live_ids:
+                continue
+            stat = entry.stat()
+            if stat.st_mtime < cutoff_timestamp:
+                reclaimed += stat.st_size
+                os.remove(entry.path)
+                files += 1
+
+    return {'sessions': sessions, 'files': files, 'bytes': reclaimed}
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Remove chunked uploads that stopped receiving data, and their part files
+"""
+
+import argparse
+from datetime import timedelta
+
+from app import app
+from chunked_upload import cleanup_stale_uploads
+
+def cleanup_uploads(max_age_hours=None):
+    with app.app_context():
+        hours = max_age_hours or app.config['UPLOAD_SESSION_TTL_HOURS']
+        result = cleanup_stale_uploads(timedelta(hours=hours))
+        print(f"Removed {result['sessions']} stale upload sessions and {result['files']} part files "
+              f"({result['bytes']:,} bytes) idle for more than {hours}h")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-age-hours', type=int, help='idle time before an upload is removed '
+                                                          '(default: UPLOAD_SESSION_TTL_HOURS)')
+    args = parser.parse_args()
+    cleanup_uploads(args.max_age_hours)
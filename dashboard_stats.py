@@ -0,0 +1,138 @@
+"""
+Task statistics for the performance dashboard, aggregated in the database
+"""
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any
+from app import db
+from models import User, Task, TimeLogDaily
+from data_manager import BOARD_STATUSES
+
+PRIORITIES = ['urgent', 'high', 'medium', 'low']
+
+# Days covered by the hours logged chart
+HOURS_CHART_DAYS = 14
+
+
+class DashboardStats:
+    """Status and priority counts per assignee from a single GROUP BY query"""
+
+    def __init__(self, team_id: Optional[str] = None):
+        self.team_id = team_id
+        self.has_scope = True
+        self._rows = None
+
+    @classmethod
+    def for_user(cls, user: User) -> 'DashboardStats':
+        """Scope stats the same way the board is scoped for this user"""
+        # Administrators see all tasks, everyone else only their team's tasks
+        if user.is_administrator:
+            return cls()
+        stats = cls(str(user.team_id) if user.team_id else None)
+        if not user.team_id:
+            stats.has_scope = False
+            stats._rows = []
+        return stats
+
+    def _grouped_counts(self):
+        """Rows of (assignee_id, status, priority, count)"""
+        if self._rows is None:
+            query = db.session.query(
+                Task.assignee_id, Task.status, Task.priority, db.func.count(Task.id)
+            )
+            if self.team_id:
+                query = query.filter(Task.team_id == int(self.team_id))
+            self._rows = query.group_by(Task.assignee_id, Task.status, Task.priority).all()
+        return self._rows
+
+    def status_counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in BOARD_STATUSES}
+        for _, status, _, count in self._grouped_counts():
+            counts[status] = counts.get(status, 0) + count
+        return counts
+
+    def priority_stats(self) -> Dict[str, int]:
+        counts = {priority: 0 for priority in PRIORITIES}
+        for _, _, priority, count in self._grouped_counts():
+            if priority in counts:
+                counts[priority] += count
+        return counts
+
+    def user_stats(self, users: List[User]) -> Dict[str, Dict[str, Any]]:
+        """Per-user status breakdown keyed by str(user.id)"""
+        per_assignee = {}
+        for assignee_id, status, _, count in self._grouped_counts():
+            if assignee_id is None:
+                continue
+            counts = per_assignee.setdefault(assignee_id, {s: 0 for s in BOARD_STATUSES})
+            counts[status] = counts.get(status, 0) + count
+
+        user_stats = {}
+        for user in users:
+            counts = per_assignee.get(user.id, {})
+            user_total = sum(counts.values())
+            user_completed = counts.get('completed', 0)
+            user_stats[str(user.id)] = {
+                'user': user.to_dict(),
+                'total_tasks': user_total,
+                'todo_tasks': counts.get('todo', 0),
+                'in_progress_tasks': counts.get('in_progress', 0),
+                'in_review_tasks': counts.get('in_review', 0),
+                'completed_tasks': user_completed,
+                'completion_rate': (user_completed / user_total * 100) if user_total > 0 else 0
+            }
+        return user_stats
+
+    def hours_by_day(self, days: int = HOURS_CHART_DAYS) -> Dict[str, List]:
+        """Hours logged per day over the last days, read from the time_log_daily rollup"""
+        today = datetime.utcnow().date()
+        first_day = today - timedelta(days=days - 1)
+        logged = {}
+        if self.has_scope:
+            query = db.session.query(TimeLogDaily.day, db.func.sum(TimeLogDaily.hours)).filter(
+                TimeLogDaily.day >= first_day
+            )
+            if self.team_id:
+                query = query.filter(TimeLogDaily.team_id == int(self.team_id))
+            logged = dict(query.group_by(TimeLogDaily.day).all())
+
+        dates = [first_day + timedelta(days=offset) for offset in range(days)]
+        return {
+            'dates': [day.strftime('%Y-%m-%d') for day in dates],
+            'hours': [round(logged.get(day) or 0, 2) for day in dates]
+        }
+
+    def template_context(self, users: List[User]) -> Dict[str, Any]:
+        """Everything dashboard.html renders, in the shape it expects"""
+        counts = self.status_counts()
+        total_tasks = sum(counts.values())
+        completed_tasks = counts.get('completed', 0)
+        return {
+            'total_tasks': total_tasks,
+            'completed_tasks': completed_tasks,
+            'in_progress_tasks': counts.get('in_progress', 0),
+            'todo_tasks': counts.get('todo', 0),
+            'completion_rate': (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0,
+            'user_stats': self.user_stats(users),
+            'priority_stats': self.priority_stats(),
+            'hours_data': self.hours_by_day()
+        }
+
+    def chart_data(self) -> Dict[str, Any]:
+        """Metric and chart values in the shape dashboard.js updates in place"""
+        counts = self.status_counts()
+        total_tasks = sum(counts.values())
+        completed_tasks = counts.get('completed', 0)
+        completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+        return {
+            'totalTasks': total_tasks,
+            'completedTasks': completed_tasks,
+            'inProgressTasks': counts.get('in_progress', 0),
+            'completionRate': f"{completion_rate:.1f}%",
+            'statusData': {
+                'todo': counts.get('todo', 0),
+                'inProgress': counts.get('in_progress', 0),
+                'completed': completed_tasks
+            },
+            'priorityData': self.priority_stats(),
+            'hoursData': self.hours_by_day()
+        }
@@ -1,13 +1,98 @@
 from typing import List, Optional, Iterable, Dict, Any
-from models import User, Task, Team, TimeLog, Tag, TaskCustomField
+from models import (User, Task, Team, TimeLog, TimeLogDaily, Tag, TaskCustomField, SessionRevocation,
+                    tag_name_key, task_tags)
 from app import db
-from flask import session
+from search_index import search_query
+from tag_resolver import resolve_tags
+from task_history import record_history
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload, joinedload
+from flask import session, g, current_app, has_request_context
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 
+# Kanban board columns, in display order
+BOARD_STATUSES = ['todo', 'in_progress', 'in_review', 'completed']
+
+# Session key holding the signed identity snapshot (see SESSION_USER_SNAPSHOT)
+SESSION_SNAPSHOT_KEY = 'user_snapshot'
+
+# Time logs per page in the time report detail list
+TIME_REPORT_PAGE_SIZE = 20
+
+# Tags returned for tag clouds and filters, and tasks per page when listing a tag's tasks
+TAG_CLOUD_SIZE = 50
+TAG_TASKS_PAGE_SIZE = 50
+
+_UNSET = object()
+
+
+# User columns carried in the snapshot for page chrome (navbar name), besides the access fields
+SNAPSHOT_PROFILE_FIELDS = ('username', 'display_name')
+
+
+class SessionIdentity:
+    """Lightweight stand-in for User rebuilt from the signed session snapshot.
+
+    Any other attribute (email, team, check_password, ...) loads the User row on
+    first use, so routes and templates only reach the database when they need it.
+    """
+
+    def __init__(self, id, role, team_id=None, is_administrator=False, issued_at=None, **profile):
+        self.id = id
+        self.role = role
+        self.team_id = team_id
+        self.is_administrator = is_administrator
+        self.issued_at = issued_at
+        # Snapshots issued before a field was added just load it from the row
+        for name in SNAPSHOT_PROFILE_FIELDS:
+            if name in profile:
+                setattr(self, name, profile[name])
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        user = data_manager.get_current_user()
+        if user is None or user.id != self.id:
+            raise AttributeError(name)
+        return getattr(user, name)
+
+    @classmethod
+    def from_user(cls, user: User) -> 'SessionIdentity':
+        return cls(
+            id=user.id,
+            role=user.role,
+            team_id=user.team_id,
+            is_administrator=bool(user.is_administrator),
+            issued_at=time.time(),
+            **{name: getattr(user, name) for name in SNAPSHOT_PROFILE_FIELDS}
+        )
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            'id': self.id,
+            'role': self.role,
+            'team_id': self.team_id,
+            'is_administrator': self.is_administrator,
+            'issued_at': self.issued_at
+        }
+        snapshot.update((name, self.__dict__[name]) for name in SNAPSHOT_PROFILE_FIELDS if name in self.__dict__)
+        return snapshot
+
+    def __repr__(self):
+        return f'<SessionIdentity {self.id}>'
+
+
 class DataManager:
     def __init__(self):
-        self.current_user_id = None
+        # user_id -> time of last change; snapshots issued before it are ignored. Read from
+        # session_revocations every SESSION_REVOCATION_POLL seconds so all workers agree
+        self._snapshot_revocations: Dict[int, float] = {}
+        self._revocations_read_at = 0.0
+        self._revocations_lock = threading.Lock()
     
     # User management
     def create_user(self, username: str, email: str, role: str = 'analyst', password: str = '123') -> User:
@@ -27,8 +112,8 @@ class DataManager:
         return User.query.filter_by(username=username).first()
     
     def get_user_by_email(self, email: str) -> Optional[User]:
-        """Get user by email"""
-        return User.query.filter_by(email=email).first()
+        """Get user by email, ignoring case (uses idx_users_email_lower)"""
+        return User.query.filter(db.func.lower(User.email) == email.lower()).first()
     
     def authenticate_user(self, username_or_email: str, password: str) -> Optional[User]:
         """Authenticate user by username/email and password"""
@@ -56,6 +141,20 @@ class DataManager:
             for key, value in kwargs.items():
                 if hasattr(user, key):
                     setattr(user, key, value)
+            self.invalidate_current_user(user.id)
+            db.session.commit()
+        return user
+    
+    def update_user_role(self, user_id: str, role: str, is_administrator: bool) -> Optional[User]:
+        """Update user role and administrator flag"""
+        return self.update_user(user_id, role=role, is_administrator=is_administrator)
+    
+    def toggle_user_status(self, user_id: str) -> Optional[User]:
+        """Flip the active flag of a user"""
+        user = User.query.get(int(user_id))
+        if user:
+            user.is_active = not user.is_active
+            self.invalidate_current_user(user.id)
             db.session.commit()
         return user
     
@@ -63,6 +162,7 @@ class DataManager:
         """Delete user"""
         user = User.query.get(int(user_id))
         if user:
+            self.invalidate_current_user(user.id)
             db.session.delete(user)
             db.session.commit()
             return True
@@ -111,6 +211,79 @@ class DataManager:
         """Get all tasks"""
         return Task.query.all()
     
+    def get_board(self, team_id: Optional[str] = None, per_column_limit: int = 50,
+                  cursor: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, Any]]:
+        """Get one page of kanban cards per status column.
+        
+        Cards are ordered newest first. Without a cursor the first page of every
+        column comes from a single windowed query; ``cursor`` maps a status to
+        the id of the last card already shown and limits the result to those
+        columns. Each column holds its ``tasks``, the column ``total`` and a
+        ``next_cursor`` (None once exhausted).
+        """
+        filters = []
+        if team_id:
+            filters.append(Task.team_id == int(team_id))
+        
+        statuses = [s for s in BOARD_STATUSES if cursor is None or s in cursor]
+        board = {
+            status: {'tasks': [], 'total': 0, 'next_cursor': None}
+            for status in statuses
+        }
+        if not statuses:
+            return board
+        
+        counts = db.session.query(Task.status, db.func.count(Task.id)).filter(
+            Task.status.in_(statuses), *filters
+        ).group_by(Task.status).all()
+        for status, total in counts:
+            board[status]['total'] = total
+        
+        # Fetch one extra card per column to know whether another page exists
+        options = self._board_card_options()
+        if cursor is None:
+            ranked = db.session.query(
+                Task.id.label('id'),
+                db.func.row_number().over(
+                    partition_by=Task.status, order_by=Task.id.desc()
+                ).label('position')
+            ).filter(*filters).subquery()
+            tasks = Task.query.join(ranked, ranked.c.id == Task.id).filter(
+                ranked.c.position <= per_column_limit + 1
+            ).options(*options).order_by(Task.id.desc()).all()
+        else:
+            tasks = []
+            for status in statuses:
+                tasks.extend(Task.query.filter(
+                    Task.status == status, Task.id < int(cursor[status]), *filters
+                ).options(*options).order_by(Task.id.desc()).limit(per_column_limit + 1).all())
+        
+        for task in tasks:
+            if task.status in board:
+                board[task.status]['tasks'].append(task)
+        
+        for column in board.values():
+            if len(column['tasks']) > per_column_limit:
+                column['tasks'] = column['tasks'][:per_column_limit]
+                column['next_cursor'] = column['tasks'][-1].id
+        
+        return board
+    
+    def _board_card_options(self):
+        """Eager loads for everything a board card renders"""
+        return (
+            selectinload(Task.tags),
+            selectinload(Task.custom_fields),
+            joinedload(Task.supervisor),
+        )
+    
+    def get_board_card(self, task_id: str, team_id: Optional[str] = None) -> Optional[Task]:
+        """Get a single task as shown on the board, or None if it is not on that board"""
+        query = Task.query.filter(Task.id == int(task_id))
+        if team_id:
+            query = query.filter(Task.team_id == int(team_id))
+        return query.options(*self._board_card_options()).first()
+    
     def get_tasks_by_status(self, status: str) -> List[Task]:
         """Get tasks by status"""
         return Task.query.filter_by(status=status).all()
@@ -125,6 +298,7 @@ class DataManager:
         if task:
             tags = kwargs.pop('tags', None)
             custom_fields = kwargs.pop('custom_fields', None)
+            old_status = task.status
 
             commit_needed = False
 
@@ -144,6 +318,8 @@ class DataManager:
                 self._set_task_custom_fields(task, custom_fields)
                 commit_needed = True
 
+            self.sync_subtask_rollup(task, old_status)
+
             if commit_needed:
                 db.session.commit()
         return task
@@ -152,19 +328,117 @@ class DataManager:
         """Delete task"""
         task = Task.query.get(int(task_id))
         if task:
+            if task.parent_task_id:
+                self._adjust_subtask_counts(task.parent_task_id, total=-1,
+                                            completed=-1 if task.status == 'completed' else 0)
+            self._adjust_tag_usage({tag.id for tag in task.tags}, -1)
             db.session.delete(task)
             db.session.commit()
             return True
         return False
     
-    def search_tasks(self, query: str) -> List[Task]:
-        """Search tasks by title or description"""
-        return Task.query.filter(
-            db.or_(
-                Task.title.contains(query),
-                Task.description.contains(query)
-            )
-        ).all()
+    def create_subtask(self, parent_task: Task, title: str, description: str, created_by: str) -> Task:
+        """Create a subtask under a parent task and count it in the parent's rollup"""
+        subtask = Task(
+            title=title,
+            description=description,
+            status='todo',
+            priority='medium',
+            complexity='medium',
+            created_by=int(created_by),
+            team_id=parent_task.team_id,
+            parent_task_id=parent_task.id,
+            assignee_id=parent_task.assignee_id  # Default to parent task assignee
+        )
+        db.session.add(subtask)
+        self._adjust_subtask_counts(parent_task.id, total=1)
+        self.add_task_history(str(parent_task.id), str(created_by), 'subtask_created',
+                              field_name='subtask',
+                              new_value=f'Created subtask: {title}')
+        db.session.commit()
+        return subtask
+    
+    def update_subtask(self, subtask: Task, user_id: str, **fields) -> Task:
+        """Update subtask fields (status, title, description, priority)"""
+        old_status = subtask.status
+        for key in ('status', 'title', 'description', 'priority'):
+            if key in fields:
+                setattr(subtask, key, fields[key])
+        
+        if old_status != subtask.status:
+            self.sync_subtask_rollup(subtask, old_status)
+            self.add_task_history(str(subtask.id), str(user_id), 'status_changed',
+                                  field_name='status',
+                                  old_value=old_status,
+                                  new_value=subtask.status)
+        
+        subtask.updated_at = datetime.utcnow()
+        db.session.commit()
+        return subtask
+    
+    def sync_subtask_rollup(self, task: Task, old_status: str):
+        """Keep the parent's completed-subtask count in step with a status change"""
+        if not task.parent_task_id or old_status == task.status:
+            return
+        if task.status == 'completed':
+            self._adjust_subtask_counts(task.parent_task_id, completed=1)
+        elif old_status == 'completed':
+            self._adjust_subtask_counts(task.parent_task_id, completed=-1)
+    
+    def _adjust_subtask_counts(self, parent_task_id: int, total: int = 0, completed: int = 0):
+        """Add to a parent's subtask counters in SQL, never going below zero.
+        
+        The increment happens in the UPDATE itself, so concurrent changes to
+        sibling subtasks do not overwrite each other's counts.
+        """
+        values = {}
+        for column, delta in ((Task.subtask_total, total), (Task.subtask_completed, completed)):
+            if delta:
+                values[column] = db.case((column + delta > 0, column + delta), else_=0)
+        if values:
+            Task.query.filter_by(id=parent_task_id).update(values, synchronize_session='fetch')
+    
+    def rebuild_task_rollups(self) -> int:
+        """Recompute time and subtask rollups for every task in one statement"""
+        time_logs = TimeLog.__table__
+        child = Task.__table__.alias('child')
+        tasks = Task.__table__
+        
+        logged = db.select(db.func.coalesce(db.func.sum(time_logs.c.duration_hours), 0.0)).where(
+            time_logs.c.task_id == tasks.c.id
+        ).scalar_subquery()
+        subtask_total = db.select(db.func.count(child.c.id)).where(
+            child.c.parent_task_id == tasks.c.id
+        ).scalar_subquery()
+        subtask_completed = db.select(db.func.count(child.c.id)).where(
+            child.c.parent_task_id == tasks.c.id, child.c.status == 'completed'
+        ).scalar_subquery()
+        
+        result = db.session.execute(tasks.update().values(
+            total_time_logged=logged,
+            subtask_total=subtask_total,
+            subtask_completed=subtask_completed
+        ))
+        db.session.commit()
+        return result.rowcount
+    
+    def search_tasks(self, query: str, status: Optional[str] = None, assignee_id: Optional[str] = None,
+                     team_id: Optional[str] = None, page: int = 1, per_page: int = 50):
+        """Search tasks by title or description, best matches first.
+        
+        Returns a Pagination of tasks; an empty query lists all tasks matching
+        the filters, newest first.
+        """
+        tasks = search_query(query) if query and query.strip() else Task.query.order_by(Task.id.desc())
+        
+        if status:
+            tasks = tasks.filter(Task.status == status)
+        if assignee_id:
+            tasks = tasks.filter(Task.assignee_id == int(assignee_id))
+        if team_id:
+            tasks = tasks.filter(Task.team_id == int(team_id))
+        
+        return tasks.paginate(page=page, per_page=per_page, error_out=False)
     
     def get_team_managers(self, team_id: str) -> List[User]:
         """Get all managers from a specific team"""
@@ -217,22 +491,145 @@ class DataManager:
         return actions
     
     # Session management
-    def set_current_user(self, user_id: str):
+    def set_current_user(self, user_id: str, user: Optional[User] = None):
         """Set current user in session"""
-        self.current_user_id = user_id
         session['user_id'] = user_id
+        g.pop('current_identity', None)
+        if user is not None:
+            g.current_user = user
+            self._store_session_snapshot(user)
+        else:
+            g.pop('current_user', None)
     
     def get_current_user(self) -> Optional[User]:
-        """Get current user"""
-        user_id = session.get('user_id') or self.current_user_id
-        if user_id:
-            return User.query.get(int(user_id))
-        return None
+        """Get current user, loaded at most once per request"""
+        if has_request_context():
+            cached = g.get('current_user', _UNSET)
+            if cached is not _UNSET:
+                return cached
+        
+        user_id = session.get('user_id')
+        user = User.query.get(int(user_id)) if user_id else None
+        
+        if has_request_context():
+            g.current_user = user
+        return user
+    
+    def get_current_identity(self):
+        """Get id/role/team/is_administrator of the current user.
+        
+        With SESSION_USER_SNAPSHOT enabled this is answered from the signed
+        session cookie without touching the database; otherwise (or when the
+        snapshot is missing, expired or revoked) it falls back to the User row.
+        """
+        cached = g.get('current_identity', _UNSET)
+        if cached is not _UNSET:
+            return cached
+        
+        identity = None
+        if current_app.config.get('SESSION_USER_SNAPSHOT'):
+            identity = self._load_session_snapshot()
+        
+        if identity is None:
+            user = self.get_current_user()
+            if user and current_app.config.get('SESSION_USER_SNAPSHOT'):
+                self._store_session_snapshot(user)
+            identity = user
+        
+        g.current_identity = identity
+        return identity
+    
+    def invalidate_current_user(self, user_id=None):
+        """Drop cached identity after a user's role, team or status changed, or the user was deleted.
+        
+        With SESSION_USER_SNAPSHOT enabled the revocation is written to
+        session_revocations with the caller's next commit; without it no snapshot
+        is ever trusted, so there is nothing to revoke.
+        """
+        if user_id is not None and current_app.config.get('SESSION_USER_SNAPSHOT'):
+            revoked_at = time.time()
+            with self._revocations_lock:
+                self._snapshot_revocations[int(user_id)] = revoked_at
+            self._record_revocation(int(user_id), revoked_at)
+        
+        if not has_request_context():
+            return
+        
+        session_user_id = session.get('user_id')
+        if user_id is None or (session_user_id and int(session_user_id) == int(user_id)):
+            g.pop('current_user', None)
+            g.pop('current_identity', None)
+            session.pop(SESSION_SNAPSHOT_KEY, None)
+    
+    def _record_revocation(self, user_id: int, revoked_at: float):
+        table = SessionRevocation.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            dialect_insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            statement = dialect_insert(table).values(user_id=user_id, revoked_at=revoked_at)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['user_id'], set_={'revoked_at': statement.excluded.revoked_at}))
+        else:
+            db.session.merge(SessionRevocation(user_id=user_id, revoked_at=revoked_at))
+        # Snapshots older than the TTL are rejected anyway, so older revocations can go
+        ttl = current_app.config.get('SESSION_USER_SNAPSHOT_TTL', 300)
+        db.session.execute(table.delete().where(table.c.revoked_at < revoked_at - ttl))
+    
+    def _revoked_at(self, user_id: int) -> Optional[float]:
+        """Latest revocation for user_id, re-read from the database at most every SESSION_REVOCATION_POLL seconds"""
+        now = time.time()
+        poll = current_app.config.get('SESSION_REVOCATION_POLL', 5)
+        with self._revocations_lock:
+            stale = now - self._revocations_read_at >= poll
+            if stale:
+                self._revocations_read_at = now
+        if stale:
+            ttl = current_app.config.get('SESSION_USER_SNAPSHOT_TTL', 300)
+            rows = db.session.query(SessionRevocation.user_id, SessionRevocation.revoked_at).filter(
+                SessionRevocation.revoked_at >= now - ttl
+            ).all()
+            with self._revocations_lock:
+                for row_user_id, revoked_at in rows:
+                    if revoked_at > self._snapshot_revocations.get(row_user_id, 0):
+                        self._snapshot_revocations[row_user_id] = revoked_at
+        with self._revocations_lock:
+            return self._snapshot_revocations.get(user_id)
+    
+    def _store_session_snapshot(self, user: User):
+        if current_app.config.get('SESSION_USER_SNAPSHOT'):
+            session[SESSION_SNAPSHOT_KEY] = SessionIdentity.from_user(user).to_snapshot()
+    
+    def _load_session_snapshot(self) -> Optional[SessionIdentity]:
+        snapshot = session.get(SESSION_SNAPSHOT_KEY)
+        user_id = session.get('user_id')
+        if not snapshot or not user_id:
+            return None
+        
+        try:
+            identity = SessionIdentity(**snapshot)
+        except TypeError:
+            session.pop(SESSION_SNAPSHOT_KEY, None)
+            return None
+        
+        if identity.id != int(user_id) or not identity.issued_at:
+            return None
+        
+        ttl = current_app.config.get('SESSION_USER_SNAPSHOT_TTL', 300)
+        if time.time() - identity.issued_at > ttl:
+            return None
+        
+        revoked_at = self._revoked_at(identity.id)
+        if revoked_at and revoked_at >= identity.issued_at:
+            return None
+        
+        return identity
     
     def logout_current_user(self):
         """Logout current user"""
-        self.current_user_id = None
         session.pop('user_id', None)
+        session.pop(SESSION_SNAPSHOT_KEY, None)
+        g.pop('current_user', None)
+        g.pop('current_identity', None)
     
     # Team management
     def get_all_teams(self) -> List[Team]:
@@ -299,14 +696,100 @@ class DataManager:
             time_log.end_time = datetime.utcnow()
             time_log.calculate_duration()
             
-            # Update task actual hours
+            # Update task actual hours and logged-time rollup
             task = time_log.task
             if task:
-                task.actual_hours = (task.actual_hours or 0) + time_log.duration_hours
+                self._add_task_time(task.id, time_log.duration_hours)
+                self._roll_up_time_log(time_log, task.team_id)
             
             db.session.commit()
         return time_log
     
+    def _add_task_time(self, task_id: int, hours: float):
+        """Add a closed log's hours to its task in SQL, so concurrent stops on one task both count"""
+        Task.query.filter_by(id=task_id).update({
+            Task.actual_hours: db.func.coalesce(Task.actual_hours, 0.0) + (hours or 0.0),
+            Task.total_time_logged: Task.total_time_logged + (hours or 0.0)
+        }, synchronize_session='fetch')
+    
+    def release_user_time_logs(self, user_id: str):
+        """Subtract a user's logged hours from their tasks before the logs are bulk-deleted"""
+        time_logs = TimeLog.__table__
+        tasks = Task.__table__
+        released = db.select(db.func.coalesce(db.func.sum(time_logs.c.duration_hours), 0.0)).where(
+            time_logs.c.task_id == tasks.c.id, time_logs.c.user_id == int(user_id)
+        ).scalar_subquery()
+        logged_task_ids = db.select(time_logs.c.task_id).where(time_logs.c.user_id == int(user_id))
+        actual_hours = db.func.coalesce(tasks.c.actual_hours, 0.0)
+        db.session.execute(tasks.update().where(tasks.c.id.in_(logged_task_ids)).values(
+            total_time_logged=db.case((tasks.c.total_time_logged > released,
+                                       tasks.c.total_time_logged - released), else_=0.0),
+            actual_hours=db.case((actual_hours > released, actual_hours - released), else_=0.0)
+        ))
+    
+    def _roll_up_time_log(self, time_log: TimeLog, team_id: Optional[int]):
+        """Add a closed log to its time_log_daily bucket in the current transaction"""
+        hours = time_log.duration_hours or 0.0
+        bucket = TimeLogDaily.query.filter_by(
+            day=time_log.start_time.date(),
+            user_id=time_log.user_id,
+            task_id=time_log.task_id,
+            team_id=team_id
+        )
+        updated = bucket.update({
+            TimeLogDaily.hours: TimeLogDaily.hours + hours,
+            TimeLogDaily.log_count: TimeLogDaily.log_count + 1
+        }, synchronize_session=False)
+        if not updated:
+            db.session.add(TimeLogDaily(
+                day=time_log.start_time.date(),
+                user_id=time_log.user_id,
+                task_id=time_log.task_id,
+                team_id=team_id,
+                hours=hours,
+                log_count=1
+            ))
+    
+    def rebuild_time_log_daily(self, start_date: datetime = None, end_date: datetime = None) -> int:
+        """Recompute time_log_daily from time_logs, optionally for a range of days only.
+        
+        Returns the number of buckets written.
+        """
+        rollup = TimeLogDaily.__table__
+        time_logs = TimeLog.__table__
+        tasks = Task.__table__
+        day = db.func.date(time_logs.c.start_time)
+        
+        delete = rollup.delete()
+        source = db.select(
+            day.label('day'),
+            time_logs.c.user_id,
+            time_logs.c.task_id,
+            tasks.c.team_id,
+            db.func.sum(time_logs.c.duration_hours).label('hours'),
+            db.func.count(time_logs.c.id).label('log_count')
+        ).select_from(
+            time_logs.join(tasks, time_logs.c.task_id == tasks.c.id)
+        ).where(
+            time_logs.c.end_time.isnot(None),
+            time_logs.c.duration_hours.isnot(None)
+        )
+        if start_date:
+            delete = delete.where(rollup.c.day >= start_date.date())
+            source = source.where(time_logs.c.start_time >= datetime.combine(start_date.date(), datetime.min.time()))
+        if end_date:
+            delete = delete.where(rollup.c.day <= end_date.date())
+            source = source.where(time_logs.c.start_time < datetime.combine(end_date.date() + timedelta(days=1),
+                                                                            datetime.min.time()))
+        source = source.group_by(day, time_logs.c.user_id, time_logs.c.task_id, tasks.c.team_id)
+        
+        db.session.execute(delete)
+        result = db.session.execute(rollup.insert().from_select(
+            ['day', 'user_id', 'task_id', 'team_id', 'hours', 'log_count'], source
+        ))
+        db.session.commit()
+        return result.rowcount
+    
     def get_active_time_log(self, user_id: str, task_id: str = None) -> Optional[TimeLog]:
         """Get active time log for user (optionally for specific task)"""
         query = TimeLog.query.filter_by(user_id=int(user_id), end_time=None)
@@ -343,30 +826,68 @@ class DataManager:
         seen = set()
         unique_tags = []
         for name in normalized:
-            key = name.lower()
+            key = tag_name_key(name)
             if key not in seen:
                 seen.add(key)
                 unique_tags.append(name)
         return unique_tags
 
-    def _get_or_create_tag(self, name: str) -> Tag:
-        existing = Tag.query.filter(db.func.lower(Tag.name) == name.lower()).first()
-        if existing:
-            return existing
-
-        tag = Tag(name=name)
-        db.session.add(tag)
-        db.session.flush()
-        return tag
-
     def _set_task_tags(self, task: Task, tags: Iterable[str]):
         normalized_tags = self._normalize_tag_names(tags)
-        if not normalized_tags:
-            task.tags.clear()
+        old_ids = {tag.id for tag in task.tags}
+
+        # All tags resolved (and missing ones created) in one pass
+        task.tags = resolve_tags(normalized_tags) if normalized_tags else []
+        new_ids = {tag.id for tag in task.tags}
+        self._adjust_tag_usage(new_ids - old_ids, 1)
+        self._adjust_tag_usage(old_ids - new_ids, -1)
+
+    def _adjust_tag_usage(self, tag_ids: Iterable[int], delta: int):
+        """Add delta to usage_count of each tag, never going below zero"""
+        tag_ids = list(tag_ids)
+        if not tag_ids:
             return
+        query = Tag.query.filter(Tag.id.in_(tag_ids))
+        if delta < 0:
+            query = query.filter(Tag.usage_count >= -delta)
+        query.update({Tag.usage_count: Tag.usage_count + delta})
+
+    def detach_team_task_tags(self, team_id: str):
+        """Untag all tasks of a team before they are bulk-deleted, releasing their tag usage"""
+        team_task_ids = db.select(Task.id).where(Task.team_id == int(team_id))
+        tags = Tag.__table__
+        released = db.select(db.func.count()).where(
+            task_tags.c.tag_id == tags.c.id, task_tags.c.task_id.in_(team_task_ids)
+        ).scalar_subquery()
+        used_tag_ids = db.select(task_tags.c.tag_id).where(task_tags.c.task_id.in_(team_task_ids))
+        db.session.execute(tags.update().where(tags.c.id.in_(used_tag_ids)).values(
+            usage_count=db.case((tags.c.usage_count > released, tags.c.usage_count - released), else_=0)
+        ))
+        db.session.execute(task_tags.delete().where(task_tags.c.task_id.in_(team_task_ids)))
 
-        tag_objects = [self._get_or_create_tag(name) for name in normalized_tags]
-        task.tags = tag_objects
+    def rebuild_tag_usage_counts(self) -> int:
+        """Recount usage_count for every tag in one statement"""
+        tags = Tag.__table__
+        used = db.select(db.func.count()).select_from(
+            task_tags.join(Task.__table__, Task.__table__.c.id == task_tags.c.task_id)
+        ).where(task_tags.c.tag_id == tags.c.id).scalar_subquery()
+        result = db.session.execute(tags.update().values(usage_count=used))
+        db.session.commit()
+        return result.rowcount
+
+    def get_tag_cloud(self, limit: int = TAG_CLOUD_SIZE) -> List[Tag]:
+        """Most used tags, from their counters; no tasks are read"""
+        return Tag.query.filter(Tag.usage_count > 0).order_by(
+            Tag.usage_count.desc(), Tag.name
+        ).limit(limit).all()
+
+    def get_tasks_with_tag(self, tag_id: int, team_id: Optional[str] = None, page: int = 1,
+                           per_page: int = TAG_TASKS_PAGE_SIZE):
+        """Pagination of the tasks carrying a tag, newest first"""
+        query = Task.query.join(task_tags, task_tags.c.task_id == Task.id).filter(task_tags.c.tag_id == int(tag_id))
+        if team_id:
+            query = query.filter(Task.team_id == int(team_id))
+        return query.order_by(Task.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
 
     def _set_task_custom_fields(self, task: Task, fields: Iterable[Dict[str, Any]]):
         task.custom_fields.clear()
@@ -404,67 +925,88 @@ class DataManager:
         """Complete task and record completion time"""
         task = self.get_task(task_id)
         if task:
+            old_status = task.status
             task.status = 'completed'
             task.completed_at = datetime.utcnow()
+            self.sync_subtask_rollup(task, old_status)
             
             # Stop any active time tracking for this task
             active_logs = TimeLog.query.filter_by(task_id=int(task_id), end_time=None).all()
             for log in active_logs:
                 log.end_time = datetime.utcnow()
                 log.calculate_duration()
-                task.actual_hours = (task.actual_hours or 0) + log.duration_hours
+                self._add_task_time(task.id, log.duration_hours)
+                self._roll_up_time_log(log, task.team_id)
             
             db.session.commit()
         return task
     
-    def get_time_report_data(self, team_id: str = None, start_date: datetime = None, end_date: datetime = None):
-        """Generate time tracking report data"""
+    def get_time_report_data(self, team_id: str = None, start_date: datetime = None, end_date: datetime = None,
+                             page: int = 1, per_page: int = TIME_REPORT_PAGE_SIZE):
+        """Generate time tracking report data.
+
+        Totals and chart buckets come from the time_log_daily rollup (closed logs,
+        by the team the task was in when each log closed); only the paginated
+        detail list reads time_logs. Both count closed logs by the day they
+        started, so the list shows the logs the totals add up (apart from logs
+        of tasks that have since moved team).
+        """
         # Default to last 30 days if no date range specified
         if not start_date:
             start_date = datetime.utcnow() - timedelta(days=30)
         if not end_date:
             end_date = datetime.utcnow()
-        
-        # Base query for time logs
-        query = db.session.query(TimeLog).join(Task).join(User)
-        
+
+        def in_range(query):
+            query = query.filter(TimeLogDaily.day >= start_date.date(), TimeLogDaily.day <= end_date.date())
+            if team_id:
+                query = query.filter(TimeLogDaily.team_id == int(team_id))
+            return query
+
+        hours = db.func.coalesce(db.func.sum(TimeLogDaily.hours), 0.0)
+
+        # Summary statistics
+        totals = in_range(db.session.query(
+            hours,
+            db.func.count(db.distinct(TimeLogDaily.task_id)),
+            db.func.count(db.distinct(TimeLogDaily.user_id))
+        )).one()
+        total_hours, total_tasks, total_users = totals
+
+        # Per-user hours and distinct tasks
+        user_rows = in_range(db.session.query(
+            TimeLogDaily.user_id,
+            hours.label('total_hours'),
+            db.func.count(db.distinct(TimeLogDaily.task_id)).label('task_count')
+        )).group_by(TimeLogDaily.user_id).order_by(hours.desc()).all()
+        users = {}
+        if user_rows:
+            users = {user.id: user for user in User.query.filter(User.id.in_([row.user_id for row in user_rows]))}
+        user_stats = {
+            row.user_id: {
+                'user': users.get(row.user_id),
+                'total_hours': row.total_hours,
+                'task_count': row.task_count
+            }
+            for row in user_rows if row.user_id in users
+        }
+
+        # Newest logs first, one page at a time; the task join is explicit because
+        # users and tasks are linked by several foreign keys
+        log_query = TimeLog.query.filter(
+            TimeLog.end_time.isnot(None),
+            TimeLog.duration_hours.isnot(None),
+            TimeLog.start_time >= datetime.combine(start_date.date(), datetime.min.time()),
+            TimeLog.start_time < datetime.combine(end_date.date() + timedelta(days=1), datetime.min.time())
+        )
         if team_id:
-            query = query.filter(Task.team_id == int(team_id))
-        
-        query = query.filter(TimeLog.start_time >= start_date, TimeLog.start_time <= end_date)
-        
-        time_logs = query.all()
-        
-        # Calculate summary statistics
-        total_hours = sum(log.duration_hours for log in time_logs if log.duration_hours)
-        total_tasks = len(set(log.task_id for log in time_logs))
-        total_users = len(set(log.user_id for log in time_logs))
-        
-        # Group by user
-        user_stats = {}
-        for log in time_logs:
-            user_id = log.user_id
-            if user_id not in user_stats:
-                user_stats[user_id] = {
-                    'user': log.user,
-                    'total_hours': 0,
-                    'task_count': set(),
-                    'logs': []
-                }
-            user_stats[user_id]['total_hours'] += log.duration_hours or 0
-            user_stats[user_id]['task_count'].add(log.task_id)
-            user_stats[user_id]['logs'].append(log)
-        
-        # Convert sets to counts
-        for user_id in user_stats:
-            user_stats[user_id]['task_count'] = len(user_stats[user_id]['task_count'])
-        
-        # Generate daily time data for charts
-        daily_data = self._generate_daily_time_data(time_logs, start_date, end_date)
-        
-        # Generate team time data for charts
-        team_data = self._generate_team_time_data(time_logs)
-        
+            log_query = log_query.join(Task, TimeLog.task_id == Task.id).filter(Task.team_id == int(team_id))
+        time_logs = log_query.options(
+            joinedload(TimeLog.user), joinedload(TimeLog.task)
+        ).order_by(TimeLog.start_time.desc(), TimeLog.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+
         return {
             'total_hours': total_hours,
             'total_tasks': total_tasks,
@@ -473,55 +1015,41 @@ class DataManager:
             'time_logs': time_logs,
             'start_date': start_date,
             'end_date': end_date,
-            'daily_data': daily_data,
-            'team_data': team_data
+            'daily_data': self._generate_daily_time_data(in_range, start_date, end_date),
+            'team_data': self._generate_team_time_data(in_range, user_stats)
         }
-    
-    def _generate_daily_time_data(self, time_logs, start_date, end_date):
-        """Generate daily time tracking data for charts"""
-        from collections import defaultdict
-        
-        daily_hours = defaultdict(float)
+
+    def _generate_daily_time_data(self, in_range, start_date, end_date):
+        """Hours per day for charts, zero-filled over the range"""
+        rows = in_range(db.session.query(
+            TimeLogDaily.day, db.func.sum(TimeLogDaily.hours)
+        )).group_by(TimeLogDaily.day).all()
+        logged = {day: total or 0 for day, total in rows}
+
+        dates, daily_hours = [], []
         current_date = start_date.date()
-        end_date_only = end_date.date()
-        
-        # Initialize all dates with 0 hours
-        while current_date <= end_date_only:
-            daily_hours[current_date.strftime('%Y-%m-%d')] = 0
+        while current_date <= end_date.date():
+            dates.append(current_date.strftime('%Y-%m-%d'))
+            daily_hours.append(logged.get(current_date, 0))
             current_date += timedelta(days=1)
-        
-        # Aggregate hours by date
-        for log in time_logs:
-            if log.duration_hours and log.start_time:
-                date_key = log.start_time.strftime('%Y-%m-%d')
-                daily_hours[date_key] += log.duration_hours
-        
-        # Sort by date and prepare for Chart.js
-        sorted_dates = sorted(daily_hours.keys())
         return {
-            'dates': sorted_dates,
-            'hours': [daily_hours[date] for date in sorted_dates]
+            'dates': dates,
+            'hours': daily_hours
         }
-    
-    def _generate_team_time_data(self, time_logs):
-        """Generate team-based time tracking data for charts"""
-        from collections import defaultdict
-        
-        team_hours = defaultdict(float)
-        
-        # Aggregate hours by team
-        for log in time_logs:
-            if log.duration_hours and log.task and log.task.team:
-                team_name = log.task.team.name
-                team_hours[team_name] += log.duration_hours
-        
-        # If no team data, use individual user data
+
+    def _generate_team_time_data(self, in_range, user_stats):
+        """Hours per team for charts, falling back to per-user hours when no task has a team"""
+        rows = in_range(
+            db.session.query(Team.name, db.func.sum(TimeLogDaily.hours))
+        ).join(Team, TimeLogDaily.team_id == Team.id).group_by(Team.id, Team.name).order_by(Team.name).all()
+        team_hours = {name: total for name, total in rows if total}
+
         if not team_hours:
-            for log in time_logs:
-                if log.duration_hours and log.user:
-                    user_name = log.user.display_name or log.user.username
-                    team_hours[user_name] += log.duration_hours
-        
+            team_hours = {
+                stats['user'].display_name or stats['user'].username: stats['total_hours']
+                for stats in user_stats.values() if stats['total_hours']
+            }
+
         return {
             'names': list(team_hours.keys()),
             'hours': list(team_hours.values())
@@ -545,24 +1073,8 @@ class DataManager:
             return None
     
     def add_task_history(self, task_id: str, user_id: str, action: str, field_name: str = None, old_value: str = None, new_value: str = None):
-        """Add a history entry for a task"""
-        try:
-            from models import TaskHistory
-            history = TaskHistory(
-                task_id=int(task_id),
-                user_id=int(user_id),
-                action=action,
-                field_name=field_name,
-                old_value=old_value,
-                new_value=new_value
-            )
-            db.session.add(history)
-            db.session.commit()
-            return history
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error adding task history: {e}")
-            return None
+        """Add a history entry for a task, written together with the caller's next commit"""
+        record_history(task_id, user_id, action, field_name=field_name, old_value=old_value, new_value=new_value)
 
 # Global instance
 data_manager = DataManager()
\ No newline at end of file
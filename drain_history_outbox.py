@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Move task history entries queued by large transactions from the outbox into task_history
+"""
+
+import argparse
+
+from app import app
+from task_history import OUTBOX_BATCH_SIZE, drain_history_outbox
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE):
+    with app.app_context():
+        written = drain_history_outbox(batch_size)
+        print(f"Wrote {written} task history entries from the outbox")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE,
+                        help='outbox rows moved per transaction')
+    args = parser.parse_args()
+    drain_outbox(args.batch_size)
@@ -1,9 +1,23 @@
 #!/usr/bin/env python3
+"""
+Generate SQL that loads the task sheet into the database.
+
+Output formats:
+  insert  one INSERT per team, user and task (the original import_tasks.sql layout)
+  copy    PostgreSQL: COPY the sheet into a temp staging table, then resolve team
+          and user names with one INSERT ... SELECT join, all in one transaction
+  values  SQLite: same staging approach, loading the staging table with
+          multi-row VALUES batches
+
+    python excel_to_sql.py [sheet] --format copy > import_tasks.sql
+"""
+import argparse
 import pandas as pd
 import random
+from sheet_reader import iter_sheet_chunks
 
-# Read Excel data
-df = pd.read_excel('attached_assets/Book4_1749639551792.xlsx')
+DEFAULT_SOURCE = 'attached_assets/Book4_1749639551792.xlsx'
+VALUES_BATCH_SIZE = 500
 
 # Complexity and priority mappings
 complexity_map = {
@@ -21,49 +35,192 @@ priority_map = {
     'Urgent': 'urgent'
 }
 
-# Generate SQL for teams
-print("-- Creating teams")
-teams = df['Team'].dropna().unique()
-for i, team in enumerate(teams, 1):
-    safe_name = str(team).replace("'", "''")
-    print(f"INSERT INTO teams (name, description, is_active, created_at) VALUES ('{safe_name}', 'Banking team: {safe_name}', true, NOW()) ON CONFLICT (name) DO NOTHING;")
+statuses = ['todo', 'in_progress', 'completed']
+seen_teams = set()
+seen_users = set()
 
-print("\n-- Creating users")
-users = df['Assignee'].dropna().unique()
-for user in users:
-    safe_user = str(user).replace("'", "''")
-    print(f"INSERT INTO users (username, email, password_hash, role, is_administrator, is_active, created_at) VALUES ('{safe_user}', '{safe_user}@bidv.com.vn', 'pbkdf2:sha256:600000$salt$hash', 'analyst', false, true, NOW()) ON CONFLICT (username) DO NOTHING;")
+def print_teams(df):
+    # Generate SQL for teams not seen in earlier chunks
+    teams = [t for t in df['Team'].dropna().unique() if t not in seen_teams]
+    if teams:
+        print("\n-- Creating teams")
+    for team in teams:
+        seen_teams.add(team)
+        safe_name = str(team).replace("'", "''")
+        print(f"INSERT INTO teams (name, description, is_active, created_at) VALUES ('{safe_name}', 'Banking team: {safe_name}', true, NOW()) ON CONFLICT (name) DO NOTHING;")
 
-print("\n-- Creating tasks")
-statuses = ['todo', 'in_progress', 'completed']
+def print_users(df):
+    users = [u for u in df['Assignee'].dropna().unique() if u not in seen_users]
+    if users:
+        print("\n-- Creating users")
+    for user in users:
+        seen_users.add(user)
+        safe_user = str(user).replace("'", "''")
+        print(f"INSERT INTO users (username, email, password_hash, role, is_administrator, is_active, created_at) VALUES ('{safe_user}', '{safe_user}@bidv.com.vn', 'pbkdf2:sha256:600000$salt$hash', 'analyst', false, true, NOW()) ON CONFLICT (username) DO NOTHING;")
 
-for idx, row in df.iterrows():
-    # Safe string handling
-    title = str(row['Summary']).replace("'", "''")[:200] if pd.notna(row['Summary']) else f"Task {idx+1}"
-    description = str(row['Description']).replace("'", "''") if pd.notna(row['Description']) else ""
-    
-    complexity = complexity_map.get(str(row['Complexity']), 'medium')
-    priority = priority_map.get(str(row['Priority']), 'medium')
-    status = random.choices(statuses, weights=[0.4, 0.35, 0.25])[0]
-    
-    # Team assignment
-    team_clause = "NULL"
-    if pd.notna(row['Team']):
-        team_name = str(row['Team']).replace("'", "''")
-        team_clause = f"(SELECT id FROM teams WHERE name = '{team_name}')"
-    
-    # User assignment  
-    assignee_clause = "NULL"
-    if pd.notna(row['Assignee']):
-        assignee_name = str(row['Assignee']).replace("'", "''") 
-        assignee_clause = f"(SELECT id FROM users WHERE username = '{assignee_name}')"
-    
-    hours = round(random.uniform(2, 20), 1)
-    
-    sql = f"""INSERT INTO tasks (title, description, status, priority, complexity, created_at, updated_at, estimated_hours, actual_hours, created_by, assignee_id, team_id) 
+def print_tasks(df):
+    print("\n-- Creating tasks")
+    for idx, row in df.iterrows():
+        # Safe string handling
+        title = str(row['Summary']).replace("'", "''")[:200] if pd.notna(row['Summary']) else f"Task {idx+1}"
+        description = str(row['Description']).replace("'", "''") if pd.notna(row['Description']) else ""
+        
+        complexity = complexity_map.get(str(row['Complexity']), 'medium')
+        priority = priority_map.get(str(row['Priority']), 'medium')
+        status = random.choices(statuses, weights=[0.4, 0.35, 0.25])[0]
+        
+        # Team assignment
+        team_clause = "NULL"
+        if pd.notna(row['Team']):
+            team_name = str(row['Team']).replace("'", "''")
+            team_clause = f"(SELECT id FROM teams WHERE name = '{team_name}')"
+        
+        # User assignment  
+        assignee_clause = "NULL"
+        if pd.notna(row['Assignee']):
+            assignee_name = str(row['Assignee']).replace("'", "''") 
+            assignee_clause = f"(SELECT id FROM users WHERE username = '{assignee_name}')"
+        
+        hours = round(random.uniform(2, 20), 1)
+        
+        sql = f"""INSERT INTO tasks (title, description, status, priority, complexity, created_at, updated_at, estimated_hours, actual_hours, created_by, assignee_id, team_id) 
 VALUES ('{title}', '{description}', '{status}', '{priority}', '{complexity}', NOW(), NOW(), {hours}, 0.0, 
 (SELECT id FROM users WHERE is_administrator = true LIMIT 1), {assignee_clause}, {team_clause});"""
-    
-    print(sql)
+        
+        print(sql)
+    return len(df)
+
+STAGING_COLUMNS = ['row_no', 'title', 'description', 'status', 'priority', 'complexity',
+                   'estimated_hours', 'team_name', 'assignee']
+
+def staging_rows(df):
+    """Mapped task values for the staging table; names are left for the database to resolve"""
+    for idx, row in df.iterrows():
+        yield (
+            idx + 1,
+            str(row['Summary'])[:200] if pd.notna(row['Summary']) else f"Task {idx+1}",
+            str(row['Description']) if pd.notna(row['Description']) else "",
+            random.choices(statuses, weights=[0.4, 0.35, 0.25])[0],
+            priority_map.get(str(row['Priority']), 'medium'),
+            complexity_map.get(str(row['Complexity']), 'medium'),
+            round(random.uniform(2, 20), 1),
+            str(row['Team']) if pd.notna(row['Team']) else None,
+            str(row['Assignee']) if pd.notna(row['Assignee']) else None,
+        )
+
+def copy_value(value):
+    """Encode a value for COPY text format"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+def sql_literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def print_staging_table(dialect):
+    print("""
+CREATE TEMP TABLE task_staging (
+    row_no INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    status TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    complexity TEXT NOT NULL,
+    estimated_hours FLOAT,
+    team_name TEXT,
+    assignee TEXT
+)""" + (" ON COMMIT DROP;" if dialect == 'postgresql' else ";"))
+
+def print_staging_copy(chunks):
+    print(f"COPY task_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN;")
+    count = 0
+    for df, _ in chunks:
+        for row in staging_rows(df):
+            print('\t'.join(copy_value(v) for v in row))
+            count += 1
+    print('\\.')
+    return count
+
+def print_staging_values(chunks):
+    count = 0
+    batch = []
+    def flush():
+        if batch:
+            print(f"INSERT INTO task_staging ({', '.join(STAGING_COLUMNS)}) VALUES")
+            print(',\n'.join('(' + ', '.join(sql_literal(v) for v in row) + ')' for row in batch) + ';')
+            batch.clear()
+    for df, _ in chunks:
+        for row in staging_rows(df):
+            batch.append(row)
+            count += 1
+            if len(batch) >= VALUES_BATCH_SIZE:
+                flush()
+    flush()
+    return count
+
+def print_resolve_statements(dialect):
+    """Create missing teams and users, then insert tasks with names joined to ids"""
+    now = 'NOW()' if dialect == 'postgresql' else 'CURRENT_TIMESTAMP'
+    if dialect == 'postgresql':
+        insert, conflict_team, conflict_user = 'INSERT INTO', ' ON CONFLICT (name) DO NOTHING', ' ON CONFLICT (username) DO NOTHING'
+    else:
+        insert, conflict_team, conflict_user = 'INSERT OR IGNORE INTO', '', ''
+
+    print(f"""
+{insert} teams (name, description, is_active, created_at)
+SELECT DISTINCT team_name, 'Banking team: ' || team_name, true, {now}
+FROM task_staging WHERE team_name IS NOT NULL{conflict_team};
+
+{insert} users (username, email, password_hash, role, is_administrator, is_active, created_at)
+SELECT DISTINCT assignee, assignee || '@bidv.com.vn', 'pbkdf2:sha256:600000$salt$hash', 'analyst', false, true, {now}
+FROM task_staging WHERE assignee IS NOT NULL{conflict_user};
+
+INSERT INTO tasks (title, description, status, priority, complexity, created_at, updated_at, estimated_hours, actual_hours, created_by, assignee_id, team_id)
+SELECT s.title, s.description, s.status, s.priority, s.complexity, {now}, {now}, s.estimated_hours, 0.0,
+       (SELECT id FROM users WHERE is_administrator = true ORDER BY id LIMIT 1), u.id, t.id
+FROM task_staging s
+LEFT JOIN users u ON u.username = s.assignee
+LEFT JOIN teams t ON t.name = s.team_name
+ORDER BY s.row_no;""")
+
+def generate_inserts(source):
+    task_count = 0
+    for df, _ in iter_sheet_chunks(source):
+        print_teams(df)
+        print_users(df)
+        task_count += print_tasks(df)
+    return task_count
+
+def generate_staged(source, fmt):
+    dialect = 'postgresql' if fmt == 'copy' else 'sqlite'
+    chunks = iter_sheet_chunks(source)
+    print("BEGIN;")
+    print_staging_table(dialect)
+    if fmt == 'copy':
+        task_count = print_staging_copy(chunks)
+    else:
+        task_count = print_staging_values(chunks)
+    print_resolve_statements(dialect)
+    if dialect == 'sqlite':
+        print("\nDROP TABLE task_staging;")
+    print("COMMIT;")
+    print("\n-- Search index is not maintained by raw SQL: run rebuild_search_index.py after loading")
+    return task_count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate SQL that loads the task sheet")
+    parser.add_argument('source', nargs='?', default=DEFAULT_SOURCE, help='.xlsx or .csv task sheet')
+    parser.add_argument('--format', choices=['insert', 'copy', 'values'], default='insert',
+                        help='insert: one statement per row; copy: PostgreSQL COPY; values: SQLite multi-row VALUES')
+    args = parser.parse_args()
 
-print(f"\n-- Successfully generated SQL for {len(df)} tasks")
\ No newline at end of file
+    if args.format == 'insert':
+        task_count = generate_inserts(args.source)
+    else:
+        task_count = generate_staged(args.source, args.format)
+    print(f"\n-- Successfully generated SQL for {task_count} tasks")
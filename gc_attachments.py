@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Remove orphaned attachment rows, blobs and files, and stale chunked uploads
+"""
+
+import argparse
+from datetime import timedelta
+
+from app import app
+from attachment_gc import GC_BATCH_SIZE, collect_garbage
+
+def gc_attachments(grace_hours=None, batch_size=GC_BATCH_SIZE, dry_run=False):
+    with app.app_context():
+        hours = app.config['ATTACHMENT_GC_GRACE_HOURS'] if grace_hours is None else grace_hours
+        result = collect_garbage(timedelta(hours=hours), batch_size, dry_run)
+        if result is None:
+            print("Another garbage collection is running; nothing done")
+            return
+
+        action = "Would remove" if dry_run else "Removed"
+        print(f"{action} {result['attachments']} attachment rows of deleted tasks, "
+              f"{result['blobs']} unreferenced blobs and {result['upload_sessions']} stale upload sessions")
+        print(f"{action} {result['files']} orphaned files, reclaiming {result['bytes']:,} bytes")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--grace-hours', type=float, help='leave files younger than this alone '
+                                                          '(default: ATTACHMENT_GC_GRACE_HOURS)')
+    parser.add_argument('--batch-size', type=int, default=GC_BATCH_SIZE, help='rows or files deleted per batch')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be removed without removing it')
+    args = parser.parse_args()
+    gc_attachments(args.grace_hours, args.batch_size, args.dry_run)
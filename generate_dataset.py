@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Generate a large, reproducible synthetic dataset for performance work
+
+Creates teams, users, tags, tasks with subtask trees, custom fields, time logs,
+comments, task history and attachment metadata (blob rows only, no files). The
+same seed against the same starting database produces the same rows: every value
+comes from one seeded random generator and a fixed start date, and ids are
+assigned here, continuing after the highest existing id.
+
+Rows are buffered per table and written with executemany INSERTs on a plain
+connection, parents before children, bypassing the ORM and its session hooks.
+Rollup columns are computed while generating; tag usage counts, blob reference
+counts, time_log_daily and the search index are rebuilt with set-based
+statements at the end. All users get the same password (--password), hashed once
+with a salt derived from the seed so the stored hash is reproducible too.
+"""
+
+import argparse
+import hashlib
+import itertools
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, text
+
+from app import app, db
+from models import (AttachmentBlob, Tag, Task, TaskAttachment, TaskComment, TaskCustomField, TaskHistory,
+                    Team, TimeLog, User, tag_name_key, task_tags)
+from attachment_storage import LocalContentStore
+from data_manager import DataManager
+from search_index import rebuild_search_index
+from tag_resolver import resolve_tag_ids
+
+DEFAULT_SEED = 42
+DEFAULT_START_DATE = '2024-01-01'
+BATCH_SIZE = 5000
+PASSWORD_ITERATIONS = 600000
+
+STATUSES = ['todo', 'in_progress', 'in_review', 'completed']
+STATUS_WEIGHTS = [30, 25, 10, 35]
+PRIORITIES = ['low', 'medium', 'high', 'urgent']
+PRIORITY_WEIGHTS = [20, 45, 25, 10]
+COMPLEXITIES = ['very_simple', 'simple', 'medium', 'complex', 'very_complex']
+COMPLEXITY_WEIGHTS = [10, 25, 35, 20, 10]
+# Typical estimate in hours for each complexity
+COMPLEXITY_HOURS = {'very_simple': 2, 'simple': 6, 'medium': 16, 'complex': 40, 'very_complex': 80}
+TAGS_PER_TASK = [0, 1, 2, 3, 4]
+TAGS_PER_TASK_WEIGHTS = [25, 35, 25, 10, 5]
+
+FIRST_NAMES = ['An', 'Bình', 'Chi', 'Dũng', 'Giang', 'Hà', 'Hải', 'Hương', 'Khánh', 'Lan', 'Linh', 'Long',
+               'Mai', 'Minh', 'Nam', 'Ngọc', 'Phương', 'Quân', 'Sơn', 'Thảo', 'Trang', 'Trung', 'Tú', 'Vy']
+LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ']
+TITLE_VERBS = ['Review', 'Update', 'Analyse', 'Prepare', 'Validate', 'Rà soát', 'Cập nhật', 'Báo cáo', 'Đánh giá']
+TITLE_OBJECTS = ['credit policy', 'portfolio report', 'risk limits', 'stress test scenarios', 'loan covenants',
+                 'collateral valuation', 'early warning signals', 'tín dụng doanh nghiệp', 'danh mục cho vay',
+                 'giám sát tín dụng', 'rủi ro tích hợp', 'hạn mức tín dụng']
+SENTENCES = ['Collect the figures from the branches and reconcile them with the ledger.',
+             'Highlight any exposure above the approved limit.',
+             'Send the draft to the team lead for comments before Friday.',
+             'Số liệu cần đối chiếu với báo cáo quý trước.',
+             'Kiểm tra lại các khoản vay có dấu hiệu quá hạn.',
+             'Document the assumptions used in the model.',
+             'Coordinate with the legal team on the contract wording.']
+COMMENTS = ['Done, please review.', 'Waiting for data from the branch.', 'Updated the numbers.',
+            'Đã cập nhật theo góp ý.', 'Cần bổ sung thêm số liệu.', 'Looks good to me.', 'Moved the deadline.']
+TAG_WORDS = ['credit', 'portfolio', 'monitoring', 'policy', 'reporting', 'basel', 'ifrs9', 'audit', 'urgent-fix',
+             'quarterly', 'model', 'data-quality', 'collateral', 'sme', 'retail', 'corporate', 'liquidity', 'npl']
+CUSTOM_FIELDS = [('Customer', 'text'), ('Loan amount', 'number'), ('Review date', 'date'), ('Branch', 'text'),
+                 ('Risk rating', 'text'), ('Exposure', 'number')]
+ATTACHMENT_TYPES = [('pdf', 'application/pdf'), ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+                    ('docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+                    ('png', 'image/png'), ('csv', 'text/csv')]
+
+
+def seeded_password_hash(password, seed):
+    """werkzeug-format PBKDF2 hash whose salt comes from the seed, unlike generate_password_hash's random one"""
+    salt = hashlib.sha256(f'generate_dataset:{seed}'.encode()).hexdigest()[:16]
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), PASSWORD_ITERATIONS).hex()
+    return f'pbkdf2:sha256:{PASSWORD_ITERATIONS}${salt}${digest}'
+
+
+class BulkWriter:
+    """Buffers rows per table and inserts them parents-first whenever a buffer fills up"""
+
+    ORDER = [Team.__table__, User.__table__, Tag.__table__, AttachmentBlob.__table__, Task.__table__, task_tags,
+             TaskCustomField.__table__, TimeLog.__table__, TaskComment.__table__, TaskHistory.__table__,
+             TaskAttachment.__table__]
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.buffers = {table.name: [] for table in self.ORDER}
+        self.counts = Counter()
+
+    def add(self, table, row):
+        buffer = self.buffers[table.name]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with db.engine.begin() as connection:
+            for table in self.ORDER:
+                rows = self.buffers[table.name]
+                if rows:
+                    connection.execute(insert(table), rows)
+                    self.counts[table.name] += len(rows)
+                    rows.clear()
+
+
+class DatasetGenerator:
+    def __init__(self, seed, start_date, days, batch_size, password):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.start = start_date
+        self.end = start_date + timedelta(days=days)
+        self.writer = BulkWriter(batch_size)
+        self.password_hash = seeded_password_hash(password, seed)
+        self.next_ids = {}
+        for model in (Team, User, Tag, Task, TaskCustomField, TimeLog, TaskComment, TaskHistory, TaskAttachment):
+            self.next_ids[model.__tablename__] = (db.session.query(func.max(model.id)).scalar() or 0) + 1
+        db.session.commit()
+
+    def _id(self, model):
+        value = self.next_ids[model.__tablename__]
+        self.next_ids[model.__tablename__] = value + 1
+        return value
+
+    def _between(self, start, end):
+        if end <= start:
+            return start
+        return start + timedelta(seconds=self.rng.randrange(int((end - start).total_seconds()) or 1))
+
+    def _count(self, average):
+        """Small non-negative count with the given mean"""
+        return self.rng.randint(0, max(int(round(average * 2)), 0))
+
+    def create_teams(self, teams, users_per_team):
+        self.teams = []
+        for _ in range(teams):
+            team_id = self._id(Team)
+            created_at = self._between(self.start - timedelta(days=365), self.start)
+            self.writer.add(Team.__table__, {
+                'id': team_id, 'name': f'Synthetic team {team_id}', 'description': 'Generated by generate_dataset.py',
+                'is_active': True, 'created_at': created_at
+            })
+            members = []
+            for position in range(max(users_per_team, 1)):
+                user_id = self._id(User)
+                role = 'manager' if position == 0 else ('director' if position == 1 and users_per_team > 8 else 'analyst')
+                self.writer.add(User.__table__, {
+                    'id': user_id, 'username': f'synth{user_id}', 'email': f'synth{user_id}@example.com',
+                    'display_name': f'{self.rng.choice(LAST_NAMES)} {self.rng.choice(FIRST_NAMES)}',
+                    'password_hash': self.password_hash, 'role': role,
+                    'is_administrator': not self.teams and position == 0,
+                    'is_active': self.rng.random() > 0.03, 'created_at': created_at, 'team_id': team_id
+                })
+                members.append(user_id)
+            # A few teams carry most of the work
+            self.teams.append({'id': team_id, 'members': members, 'weight': self.rng.paretovariate(1.5)})
+        self.team_weights = list(itertools.accumulate(team['weight'] for team in self.teams))
+
+    def create_tags(self, count):
+        names = [TAG_WORDS[n % len(TAG_WORDS)] + (f'-{n // len(TAG_WORDS) + 1}' if n >= len(TAG_WORDS) else '')
+                 for n in range(count)]
+        # Missing tags go through the writer with a fixed created_at, so same-seed runs match row for row
+        ids = resolve_tag_ids(names, create=False)
+        db.session.commit()
+        for name in names:
+            key = tag_name_key(name)
+            if key not in ids:
+                ids[key] = self._id(Tag)
+                self.writer.add(Tag.__table__, {
+                    'id': ids[key], 'name': name, 'name_key': key, 'usage_count': 0, 'created_at': self.start
+                })
+        self.tag_ids = [ids[tag_name_key(name)] for name in names]
+        # Zipf-like popularity: the first tags are on most tasks
+        self.tag_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(self.tag_ids))))
+
+    def create_blobs(self, count):
+        self.blobs = []
+        for n in range(count):
+            sha256 = hashlib.sha256(f'{self.seed}:{self.next_ids["tasks"]}:{n}'.encode()).hexdigest()
+            size = min(int(self.rng.lognormvariate(11, 1.5)) + 1, 100 * 1024 * 1024)
+            self.writer.add(AttachmentBlob.__table__, {
+                'sha256': sha256, 'size': size, 'ref_count': 0, 'created_at': self.start
+            })
+            self.blobs.append((sha256, size))
+
+    def _task_row(self, team, parent):
+        task_id = self._id(Task)
+        status = self.rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        complexity = self.rng.choices(COMPLEXITIES, COMPLEXITY_WEIGHTS)[0]
+        created_at = self._between(parent['created_at'] if parent else self.start, self.end)
+        started_at = completed_at = None
+        if status != 'todo':
+            started_at = self._between(created_at, min(created_at + timedelta(days=5), self.end))
+        if status == 'completed':
+            completed_at = self._between(started_at, min(started_at + timedelta(
+                hours=COMPLEXITY_HOURS[complexity] * 3), self.end))
+        due_date = None
+        if self.rng.random() < 0.8:
+            due_date = created_at + timedelta(days=self.rng.randint(3, 60))
+        members = team['members']
+        return {
+            'id': task_id,
+            'title': f'{self.rng.choice(TITLE_VERBS)} {self.rng.choice(TITLE_OBJECTS)} {task_id}',
+            'description': ' '.join(self.rng.sample(SENTENCES, self.rng.randint(1, 3))),
+            'status': status,
+            'priority': self.rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+            'complexity': complexity,
+            'created_at': created_at,
+            'updated_at': completed_at or started_at or created_at,
+            'estimated_hours': round(COMPLEXITY_HOURS[complexity] * self.rng.uniform(0.5, 1.5), 1),
+            'actual_hours': 0.0,
+            'started_at': started_at,
+            'due_date': due_date,
+            'completed_at': completed_at,
+            'created_by': members[0] if self.rng.random() < 0.7 else self.rng.choice(members),
+            'assignee_id': self.rng.choice(members) if self.rng.random() < 0.9 else None,
+            'supervisor_id': members[0] if self.rng.random() < 0.5 else None,
+            'team_id': team['id'],
+            'parent_task_id': parent['id'] if parent else None,
+            'total_time_logged': 0.0,
+            'subtask_total': 0,
+            'subtask_completed': 0
+        }
+
+    def _task_tree(self, team, budget, subtask_ratio, parent=None, depth=0):
+        """A task and its generated subtasks, parents first; at most budget tasks"""
+        row = self._task_row(team, parent)
+        tree = [row]
+        chance = subtask_ratio if depth == 0 else subtask_ratio / 4
+        if depth < 2 and self.rng.random() < chance:
+            for _ in range(self.rng.randint(1, 5 if depth == 0 else 3)):
+                if len(tree) >= budget:
+                    break
+                subtree = self._task_tree(team, budget - len(tree), subtask_ratio, row, depth + 1)
+                row['subtask_total'] += 1
+                row['subtask_completed'] += subtree[0]['status'] == 'completed'
+                tree.extend(subtree)
+        return tree
+
+    def _time_logs(self, task, average, active_users):
+        """Time log rows for task; adds their hours to its rollups"""
+        logs = []
+        if not task['started_at']:
+            return logs
+        members = self.team_members[task['team_id']]
+        last = task['completed_at'] or self.end
+        for _ in range(self._count(average)):
+            user_id = task['assignee_id'] if task['assignee_id'] and self.rng.random() < 0.9 else self.rng.choice(members)
+            start_time = self._between(task['started_at'], last)
+            hours = round(self.rng.choice([0.25, 0.5, 1, 1.5, 2, 3, 4]) * self.rng.uniform(0.8, 1.2), 2)
+            logs.append({
+                'id': self._id(TimeLog), 'task_id': task['id'], 'user_id': user_id, 'start_time': start_time,
+                'end_time': start_time + timedelta(hours=hours), 'duration_hours': hours,
+                'description': self.rng.choice(COMMENTS), 'created_at': start_time + timedelta(hours=hours)
+            })
+            task['total_time_logged'] += hours
+        task['total_time_logged'] = round(task['total_time_logged'], 2)
+        task['actual_hours'] = task['total_time_logged']
+
+        # A running timer, at most one per user
+        user_id = task['assignee_id']
+        if task['status'] == 'in_progress' and user_id and user_id not in active_users and self.rng.random() < 0.05:
+            active_users.add(user_id)
+            start_time = self.end - timedelta(minutes=self.rng.randint(5, 180))
+            logs.append({
+                'id': self._id(TimeLog), 'task_id': task['id'], 'user_id': user_id, 'start_time': start_time,
+                'end_time': None, 'duration_hours': None, 'description': None, 'created_at': start_time
+            })
+        return logs
+
+    def _history(self, task, children):
+        def add(action, field_name, old_value, new_value, created_at, user_id):
+            self.writer.add(TaskHistory.__table__, {
+                'id': self._id(TaskHistory), 'task_id': task['id'], 'user_id': user_id, 'action': action,
+                'field_name': field_name, 'old_value': old_value, 'new_value': new_value, 'created_at': created_at
+            })
+
+        actor = task['assignee_id'] or task['created_by']
+        reached = STATUSES.index(task['status'])
+        moments = sorted(self._between(task['started_at'], task['completed_at'] or self.end)
+                         for _ in range(reached)) if reached else []
+        for step, moment in enumerate(moments):
+            add('status_changed', 'status', STATUSES[step], STATUSES[step + 1], moment, actor)
+        if self.rng.random() < 0.2:
+            old, new = self.rng.sample(PRIORITIES, 2)
+            add('updated', 'priority', old, new, self._between(task['created_at'], self.end), task['created_by'])
+        for child in children:
+            add('subtask_created', 'subtask', None, f"Created subtask: {child['title']}", child['created_at'],
+                child['created_by'])
+
+    def _details(self, task, options):
+        rng = self.rng
+        members = self.team_members[task['team_id']]
+        for _ in range(self._count(options.comments_per_task)):
+            created_at = self._between(task['created_at'], self.end)
+            self.writer.add(TaskComment.__table__, {
+                'id': self._id(TaskComment), 'task_id': task['id'], 'user_id': rng.choice(members),
+                'content': rng.choice(COMMENTS), 'created_at': created_at, 'updated_at': created_at
+            })
+
+        if rng.random() < 0.3:
+            for field_name, field_type in rng.sample(CUSTOM_FIELDS, rng.randint(1, 3)):
+                if field_type == 'number':
+                    value = str(rng.randrange(1, 500) * 1000000)
+                elif field_type == 'date':
+                    value = self._between(self.start, self.end).strftime('%Y-%m-%d')
+                else:
+                    value = f'{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}'
+                self.writer.add(TaskCustomField.__table__, {
+                    'id': self._id(TaskCustomField), 'task_id': task['id'], 'field_name': field_name,
+                    'field_value': value, 'field_type': field_type, 'created_at': task['created_at']
+                })
+
+        if self.tag_ids:
+            count = rng.choices(TAGS_PER_TASK, TAGS_PER_TASK_WEIGHTS)[0]
+            picked = dict.fromkeys(rng.choices(self.tag_ids, cum_weights=self.tag_weights, k=count))
+            for tag_id in picked:
+                self.writer.add(task_tags, {'task_id': task['id'], 'tag_id': tag_id})
+
+        if self.blobs and rng.random() < options.attachment_ratio:
+            for _ in range(rng.randint(1, 3)):
+                sha256, size = rng.choice(self.blobs)
+                extension, mime_type = rng.choice(ATTACHMENT_TYPES)
+                self.writer.add(TaskAttachment.__table__, {
+                    'id': self._id(TaskAttachment), 'task_id': task['id'],
+                    'filename': LocalContentStore.key_for(sha256), 'content_hash': sha256,
+                    'original_filename': f'{rng.choice(TITLE_OBJECTS)} {rng.randint(1, 99)}.{extension}',
+                    'file_size': size, 'file_type': mime_type, 'uploaded_by': rng.choice(members),
+                    'uploaded_at': self._between(task['created_at'], self.end)
+                })
+
+    def create_tasks(self, count, options):
+        self.team_members = {team['id']: team['members'] for team in self.teams}
+        active_users = set()
+        created = 0
+        while created < count:
+            team = self.rng.choices(self.teams, cum_weights=self.team_weights)[0]
+            tree = self._task_tree(team, count - created, options.subtask_ratio)
+            for task in tree:
+                logs = self._time_logs(task, options.time_logs_per_task, active_users)
+                self.writer.add(Task.__table__, task)
+                for log in logs:
+                    self.writer.add(TimeLog.__table__, log)
+                children = [child for child in tree if child['parent_task_id'] == task['id']]
+                self._history(task, children)
+                self._details(task, options)
+            created += len(tree)
+            if created // 100000 != (created - len(tree)) // 100000:
+                print(f"  {created} tasks")
+        self.writer.flush()
+
+
+def _reset_sequences():
+    """Move PostgreSQL id sequences past the ids assigned here"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    with db.engine.begin() as connection:
+        for table in ('teams', 'users', 'tags', 'tasks', 'task_custom_fields', 'time_logs', 'task_comments',
+                      'task_history', 'task_attachments'):
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+            ))
+
+
+def _recount_blob_references():
+    blobs = AttachmentBlob.__table__
+    attachments = TaskAttachment.__table__
+    references = db.select(func.count()).where(attachments.c.content_hash == blobs.c.sha256).scalar_subquery()
+    with db.engine.begin() as connection:
+        connection.execute(blobs.update().values(ref_count=references))
+
+
+def generate_dataset(options):
+    with app.app_context():
+        started = datetime.now()
+        start_date = datetime.strptime(options.start_date, '%Y-%m-%d')
+        generator = DatasetGenerator(options.seed, start_date, options.days, options.batch_size, options.password)
+
+        generator.create_teams(options.teams, options.users_per_team)
+        generator.create_tags(options.tags)
+        generator.create_blobs(int(options.tasks * options.attachment_ratio * 0.7))
+        generator.create_tasks(options.tasks, options)
+
+        _reset_sequences()
+        _recount_blob_references()
+        manager = DataManager()
+        manager.rebuild_tag_usage_counts()
+        buckets = manager.rebuild_time_log_daily()
+        indexed = rebuild_search_index()
+
+        for table in BulkWriter.ORDER:
+            print(f"{table.name}: {generator.writer.counts[table.name]} rows")
+        print(f"Rebuilt {buckets} daily time buckets and indexed {indexed} tasks for search")
+        print(f"Done in {(datetime.now() - started).total_seconds():.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--users-per-team', type=int, default=15)
+    parser.add_argument('--tasks', type=int, default=100000, help='total tasks, subtasks included')
+    parser.add_argument('--tags', type=int, default=200)
+    parser.add_argument('--subtask-ratio', type=float, default=0.2, help='share of top-level tasks with subtasks')
+    parser.add_argument('--time-logs-per-task', type=float, default=3)
+    parser.add_argument('--comments-per-task', type=float, default=1)
+    parser.add_argument('--attachment-ratio', type=float, default=0.15, help='share of tasks with attachments')
+    parser.add_argument('--start-date', default=DEFAULT_START_DATE, help='first day of generated activity (YYYY-MM-DD)')
+    parser.add_argument('--days', type=int, default=365, help='days of activity to spread the data over')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='rows per INSERT batch')
+    parser.add_argument('--password', default='password', help='password for every generated user')
+    generate_dataset(parser.parse_args())
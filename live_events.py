@@ -0,0 +1,297 @@
+"""
+Live board updates pushed to browsers as server-sent events.
+
+Task and time-log changes are collected from the ORM session as it flushes and
+published once the transaction commits, to the task's team channel
+("team:<id>") and to "all" (administrators without a team filter). Rolled back
+changes are never published.
+
+The in-process broker only reaches streams served by the same process. With
+several gunicorn workers set LIVE_EVENTS_BACKEND=postgres: events then travel
+through PostgreSQL LISTEN/NOTIFY and every worker fans them out to its own
+streams. Each open stream holds a worker thread, so run gunicorn with threaded
+or gevent workers; streams end after LIVE_EVENTS_MAX_STREAM seconds and the
+browser reconnects.
+"""
+import itertools
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect, select as sql_select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app import app, db
+from models import Task, TimeLog
+
+ALL_CHANNEL = 'all'
+NOTIFY_CHANNEL = 'taskflow_events'
+SUBSCRIBER_QUEUE_SIZE = 200
+
+# Task columns shown on a board card; changing any of them re-renders the card
+CARD_ATTRIBUTES = ('title', 'description', 'assignee_id', 'supervisor_id', 'team_id', 'complexity',
+                   'estimated_hours', 'due_date', 'subtask_total', 'subtask_completed')
+
+
+def team_channel(team_id) -> str:
+    return f'team:{team_id}' if team_id else ALL_CHANNEL
+
+
+class Subscription:
+    """Queue of events for one open stream"""
+
+    def __init__(self, broker: 'InProcessBroker', channel: str):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, payload: Dict):
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            # The client is not keeping up; it will be told to resync
+            self.overflowed = True
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Publish/subscribe between threads of a single process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channels: Iterable[str], payload: Dict):
+        self._deliver(channels, payload)
+
+    def _deliver(self, channels: Iterable[str], payload: Dict):
+        with self._lock:
+            targets = [s for channel in set(channels) for s in self._subscribers.get(channel, ())]
+        for subscription in targets:
+            subscription.put(payload)
+
+
+class PostgresNotifyBroker(InProcessBroker):
+    """Cross-process broker: NOTIFY on publish, one LISTEN connection per process"""
+
+    def __init__(self, dsn: str):
+        super().__init__()
+        self.dsn = dsn
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> Subscription:
+        self._ensure_listener()
+        return super().subscribe(channel)
+
+    def publish(self, channels: Iterable[str], payload: Dict):
+        message = json.dumps({'channels': sorted(set(channels)), 'event': payload})
+        with db.engine.begin() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :message)"),
+                               {'channel': NOTIFY_CHANNEL, 'message': message})
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='live-events-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg2
+
+        while True:
+            try:
+                connection = psycopg2.connect(self.dsn)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                while True:
+                    if select.select([connection], [], [], 30) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        message = json.loads(notify.payload)
+                        self._deliver(message['channels'], message['event'])
+            except Exception as e:
+                logging.warning(f"Live events listener lost its connection, retrying: {e}")
+                time.sleep(5)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> InProcessBroker:
+    """Broker selected by LIVE_EVENTS_BACKEND ('memory' or 'postgres')"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if app.config.get('LIVE_EVENTS_BACKEND') == 'postgres':
+                # From config rather than db.engine, which needs an application context
+                url = make_url(app.config['SQLALCHEMY_DATABASE_URI']).set(drivername='postgresql')
+                _broker = PostgresNotifyBroker(url.render_as_string(hide_password=False))
+            else:
+                _broker = InProcessBroker()
+        return _broker
+
+
+def event_stream(channel: str, keepalive: float = 15, max_duration: float = 300):
+    """Server-sent event frames for one channel until max_duration passes.
+
+    Subscribes right away, in the view, because the frames are generated after
+    the request and application contexts have been torn down.
+    """
+    return _event_frames(get_broker().subscribe(channel), keepalive, max_duration)
+
+
+def _event_frames(subscription: Subscription, keepalive: float, max_duration: float):
+    event_ids = itertools.count(1)
+    deadline = time.monotonic() + max_duration
+    try:
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            payload = subscription.get(timeout=keepalive)
+            if subscription.overflowed:
+                yield 'event: resync\ndata: {}\n\n'
+                return
+            if payload is None:
+                yield ': keepalive\n\n'
+                continue
+            yield f"id: {next(event_ids)}\nevent: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        subscription.close()
+
+
+def _changed(state, attribute: str) -> bool:
+    return state.attrs[attribute].history.has_changes()
+
+
+def _old_value(state, attribute: str):
+    deleted = state.attrs[attribute].history.deleted
+    return deleted[0] if deleted else None
+
+
+def _id(value) -> str:
+    return str(value) if value is not None else ''
+
+
+def _task_event(event_type: str, state, **extra) -> Dict:
+    values = state.dict
+    payload = {
+        'type': event_type,
+        'task_id': _id(values.get('id')),
+        'team_id': _id(values.get('team_id')),
+        'status': values.get('status'),
+        'priority': values.get('priority'),
+        'assignee_id': _id(values.get('assignee_id')),
+        'total_logged': values.get('total_time_logged') or 0,
+    }
+    payload.update(extra)
+    return payload
+
+
+def _task_change_events(state) -> List[Dict]:
+    events = []
+    # Every event from this change says where the task came from, so clients can move it
+    extra = {}
+    if _changed(state, 'team_id'):
+        extra['old_team_id'] = _id(_old_value(state, 'team_id'))
+    if _changed(state, 'assignee_id'):
+        extra['old_assignee_id'] = _id(_old_value(state, 'assignee_id'))
+    if _changed(state, 'status'):
+        extra['old_status'] = _old_value(state, 'status')
+        events.append(_task_event('task.status', state, **extra))
+    if _changed(state, 'priority'):
+        events.append(_task_event('task.priority', state, **extra))
+    if _changed(state, 'total_time_logged'):
+        events.append(_task_event('task.time', state, **extra))
+    if any(_changed(state, attribute) for attribute in CARD_ATTRIBUTES):
+        events.append(_task_event('task.updated', state, **extra))
+    return events
+
+
+def _task_team_id(session, task_id):
+    task = session.identity_map.get(identity_key(Task, task_id))
+    if task is not None:
+        return inspect(task).dict.get('team_id')
+    return session.connection().execute(sql_select(Task.team_id).where(Task.id == task_id)).scalar()
+
+
+def _time_log_event(event_type: str, session, time_log: TimeLog) -> Dict:
+    return {
+        'type': event_type,
+        'task_id': _id(time_log.task_id),
+        'team_id': _id(_task_team_id(session, time_log.task_id)),
+        'time_log_id': _id(time_log.id),
+        'user_id': _id(time_log.user_id),
+        'duration_hours': time_log.duration_hours,
+    }
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_live_events(session, flush_context):
+    events = []
+    for obj in session.new:
+        if isinstance(obj, Task):
+            events.append(_task_event('task.created', inspect(obj)))
+        elif isinstance(obj, TimeLog) and obj.end_time is None:
+            events.append(_time_log_event('timelog.started', session, obj))
+    for obj in session.dirty:
+        if isinstance(obj, Task):
+            events.extend(_task_change_events(inspect(obj)))
+        elif isinstance(obj, TimeLog) and _changed(inspect(obj), 'end_time') and obj.end_time is not None:
+            events.append(_time_log_event('timelog.stopped', session, obj))
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            events.append(_task_event('task.deleted', inspect(obj)))
+    if events:
+        session.info.setdefault('live_events', []).extend(events)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_live_events(session):
+    events = session.info.pop('live_events', None)
+    if not events:
+        return
+    broker = get_broker()
+    for payload in events:
+        channels = {ALL_CHANNEL, team_channel(payload.get('team_id')), team_channel(payload.get('old_team_id'))}
+        try:
+            broker.publish(channels, payload)
+        except Exception as e:
+            logging.warning(f"Could not publish live event {payload['type']}: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_live_events(session):
+    session.info.pop('live_events', None)
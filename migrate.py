@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Apply pending schema migrations from schema_migrations.py in version order
+"""
+
+import argparse
+
+from app import app
+from schema_migrations import (MIGRATIONS, applied_versions, migration_statements, pending_migrations,
+                               run_migrations)
+
+def show_status():
+    applied = applied_versions()
+    for migration in MIGRATIONS:
+        state = 'applied' if migration.version in applied else 'pending'
+        print(f"{migration.version:4d}  {state:8s}  {migration.name}")
+
+def migrate(dry_run=False):
+    with app.app_context():
+        pending = pending_migrations()
+        if not pending:
+            print("Schema is up to date")
+            return
+
+        if dry_run:
+            for migration in pending:
+                print(f"-- {migration.version}: {migration.name}")
+                for statement in migration_statements(migration):
+                    print(statement if statement.startswith('--') else f"{statement};")
+            return
+
+        for migration in run_migrations():
+            print(f"Applied migration {migration.version}: {migration.name}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='print the SQL instead of running it')
+    parser.add_argument('--status', action='store_true', help='list migrations and whether they are applied')
+    args = parser.parse_args()
+    if args.status:
+        with app.app_context():
+            show_status()
+    else:
+        migrate(args.dry_run)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Move attachments uploaded before content-addressed storage (flat uploads/<uuid>.<ext>)
+into the ab/cd/<sha256> layout, sharing one blob between identical files
+(run migrate.py first; migration 4 adds task_attachments.content_hash)
+"""
+
+import argparse
+
+from app import app, db
+from models import TaskAttachment
+from attachment_storage import add_blob_reference, delete_stored_file, get_storage
+
+DEFAULT_BATCH_SIZE = 200
+
+def migrate_attachments(batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    with app.app_context():
+        storage = get_storage()
+        migrated = missing = stored_bytes = reclaimed_bytes = 0
+        last_id = 0
+        while True:
+            batch = TaskAttachment.query.filter(
+                TaskAttachment.content_hash.is_(None), TaskAttachment.id > last_id
+            ).order_by(TaskAttachment.id).limit(batch_size).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            legacy_keys = []
+            for attachment in batch:
+                if not storage.exists(attachment.filename):
+                    print(f"  Missing file for attachment {attachment.id}: {attachment.filename}")
+                    missing += 1
+                    continue
+                if dry_run:
+                    migrated += 1
+                    continue
+                with storage.open(attachment.filename) as source:
+                    stored = storage.save(source)
+                add_blob_reference(stored)
+                legacy_keys.append(attachment.filename)
+                attachment.filename = stored.key
+                attachment.content_hash = stored.sha256
+                attachment.file_size = stored.size
+                migrated += 1
+                if stored.created:
+                    stored_bytes += stored.size
+                else:
+                    reclaimed_bytes += stored.size
+
+            if not dry_run:
+                db.session.commit()
+                # Legacy files are only removed once their rows point at the blobs
+                for key in legacy_keys:
+                    delete_stored_file(key)
+            print(f"Processed attachments up to id {last_id}...")
+
+        action = "Would migrate" if dry_run else "Migrated"
+        print(f"\n{action} {migrated} attachments ({missing} with missing files)")
+        if not dry_run:
+            print(f"Stored {stored_bytes:,} bytes; {reclaimed_bytes:,} bytes were duplicates and are now shared")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be migrated')
+    args = parser.parse_args()
+    migrate_attachments(batch_size=args.batch_size, dry_run=args.dry_run)
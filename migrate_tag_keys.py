@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Recompute tags.name_key for every tag, merging tags whose names differ only in case
+(migration 3 in schema_migrations.py adds the column and does this once)
+"""
+
+import argparse
+
+from app import app
+from tag_resolver import TAG_BATCH_SIZE, rekey_tags
+
+def migrate_tag_keys(batch_size=TAG_BATCH_SIZE, dry_run=False):
+    with app.app_context():
+        keyed, merged, groups = rekey_tags(batch_size, dry_run)
+        action = "Would key" if dry_run else "Keyed"
+        print(f"{action} {keyed} tags; {merged} case-duplicates {'would be' if dry_run else 'were'} "
+              f"merged into {groups} tags")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=TAG_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='only report what would change')
+    args = parser.parse_args()
+    migrate_tag_keys(args.batch_size, args.dry_run)
@@ -1,12 +1,16 @@
 from app import db
+import unicodedata
 from datetime import datetime
 from typing import Optional
+from sqlalchemy.orm import validates
 
 
 task_tags = db.Table(
     'task_tags',
     db.Column('task_id', db.Integer, db.ForeignKey('tasks.id'), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True),
+    # Tasks of a tag, newest first, without touching the primary key's task_id-first order
+    db.Index('idx_task_tags_tag', 'tag_id', 'task_id')
 )
 
 class User(db.Model):
@@ -53,6 +57,17 @@ class User(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Case-insensitive email lookups (DataManager.get_user_by_email)
+db.Index('idx_users_email_lower', db.func.lower(User.email))
+
+class SessionRevocation(db.Model):
+    """Session snapshots of this user issued before revoked_at are no longer trusted, in any worker"""
+    __tablename__ = 'session_revocations'
+    
+    # No foreign key: the revocation has to outlive a deleted user
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    revoked_at = db.Column(db.Float, nullable=False, index=True)  # time.time(), like the snapshot's issued_at
+
 class Team(db.Model):
     __tablename__ = 'teams'
     
@@ -109,6 +124,11 @@ class Task(db.Model):
     team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=True)
     parent_task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=True)  # For sub-tasks
     
+    # Maintained rollups (rebuilt in bulk by rebuild_rollups.py)
+    total_time_logged = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    subtask_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    subtask_completed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Sub-task relationships
     parent_task = db.relationship('Task', remote_side=[id], backref=db.backref('subtasks', lazy='dynamic'))
 
@@ -125,37 +145,28 @@ class Task(db.Model):
         lazy='selectin'
     )
     
-    # Indexes for better performance
+    # Indexes for better performance; schema_migrations.py adds them to existing databases
     __table_args__ = (
         db.Index('idx_task_status', 'status'),
-        db.Index('idx_task_assignee', 'assignee_id'),
         db.Index('idx_task_created_by', 'created_by'),
-        db.Index('idx_task_team', 'team_id'),
+        # Board columns and counts per team, newest first
+        db.Index('idx_task_team_status', 'team_id', 'status', 'id'),
+        db.Index('idx_task_assignee_status', 'assignee_id', 'status'),
+        db.Index('idx_task_parent_created', 'parent_task_id', 'created_at'),
+        db.Index('idx_task_due_date', 'due_date',
+                 sqlite_where=db.text('due_date IS NOT NULL'), postgresql_where=db.text('due_date IS NOT NULL')),
     )
     
     def __repr__(self):
         return f'<Task {self.title}>'
     
     def get_total_time_logged(self):
-        """Calculate total time logged from time entries"""
-        # Import here to avoid circular imports
-        from models import TimeLog
-        time_logs = TimeLog.query.filter_by(task_id=self.id).all()
-        return sum(log.duration_hours for log in time_logs if log.duration_hours) or 0.0
+        """Total time logged from time entries (maintained rollup)"""
+        return self.total_time_logged or 0.0
     
     def get_subtask_progress(self):
         """Calculate progress based on completed subtasks"""
-        subtask_list = list(self.subtasks.all()) if self.subtasks else []
-        if not subtask_list:
-            return None
-        
-        total_subtasks = len(subtask_list)
-        completed_subtasks = len([st for st in subtask_list if st.status == 'completed'])
-        
-        if total_subtasks == 0:
-            return 0
-        
-        return (completed_subtasks / total_subtasks) * 100
+        return _subtask_progress(self.subtask_total, self.subtask_completed)
     
     def is_subtask(self):
         """Check if this task is a subtask"""
@@ -163,9 +174,7 @@ class Task(db.Model):
     
     def can_be_completed(self):
         """Check if task can be completed (all subtasks must be completed)"""
-        subtask_list = list(self.subtasks.all()) if self.subtasks else []
-        incomplete_subtasks = [st for st in subtask_list if st.status != 'completed']
-        return len(incomplete_subtasks) == 0
+        return _subtasks_all_completed(self.subtask_total, self.subtask_completed)
     
     def get_time_variance(self):
         """Calculate variance between estimated and actual time"""
@@ -174,34 +183,71 @@ class Task(db.Model):
         return None
     
     def to_dict(self):
-        return {
-            'id': str(self.id),
-            'title': self.title,
-            'description': self.description,
-            'status': self.status,
-            'priority': self.priority,
-            'complexity': self.complexity,
-            'assignee_id': str(self.assignee_id) if self.assignee_id else None,
-            'created_by': str(self.created_by),
-            'team_id': str(self.team_id) if self.team_id else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'estimated_hours': self.estimated_hours,
-            'actual_hours': self.actual_hours,
-            'started_at': self.started_at.isoformat() if self.started_at else None,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'total_time_logged': self.get_total_time_logged(),
-            'time_variance': self.get_time_variance(),
-            'parent_task_id': str(self.parent_task_id) if self.parent_task_id else None,
-            'subtask_progress': self.get_subtask_progress(),
-            'subtask_count': self.subtasks.count() if self.subtasks else 0,
-            'is_subtask': self.is_subtask(),
-            'can_be_completed': self.can_be_completed(),
-            'tags': [tag.to_dict() for tag in self.tags],
-            'tag_names': [tag.name for tag in self.tags],
-            'custom_fields': [field.to_dict() for field in self.custom_fields]
-        }
+        return serialize_tasks([self])[0]
+
+
+# Task.to_dict() fields, in output order
+_TASK_FIELD_GETTERS = {
+    'id': lambda task: str(task.id),
+    'title': lambda task: task.title,
+    'description': lambda task: task.description,
+    'status': lambda task: task.status,
+    'priority': lambda task: task.priority,
+    'complexity': lambda task: task.complexity,
+    'assignee_id': lambda task: str(task.assignee_id) if task.assignee_id else None,
+    'created_by': lambda task: str(task.created_by),
+    'team_id': lambda task: str(task.team_id) if task.team_id else None,
+    'created_at': lambda task: task.created_at.isoformat() if task.created_at else None,
+    'updated_at': lambda task: task.updated_at.isoformat() if task.updated_at else None,
+    'estimated_hours': lambda task: task.estimated_hours,
+    'actual_hours': lambda task: task.actual_hours,
+    'started_at': lambda task: task.started_at.isoformat() if task.started_at else None,
+    'due_date': lambda task: task.due_date.isoformat() if task.due_date else None,
+    'completed_at': lambda task: task.completed_at.isoformat() if task.completed_at else None,
+    'total_time_logged': lambda task: task.get_total_time_logged(),
+    'time_variance': lambda task: task.get_time_variance(),
+    'parent_task_id': lambda task: str(task.parent_task_id) if task.parent_task_id else None,
+    'subtask_progress': lambda task: task.get_subtask_progress(),
+    'subtask_count': lambda task: task.subtask_total or 0,
+    'is_subtask': lambda task: task.is_subtask(),
+    'can_be_completed': lambda task: task.can_be_completed(),
+    'tags': lambda task: [tag.to_dict() for tag in task.tags],
+    'tag_names': lambda task: [tag.name for tag in task.tags],
+    'custom_fields': lambda task: [field.to_dict() for field in task.custom_fields],
+}
+
+TASK_DICT_FIELDS = tuple(_TASK_FIELD_GETTERS)
+
+# Cheap subset for board cards and listings: columns only, no relationships
+TASK_CARD_FIELDS = (
+    'id', 'title', 'status', 'priority', 'complexity', 'assignee_id', 'created_by',
+    'team_id', 'estimated_hours', 'actual_hours', 'due_date', 'parent_task_id', 'is_subtask'
+)
+
+
+def _subtask_progress(total, completed):
+    if not total:
+        return None
+    return (completed / total) * 100
+
+
+def _subtasks_all_completed(total, completed):
+    return (completed or 0) >= (total or 0)
+
+
+def serialize_tasks(tasks, fields=None):
+    """Serialize tasks like Task.to_dict() without per-task queries.
+    
+    Time and subtask figures come from the rollup columns on each row.
+    ``fields`` limits the output keys (e.g. TASK_CARD_FIELDS); default is all.
+    """
+    wanted = [name for name in TASK_DICT_FIELDS if fields is None or name in fields]
+    return [{name: _TASK_FIELD_GETTERS[name](task) for name in wanted} for task in tasks]
+
+
+def tag_name_key(name: str) -> str:
+    """Case- and form-insensitive lookup key for a tag name"""
+    return unicodedata.normalize('NFC', name.strip()).casefold()
 
 
 class Tag(db.Model):
@@ -209,10 +255,24 @@ class Tag(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
+    # tag_name_key(name), kept in step by set_name_key; lookups go through its unique index
+    name_key = db.Column(db.String(100), nullable=False)
     color = db.Column(db.String(20), nullable=True)
+    # Tasks carrying the tag, kept by DataManager wherever task tags change
+    usage_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
-    tasks = db.relationship('Task', secondary=task_tags, back_populates='tags', lazy='selectin')
+    # Never loaded with the tag: a popular tag would pull in a large share of all tasks
+    tasks = db.relationship('Task', secondary=task_tags, back_populates='tags', lazy='dynamic')
+
+    __table_args__ = (
+        db.Index('idx_tags_name_key', 'name_key', unique=True),
+    )
+
+    @validates('name')
+    def set_name_key(self, key, name):
+        self.name_key = tag_name_key(name)
+        return name
 
     def __repr__(self):
         return f'<Tag {self.name}>'
@@ -222,6 +282,7 @@ class Tag(db.Model):
             'id': str(self.id),
             'name': self.name,
             'color': self.color,
+            'usage_count': self.usage_count or 0,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
@@ -251,20 +312,36 @@ class TaskCustomField(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class AttachmentBlob(db.Model):
+    """Stored file content, shared by every attachment with the same SHA-256"""
+    __tablename__ = 'attachment_blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AttachmentBlob {self.sha256[:12]} refs={self.ref_count}>'
+
 class TaskAttachment(db.Model):
     __tablename__ = 'task_attachments'
     
-    def __init__(self, task_id=None, filename=None, original_filename=None, file_size=None, file_type=None, uploaded_by=None):
+    def __init__(self, task_id=None, filename=None, original_filename=None, file_size=None, file_type=None, uploaded_by=None,
+                 content_hash=None):
         self.task_id = task_id
         self.filename = filename
         self.original_filename = original_filename
         self.file_size = file_size
         self.file_type = file_type
         self.uploaded_by = uploaded_by
+        self.content_hash = content_hash
     
     id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=False)
+    # Storage key relative to the upload root: ab/cd/<sha256>, or uuid.ext for files not yet migrated
     filename = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64), db.ForeignKey('attachment_blobs.sha256'), nullable=True, index=True)
     original_filename = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)  # Size in bytes
     file_type = db.Column(db.String(100), nullable=True)  # MIME type
@@ -286,6 +363,7 @@ class TaskAttachment(db.Model):
             'original_filename': self.original_filename,
             'file_size': self.file_size,
             'file_type': self.file_type,
+            'content_hash': self.content_hash,
             'uploaded_by': str(self.uploaded_by),
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
         }
@@ -303,6 +381,38 @@ class TaskAttachment(db.Model):
         return f"{size:.1f} TB"
 
 
+class UploadSession(db.Model):
+    """A chunked upload in progress; received is the last acknowledged offset"""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    file_type = db.Column(db.String(100), nullable=True)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_upload_session_updated', 'updated_at'),
+    )
+
+    def __repr__(self):
+        return f'<UploadSession {self.id}: {self.received}/{self.total_size}>'
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'task_id': str(self.task_id),
+            'filename': self.original_filename,
+            'size': self.total_size,
+            'offset': self.received,
+            'complete': self.received == self.total_size
+        }
+
+
 class TimeLog(db.Model):
     __tablename__ = 'time_logs'
     
@@ -324,6 +434,9 @@ class TimeLog(db.Model):
         db.Index('idx_time_log_task', 'task_id'),
         db.Index('idx_time_log_user', 'user_id'),
         db.Index('idx_time_log_date', 'start_time'),
+        # Running timers only: a handful of rows however long the history grows
+        db.Index('idx_time_log_active', 'user_id', 'task_id',
+                 sqlite_where=db.text('end_time IS NULL'), postgresql_where=db.text('end_time IS NULL')),
     )
     
     def __repr__(self):
@@ -348,6 +461,32 @@ class TimeLog(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class TimeLogDaily(db.Model):
+    """Closed time logged per day, user, task and team, for reports over long ranges.
+
+    The day is the log's start date and the team is the task's team when the log
+    closed. Readers always SUM over the key, so a bucket that was inserted twice
+    by concurrent requests still adds up correctly.
+    """
+    __tablename__ = 'time_log_daily'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=False)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=True)
+    hours = db.Column(db.Float, nullable=False, default=0.0)
+    log_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Indexes
+    __table_args__ = (
+        db.Index('idx_time_log_daily_key', 'day', 'user_id', 'task_id', 'team_id'),
+        db.Index('idx_time_log_daily_team_day', 'team_id', 'day'),
+    )
+
+    def __repr__(self):
+        return f'<TimeLogDaily {self.day}: User {self.user_id} Task {self.task_id} - {self.hours}h>'
+
 class TaskComment(db.Model):
     __tablename__ = 'task_comments'
     
@@ -420,3 +559,52 @@ class TaskHistory(db.Model):
                 'display_name': self.user.display_name or self.user.username
             } if self.user else None
         }
+
+class TaskHistoryOutbox(db.Model):
+    """History entries of one large transaction, waiting to be moved into task_history"""
+    __tablename__ = 'task_history_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entries = db.Column(db.Text, nullable=False)  # JSON list of task_history rows
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class SchemaMigration(db.Model):
+    """A schema migration from schema_migrations.py that has been applied"""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ImportCheckpoint(db.Model):
+    """Sheet offset of the last imported chunk of a task sheet, committed with that chunk (task_import.py)"""
+    __tablename__ = 'import_checkpoints'
+    
+    source = db.Column(db.String(500), primary_key=True)  # absolute path of the sheet
+    source_size = db.Column(db.BigInteger, nullable=False)
+    source_mtime = db.Column(db.Integer, nullable=False)
+    next_offset = db.Column(db.Integer, nullable=False, default=0)
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SlowQuery(db.Model):
+    """Statements slower than SLOW_QUERY_THRESHOLD_MS, aggregated by shape and endpoint (slow_query_log.py)"""
+    __tablename__ = 'slow_queries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    shape_hash = db.Column(db.String(40), nullable=False)
+    endpoint = db.Column(db.String(200), nullable=False)
+    statement = db.Column(db.Text, nullable=False)  # SQL with literals folded to ?
+    parameter_shape = db.Column(db.Text, nullable=True)  # JSON: parameter names/positions and types
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    total_ms = db.Column(db.Float, nullable=False, default=0.0)
+    max_ms = db.Column(db.Float, nullable=False, default=0.0)
+    first_seen = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_seen = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    plan = db.Column(db.Text, nullable=True)
+    plan_captured_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('idx_slow_query_shape', 'shape_hash', 'endpoint', unique=True),
+        db.Index('idx_slow_query_total', 'total_ms'),
+    )
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Rebuild the task rollup columns (total_time_logged, subtask_total, subtask_completed)
+from time_logs and subtasks, tag usage counts from task_tags, and the time_log_daily
+report rollup from time_logs (the columns themselves come from migrate.py)
+"""
+
+import argparse
+from datetime import datetime
+
+from app import app
+from data_manager import DataManager
+
+def rebuild_rollups(daily_only=False, start_date=None, end_date=None):
+    with app.app_context():
+        manager = DataManager()
+        if not daily_only:
+            updated = manager.rebuild_task_rollups()
+            print(f"Rebuilt rollups for {updated} tasks")
+            tags = manager.rebuild_tag_usage_counts()
+            print(f"Recounted usage for {tags} tags")
+
+        buckets = manager.rebuild_time_log_daily(start_date, end_date)
+        print(f"Rebuilt {buckets} daily time buckets")
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--daily-only', action='store_true', help='only rebuild time_log_daily')
+    parser.add_argument('--start-date', type=parse_date, help='first day to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--end-date', type=parse_date, help='last day to rebuild (YYYY-MM-DD)')
+    args = parser.parse_args()
+    rebuild_rollups(daily_only=args.daily_only, start_date=args.start_date, end_date=args.end_date)
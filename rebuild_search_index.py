@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Rebuild the task full-text search index (FTS5 on SQLite, tsvector on PostgreSQL);
+migrate.py creates the index structures
+"""
+
+from app import app
+from search_index import rebuild_search_index, get_backend
+
+def rebuild():
+    with app.app_context():
+        indexed = rebuild_search_index()
+        print(f"Indexed {indexed} tasks using the {get_backend()} backend")
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,165 @@
+"""
+Streaming CSV and XLSX exports of time logs and tasks.
+
+Rows are read through server-side cursors (yield_per) as plain column tuples, never
+as ORM objects. CSV is generated line by line straight into the response. XLSX is
+written with openpyxl's write-only workbook, which spools rows to disk, into a
+temporary file that is then streamed back in blocks. Either way memory use does not
+grow with the number of rows exported.
+"""
+import csv
+import re
+import tempfile
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional, Sequence
+
+from flask import Response, stream_with_context
+from openpyxl import Workbook
+from sqlalchemy.orm import aliased
+
+from app import db
+from models import User, Task, Team, TimeLog
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+EXPORT_BATCH_SIZE = 1000
+XLSX_BLOCK_SIZE = 64 * 1024
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+TIME_LOG_COLUMNS = ['Date', 'Start', 'End', 'Hours', 'User', 'Email', 'Task ID', 'Task', 'Team', 'Description']
+
+TASK_COLUMNS = ['Task ID', 'Title', 'Status', 'Priority', 'Complexity', 'Team', 'Assignee', 'Supervisor',
+                'Estimated Hours', 'Logged Hours', 'Due Date', 'Created', 'Started', 'Completed']
+
+# Spreadsheet apps evaluate cells starting with these as formulas
+_FORMULA_PREFIXES = ('=', '+', '-', '@')
+# Control characters that are not allowed in XLSX cells
+_ILLEGAL_XLSX_CHARS = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+
+
+def _day_bounds(start_date: Optional[datetime], end_date: Optional[datetime]):
+    """Whole-day range [start day 00:00, day after end day 00:00), as the report buckets it"""
+    start = datetime.combine(start_date.date(), datetime.min.time()) if start_date else None
+    end = datetime.combine(end_date.date() + timedelta(days=1), datetime.min.time()) if end_date else None
+    return start, end
+
+
+def _display_name(display_name, username):
+    return display_name or username or ''
+
+
+def time_log_rows(team_id: Optional[str] = None, start_date: Optional[datetime] = None,
+                  end_date: Optional[datetime] = None) -> Iterator[tuple]:
+    """Time logs in the report's date range, oldest first, as TIME_LOG_COLUMNS tuples"""
+    start, end = _day_bounds(start_date, end_date)
+    query = db.session.query(
+        TimeLog.start_time, TimeLog.end_time, TimeLog.duration_hours, TimeLog.description,
+        User.display_name, User.username, User.email, Task.id, Task.title, Team.name
+    ).join(User, TimeLog.user_id == User.id).join(
+        Task, TimeLog.task_id == Task.id
+    ).outerjoin(Team, Task.team_id == Team.id)
+    if start:
+        query = query.filter(TimeLog.start_time >= start)
+    if end:
+        query = query.filter(TimeLog.start_time < end)
+    if team_id:
+        query = query.filter(Task.team_id == int(team_id))
+
+    for row in query.order_by(TimeLog.start_time, TimeLog.id).yield_per(EXPORT_BATCH_SIZE):
+        (start_time, end_time, hours, description, display_name, username, email,
+         task_id, task_title, team_name) = row
+        yield (start_time.date(), start_time, end_time, round(hours, 2) if hours is not None else None,
+               _display_name(display_name, username), email, task_id, task_title, team_name, description)
+
+
+def task_rows(team_id: Optional[str] = None, status: Optional[str] = None,
+              start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Iterator[tuple]:
+    """Tasks created in the date range, by id, as TASK_COLUMNS tuples"""
+    assignee = aliased(User)
+    supervisor = aliased(User)
+    start, end = _day_bounds(start_date, end_date)
+    query = db.session.query(
+        Task.id, Task.title, Task.status, Task.priority, Task.complexity, Team.name,
+        assignee.display_name, assignee.username, supervisor.display_name, supervisor.username,
+        Task.estimated_hours, Task.total_time_logged, Task.due_date, Task.created_at,
+        Task.started_at, Task.completed_at
+    ).outerjoin(Team, Task.team_id == Team.id).outerjoin(
+        assignee, Task.assignee_id == assignee.id
+    ).outerjoin(supervisor, Task.supervisor_id == supervisor.id)
+    if team_id:
+        query = query.filter(Task.team_id == int(team_id))
+    if status:
+        query = query.filter(Task.status == status)
+    if start:
+        query = query.filter(Task.created_at >= start)
+    if end:
+        query = query.filter(Task.created_at < end)
+
+    for row in query.order_by(Task.id).yield_per(EXPORT_BATCH_SIZE):
+        (task_id, title, task_status, priority, complexity, team_name, assignee_display, assignee_username,
+         supervisor_display, supervisor_username, estimated, logged, due_date, created_at,
+         started_at, completed_at) = row
+        yield (task_id, title, task_status, priority, complexity, team_name,
+               _display_name(assignee_display, assignee_username),
+               _display_name(supervisor_display, supervisor_username),
+               estimated, round(logged or 0, 2), due_date, created_at, started_at, completed_at)
+
+
+def _safe_text(value):
+    """Keep user-entered text from being read as a formula"""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _LineBuffer:
+    """File-like target that hands each CSV line back instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(header: Sequence[str], rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_LineBuffer())
+    # Byte order mark so Excel opens the file as UTF-8 (Vietnamese names)
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([
+            value.isoformat(sep=' ') if isinstance(value, datetime) else _safe_text(value)
+            for value in row
+        ])
+
+
+def xlsx_stream(header: Sequence[str], rows: Iterable[tuple], sheet_title: str) -> Iterator[bytes]:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(list(header))
+    for row in rows:
+        sheet.append([
+            _ILLEGAL_XLSX_CHARS.sub('', _safe_text(value)) if isinstance(value, str) else value
+            for value in row
+        ])
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            block = output.read(XLSX_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+def export_response(rows: Iterable[tuple], header: Sequence[str], filename: str, export_format: str,
+                    sheet_title: str = 'Export') -> Response:
+    """Streamed download of rows as CSV or XLSX; filename has no extension"""
+    if export_format == 'xlsx':
+        body = xlsx_stream(header, rows, sheet_title)
+        mimetype = XLSX_MIMETYPE
+    else:
+        body = csv_stream(header, rows)
+        mimetype = 'text/csv'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}.{export_format}"',
+        'X-Accel-Buffering': 'no'
+    })
@@ -1,57 +1,162 @@
-from flask import render_template, request, redirect, url_for, flash, session, jsonify, send_file
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response
 from app import app, db
-from data_manager import data_manager
-from models import Team, TaskAttachment, Task
+from data_manager import data_manager, BOARD_STATUSES, TAG_CLOUD_SIZE
+from dashboard_stats import DashboardStats
+from attachment_storage import FileTooLarge, add_blob_reference, get_storage, release_blob_reference
+from chunked_upload import UploadConflict, abort_upload, append_chunk, finalize_upload, start_upload
+from attachment_archive import archive_response, attachment_rows
+from live_events import event_stream, team_channel
+from report_export import (EXPORT_FORMATS, TASK_COLUMNS, TIME_LOG_COLUMNS, export_response, task_rows,
+                           time_log_rows)
+from models import Team, Tag, TaskAttachment, UploadSession, Task, TASK_CARD_FIELDS, serialize_tasks
 from datetime import datetime, timedelta
 import logging
 import os
-import uuid
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import is_resource_modified
+from werkzeug.utils import secure_filename, send_file as send_file_from_environ
 import json
+from sqlalchemy.orm import joinedload
+
+BOARD_PAGE_SIZE = 50
+
+def _board_team_filter(current_user):
+    """Resolve which team's board a user may see; returns (allowed, team_id)"""
+    # Team-based filtering: Users only see their team's tasks (except administrators)
+    if current_user.is_administrator:
+        # Administrators can see all tasks, optionally filtered by team in URL (ignored unless numeric)
+        team_id = request.args.get('team', type=int)
+        return True, str(team_id) if team_id else None
+    # Regular users only see tasks from their team
+    if current_user.team_id:
+        return True, str(current_user.team_id)
+    return False, None
+
+def _board_task_data(task):
+    """Client-side task data used by the board's edit modal and time tracking"""
+    return {
+        'id': str(task.id),
+        'title': task.title,
+        'description': task.description or '',
+        'status': task.status,
+        'priority': task.priority,
+        'complexity': task.complexity or 'medium',
+        'assignee_id': str(task.assignee_id) if task.assignee_id else '',
+        'supervisor_id': str(task.supervisor_id) if task.supervisor_id else '',
+        'team_id': str(task.team_id) if task.team_id else '',
+        'estimated_hours': task.estimated_hours or None,
+        'total_logged': task.get_total_time_logged(),
+        'started_at': task.started_at.isoformat() if task.started_at else '',
+        'due_date': task.due_date.isoformat() if task.due_date else '',
+        'completed_at': task.completed_at.isoformat() if task.completed_at else '',
+        'tags': [tag.name for tag in task.tags],
+        'custom_fields': [field.to_dict() for field in task.custom_fields]
+    }
+
+def _task_form_response(success, message, task_id=None, status=200):
+    """JSON for the board's AJAX forms, flash and redirect for plain form posts"""
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if success:
+            return jsonify({'success': True, 'message': message, 'task_id': task_id})
+        return jsonify({'success': False, 'error': message}), status
+    flash(message, 'success' if success else 'error')
+    return redirect(url_for('index'))
 
 @app.route('/')
 def index():
     """Main kanban board page"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
-    users = data_manager.get_all_users()
     teams = data_manager.get_all_teams()
     
-    # Team-based filtering: Users only see their team's tasks (except administrators)
-    if current_user.is_administrator:
-        # Administrators can see all tasks
-        tasks = data_manager.get_all_tasks()
-        # Filter by team if specified in URL
-        team_filter = request.args.get('team')
-        if team_filter:
-            tasks = [t for t in tasks if str(t.team_id) == team_filter]
+    allowed, team_filter = _board_team_filter(current_user)
+    if allowed:
+        board = data_manager.get_board(team_filter, per_column_limit=BOARD_PAGE_SIZE)
     else:
-        # Regular users only see tasks from their team
-        if current_user.team_id:
-            tasks = data_manager.get_tasks_by_team(str(current_user.team_id))
-            team_filter = str(current_user.team_id)  # Set current team as filter
-        else:
-            tasks = []
-            team_filter = None
+        board = {status: {'tasks': [], 'total': 0, 'next_cursor': None}
+                 for status in BOARD_STATUSES}
     
-    # Organize tasks by status
-    todo_tasks = [t for t in tasks if t.status == 'todo']
-    in_progress_tasks = [t for t in tasks if t.status == 'in_progress']
-    in_review_tasks = [t for t in tasks if t.status == 'in_review']
-    completed_tasks = [t for t in tasks if t.status == 'completed']
+    board_tasks_data = [
+        _board_task_data(task)
+        for column in board.values() for task in column['tasks']
+    ]
     
     return render_template('index.html', 
-                         todo_tasks=todo_tasks,
-                         in_progress_tasks=in_progress_tasks,
-                         in_review_tasks=in_review_tasks,
-                         completed_tasks=completed_tasks,
-                         users=users,
+                         board=board,
+                         board_tasks_data=board_tasks_data,
                          teams=teams,
                          current_user=current_user,
                          selected_team=team_filter)
 
+@app.route('/board/column/<status>')
+def board_column(status):
+    """Next page of cards for one kanban column (lazy loading)"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    cursor = request.args.get('cursor', type=int)
+    if status not in BOARD_STATUSES or not cursor:
+        return jsonify({'error': 'Invalid column or cursor'}), 400
+    
+    allowed, team_filter = _board_team_filter(current_user)
+    if not allowed:
+        return jsonify({'html': '', 'tasks': [], 'next_cursor': None})
+    
+    limit = min(request.args.get('limit', BOARD_PAGE_SIZE, type=int), 200)
+    column = data_manager.get_board(team_filter, per_column_limit=limit, cursor={status: cursor})[status]
+    
+    html = render_template('board_cards.html',
+                           tasks=column['tasks'],
+                           status=status,
+                           current_user=current_user)
+    return jsonify({
+        'html': html,
+        'tasks': [_board_task_data(task) for task in column['tasks']],
+        'next_cursor': column['next_cursor']
+    })
+
+@app.route('/board/card/<int:task_id>')
+def board_card(task_id):
+    """One rendered kanban card, used to patch the board after a live update"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    allowed, team_filter = _board_team_filter(current_user)
+    task = data_manager.get_board_card(task_id, team_filter) if allowed else None
+    if not task:
+        return jsonify({'error': 'Task not on this board'}), 404
+    
+    html = render_template('board_cards.html',
+                           tasks=[task],
+                           status=task.status,
+                           current_user=current_user)
+    return jsonify({'html': html, 'task': _board_task_data(task), 'status': task.status})
+
+@app.route('/events/board')
+def board_events():
+    """Server-sent events stream of task and time-log changes on the user's board"""
+    if not app.config['LIVE_EVENTS_ENABLED']:
+        # 204 tells EventSource not to reconnect
+        return Response(status=204)
+    
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    allowed, team_filter = _board_team_filter(current_user)
+    if not allowed:
+        return Response(status=204)
+    
+    stream = event_stream(team_channel(team_filter),
+                          keepalive=app.config['LIVE_EVENTS_KEEPALIVE'],
+                          max_duration=app.config['LIVE_EVENTS_MAX_STREAM'])
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """Login page"""
@@ -62,8 +167,7 @@ def login():
         if username_or_email and password:
             user = data_manager.authenticate_user(username_or_email, password)
             if user:
-                data_manager.set_current_user(user.id)
-                session['user_id'] = user.id
+                data_manager.set_current_user(user.id, user)
                 flash(f'Welcome back, {user.username}!', 'success')
                 return redirect(url_for('index', welcome='true'))
             else:
@@ -138,19 +242,17 @@ def update_profile():
 @app.route('/create_task', methods=['POST'])
 def create_task():
     """Create a new task - Only managers can create tasks"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
     # Check if user is a manager or admin
     if current_user.role not in ['manager', 'admin']:
-        flash('Only managers and admins can create tasks', 'error')
-        return redirect(url_for('index'))
+        return _task_form_response(False, 'Only managers and admins can create tasks', status=403)
     
     # Check if manager has a team assigned (admins can create tasks without teams)
     if current_user.role == 'manager' and not current_user.team_id:
-        flash('Manager must be assigned to a team to create tasks', 'error')
-        return redirect(url_for('index'))
+        return _task_form_response(False, 'Manager must be assigned to a team to create tasks', status=400)
     
     title = request.form.get('title')
     description = request.form.get('description', '')
@@ -219,16 +321,14 @@ def create_task():
             except (ValueError, TypeError):
                 pass  # Ignore invalid estimates
         
-        flash('Task created successfully!', 'success')
-    else:
-        flash('Task title is required', 'error')
+        return _task_form_response(True, 'Task created successfully!', task.id)
     
-    return redirect(url_for('index'))
+    return _task_form_response(False, 'Task title is required', status=400)
 
 @app.route('/update_task/<task_id>', methods=['POST'])
 def update_task(task_id):
     """Update task status or details"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
@@ -237,8 +337,7 @@ def update_task(task_id):
     if not task:
         if 'status' in request.form:
             return jsonify({'success': False, 'error': 'Task not found'})
-        flash('Task not found', 'error')
-        return redirect(url_for('index'))
+        return _task_form_response(False, 'Task not found', status=404)
     
     # Check edit permissions - same as priority permissions
     can_edit = (
@@ -251,8 +350,7 @@ def update_task(task_id):
     if not can_edit:
         if 'status' in request.form:
             return jsonify({'success': False, 'error': 'Permission denied'})
-        flash('You do not have permission to edit this task', 'error')
-        return redirect(url_for('index'))
+        return _task_form_response(False, 'You do not have permission to edit this task', status=403)
     
     # Handle status update (for drag and drop)
     if 'status' in request.form:
@@ -360,32 +458,26 @@ def update_task(task_id):
             except (ValueError, TypeError):
                 pass  # Ignore invalid estimates
         if task:
-            flash('Task updated successfully!', 'success')
-        else:
-            flash('Task not found', 'error')
-    else:
-        flash('Task title is required', 'error')
+            return _task_form_response(True, 'Task updated successfully!', task.id)
+        return _task_form_response(False, 'Task not found', status=404)
     
-    return redirect(url_for('index'))
+    return _task_form_response(False, 'Task title is required', status=400)
 
 @app.route('/delete_task/<task_id>', methods=['POST'])
 def delete_task(task_id):
     """Delete a task"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
     if data_manager.delete_task(task_id):
-        flash('Task deleted successfully!', 'success')
-    else:
-        flash('Task not found', 'error')
-    
-    return redirect(url_for('index'))
+        return _task_form_response(True, 'Task deleted successfully!', int(task_id))
+    return _task_form_response(False, 'Task not found', status=404)
 
 @app.route('/task/<task_id>/send_for_review', methods=['POST'])
 def send_task_for_review(task_id):
     """Send task for review (analyst action)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
@@ -411,7 +503,7 @@ def send_task_for_review(task_id):
 @app.route('/task/<task_id>/recall', methods=['POST'])
 def recall_task(task_id):
     """Recall task from review (analyst action)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
@@ -437,7 +529,7 @@ def recall_task(task_id):
 @app.route('/approve_task/<task_id>', methods=['POST'])
 def approve_task(task_id):
     """Approve task (supervisor action)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Not authenticated'}), 401
     
@@ -471,7 +563,7 @@ def approve_task(task_id):
 @app.route('/reject_task/<task_id>', methods=['POST'])
 def reject_task(task_id):
     """Reject task and send back to in progress (supervisor action)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Not authenticated'}), 401
     
@@ -509,7 +601,7 @@ def reject_task(task_id):
 @app.route('/get_task_data/<task_id>')
 def get_task_data(task_id):
     """Get task data for editing"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Not authenticated'}), 401
     
@@ -544,104 +636,105 @@ def get_task_data(task_id):
 @app.route('/search')
 def search():
     """Search tasks"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
     query = request.args.get('q', '')
     filter_status = request.args.get('status', '')
-    filter_assignee = request.args.get('assignee', '')
-    
-    if query:
-        tasks = data_manager.search_tasks(query)
+    filter_assignee = request.args.get('assignee', type=int)
+    page = request.args.get('page', 1, type=int)
+    
+    # Same team scoping as the board
+    allowed, team_filter = _board_team_filter(current_user)
+    if allowed:
+        results = data_manager.search_tasks(query,
+                                            status=filter_status or None,
+                                            assignee_id=filter_assignee or None,
+                                            team_id=team_filter,
+                                            page=page)
+        tasks = results.items
     else:
-        tasks = data_manager.get_all_tasks()
-    
-    # Apply filters
-    if filter_status:
-        tasks = [t for t in tasks if t.status == filter_status]
-    
-    if filter_assignee:
-        tasks = [t for t in tasks if t.assignee_id == filter_assignee]
+        results = None
+        tasks = []
     
     users = data_manager.get_all_users()
     
     return render_template('search.html', 
                          tasks=tasks, 
+                         results=results,
                          users=users, 
                          current_user=current_user,
                          query=query,
                          filter_status=filter_status,
                          filter_assignee=filter_assignee)
 
+@app.route('/api/tags')
+def api_tags():
+    """Most used tags with their usage counts, for tag clouds and filters"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    limit = max(1, min(request.args.get('limit', TAG_CLOUD_SIZE, type=int), 500))
+    tags = data_manager.get_tag_cloud(limit)
+    return jsonify({'success': True, 'tags': [tag.to_dict() for tag in tags]})
+
+@app.route('/api/tags/<int:tag_id>/tasks')
+def api_tag_tasks(tag_id):
+    """Tasks carrying a tag, a page at a time"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    tag = db.session.get(Tag, tag_id)
+    if not tag:
+        return jsonify({'error': 'Tag not found'}), 404
+    
+    # Same team scoping as the board
+    allowed, team_filter = _board_team_filter(current_user)
+    if not allowed:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    page = request.args.get('page', 1, type=int)
+    results = data_manager.get_tasks_with_tag(tag.id, team_id=team_filter, page=page)
+    return jsonify({
+        'success': True,
+        'tag': tag.to_dict(),
+        'tasks': serialize_tasks(results.items, TASK_CARD_FIELDS),
+        'page': results.page,
+        'pages': results.pages,
+        'total': results.total,
+        'has_next': results.has_next
+    })
+
 @app.route('/dashboard')
 def dashboard():
     """Performance dashboard"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
     users = data_manager.get_all_users()
-    
-    # Team-based filtering: Users only see their team's tasks (except administrators)
-    if current_user.is_administrator:
-        tasks = data_manager.get_all_tasks()
-    else:
-        # Regular users only see tasks from their team
-        if current_user.team_id:
-            tasks = data_manager.get_tasks_by_team(str(current_user.team_id))
-        else:
-            tasks = []
-    
-    # Calculate metrics
-    total_tasks = len(tasks)
-    completed_tasks = len([t for t in tasks if t.status == 'completed'])
-    in_progress_tasks = len([t for t in tasks if t.status == 'in_progress'])
-    todo_tasks = len([t for t in tasks if t.status == 'todo'])
-    
-    completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-    
-    # User performance with detailed status counts
-    user_stats = {}
-    for user in users:
-        user_tasks = [t for t in tasks if t.assignee_id == user.id]
-        user_todo = len([t for t in user_tasks if t.status == 'todo'])
-        user_in_progress = len([t for t in user_tasks if t.status == 'in_progress'])
-        user_in_review = len([t for t in user_tasks if t.status == 'in_review'])
-        user_completed = len([t for t in user_tasks if t.status == 'completed'])
-        user_total = len(user_tasks)
-        user_stats[str(user.id)] = {
-            'user': user.to_dict(),
-            'total_tasks': user_total,
-            'todo_tasks': user_todo,
-            'in_progress_tasks': user_in_progress,
-            'in_review_tasks': user_in_review,
-            'completed_tasks': user_completed,
-            'completion_rate': (user_completed / user_total * 100) if user_total > 0 else 0
-        }
-    
-    # Priority distribution
-    priority_stats = {
-        'urgent': len([t for t in tasks if t.priority == 'urgent']),
-        'high': len([t for t in tasks if t.priority == 'high']),
-        'medium': len([t for t in tasks if t.priority == 'medium']),
-        'low': len([t for t in tasks if t.priority == 'low'])
-    }
+    stats = DashboardStats.for_user(current_user)
     
     return render_template('dashboard.html',
                          current_user=current_user,
-                         total_tasks=total_tasks,
-                         completed_tasks=completed_tasks,
-                         in_progress_tasks=in_progress_tasks,
-                         todo_tasks=todo_tasks,
-                         completion_rate=completion_rate,
-                         user_stats=user_stats,
-                         priority_stats=priority_stats)
+                         **stats.template_context(users))
+
+@app.route('/api/dashboard-data')
+def api_dashboard_data():
+    """Dashboard metrics for live refresh"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    return jsonify(DashboardStats.for_user(current_user).chart_data())
 
 @app.route('/team')
 def team():
     """Team management page"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
@@ -658,7 +751,7 @@ def team():
 @app.route('/update_user_role/<user_id>', methods=['POST'])
 def update_user_role(user_id):
     """Update user role (administrator only)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         flash('Access denied. Administrator privileges required.', 'error')
         return redirect(url_for('team'))
@@ -666,13 +759,22 @@ def update_user_role(user_id):
     new_role = request.form.get('role')
     is_admin = request.form.get('is_administrator') == 'on'
     
+    wants_json = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     if new_role in ['analyst', 'manager', 'director']:
-        user = data_manager.update_user(user_id, role=new_role, is_administrator=is_admin)
+        user = data_manager.update_user_role(user_id, new_role, is_admin)
         if user:
+            if wants_json:
+                return jsonify({'success': True, 'user': {
+                    'id': user.id, 'role': user.role, 'is_administrator': bool(user.is_administrator)
+                }})
             flash(f'User role updated successfully!', 'success')
         else:
+            if wants_json:
+                return jsonify({'success': False, 'error': 'User not found'}), 404
             flash('User not found', 'error')
     else:
+        if wants_json:
+            return jsonify({'success': False, 'error': 'Invalid role'}), 400
         flash('Invalid role', 'error')
     
     return redirect(url_for('team'))
@@ -680,7 +782,7 @@ def update_user_role(user_id):
 @app.route('/move_member_to_team', methods=['POST'])
 def move_member_to_team():
     """Move a team member to a different team (administrator only)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         flash('Access denied. Administrator privileges required.', 'error')
         return redirect(url_for('team'))
@@ -706,7 +808,7 @@ def move_member_to_team():
 @app.route('/add_team_member', methods=['POST'])
 def add_team_member():
     """Add a new team member (administrator only)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         flash('Access denied. Administrator privileges required.', 'error')
         return redirect(url_for('team'))
@@ -734,11 +836,9 @@ def add_team_member():
             return redirect(url_for('team'))
         
         # Check if email already exists
-        existing_users = data_manager.get_all_users()
-        for user in existing_users:
-            if user.email.lower() == email.lower():
-                flash(f'Email {email} already exists', 'error')
-                return redirect(url_for('team'))
+        if data_manager.get_user_by_email(email):
+            flash(f'Email {email} already exists', 'error')
+            return redirect(url_for('team'))
         
         try:
             # Create new user
@@ -764,7 +864,7 @@ def add_team_member():
 @app.route('/create_team', methods=['POST'])
 def create_team():
     """Create a new team (administrator only)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         flash('Access denied. Administrator privileges required.', 'error')
         return redirect(url_for('team'))
@@ -788,7 +888,7 @@ def create_team():
 @app.route('/edit_team/<team_id>', methods=['POST'])
 def edit_team(team_id):
     """Edit team details (administrator only)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         flash('Access denied. Administrator privileges required.', 'error')
         return redirect(url_for('team'))
@@ -817,7 +917,7 @@ def edit_team(team_id):
 @app.route('/delete_user/<user_id>', methods=['POST'])
 def delete_user(user_id):
     """Delete a user (administrator only)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         flash('Access denied. Administrator privileges required.', 'error')
         return redirect(url_for('team'))
@@ -844,11 +944,14 @@ def delete_user(user_id):
         for task in assigned_tasks:
             task.assignee_id = None
         
-        # Delete time logs
-        from models import TimeLog
+        # Delete time logs and their daily rollup; the bulk delete skips the task rollups, so release them first
+        from models import TimeLog, TimeLogDaily
+        data_manager.release_user_time_logs(user_id)
         TimeLog.query.filter_by(user_id=int(user_id)).delete()
+        TimeLogDaily.query.filter_by(user_id=int(user_id)).delete()
         
-        # Delete the user
+        # Delete the user; snapshots of their session stop being accepted in every worker
+        data_manager.invalidate_current_user(user.id)
         db.session.delete(user)
         db.session.commit()
         
@@ -862,7 +965,7 @@ def delete_user(user_id):
 @app.route('/toggle_user_status/<user_id>', methods=['POST'])
 def toggle_user_status(user_id):
     """Toggle user active status (administrator only)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         flash('Access denied. Administrator privileges required.', 'error')
         return redirect(url_for('team'))
@@ -872,14 +975,11 @@ def toggle_user_status(user_id):
         flash('Cannot deactivate your own account', 'error')
         return redirect(url_for('team'))
     
-    user = data_manager.get_user(user_id)
-    if not user:
-        flash('User not found', 'error')
-        return redirect(url_for('team'))
-    
     try:
-        user.is_active = not user.is_active
-        db.session.commit()
+        user = data_manager.toggle_user_status(user_id)
+        if not user:
+            flash('User not found', 'error')
+            return redirect(url_for('team'))
         
         status = "activated" if user.is_active else "deactivated"
         flash(f'User {user.username} {status} successfully', 'success')
@@ -892,7 +992,7 @@ def toggle_user_status(user_id):
 @app.route('/delete_team/<team_id>', methods=['POST'])
 def delete_team(team_id):
     """Delete a team (administrator only)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         flash('Access denied. Administrator privileges required.', 'error')
         return redirect(url_for('team'))
@@ -909,8 +1009,9 @@ def delete_team(team_id):
         return redirect(url_for('team'))
     
     try:
-        # Delete team tasks
+        # Delete team tasks; the bulk delete skips ORM cascades, so untag them first
         from models import Task
+        data_manager.detach_team_task_tags(team_id)
         Task.query.filter_by(team_id=int(team_id)).delete()
         
         # Delete the team
@@ -927,7 +1028,7 @@ def delete_team(team_id):
 @app.route('/toggle_team_status/<team_id>', methods=['POST'])
 def toggle_team_status(team_id):
     """Toggle team active status (administrator only)"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         flash('Access denied. Administrator privileges required.', 'error')
         return redirect(url_for('team'))
@@ -953,7 +1054,7 @@ def toggle_team_status(team_id):
 @app.route('/time/start/<task_id>', methods=['POST'])
 def start_time_tracking(task_id):
     """Start time tracking for a task"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Not logged in'}), 401
     
@@ -972,7 +1073,7 @@ def start_time_tracking(task_id):
 @app.route('/time/stop/<time_log_id>', methods=['POST'])
 def stop_time_tracking(time_log_id):
     """Stop time tracking"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Not logged in'}), 401
     
@@ -990,7 +1091,7 @@ def stop_time_tracking(time_log_id):
 @app.route('/time/active')
 def get_active_time_log():
     """Get active time log for current user"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Not logged in'}), 401
     
@@ -1004,10 +1105,39 @@ def get_active_time_log():
     else:
         return jsonify({'active': False})
 
+def _parse_date_arg(name, label):
+    """Date from a YYYY-MM-DD query parameter, or None if missing or invalid"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        flash(f'Invalid {label} format', 'error')
+        return None
+
+def _report_date_range():
+    """Report start and end dates from the query string, defaulting to the last 30 days"""
+    start_date = _parse_date_arg('start_date', 'start date')
+    end_date = _parse_date_arg('end_date', 'end date')
+    if start_date is None or end_date is None:
+        start_date = datetime.now() - timedelta(days=30)
+        end_date = datetime.now()
+    return start_date, end_date
+
+def _export_team_filter(current_user):
+    """Team an export may cover; returns (allowed, team_id)"""
+    # Administrators may export any team or everything, others only their own team
+    if current_user.is_administrator:
+        return True, request.args.get('team_id') or None
+    if current_user.team_id:
+        return True, str(current_user.team_id)
+    return False, None
+
 @app.route('/time/report')
 def time_report():
     """Time tracking report page"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
@@ -1015,34 +1145,13 @@ def time_report():
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
     team_id = request.args.get('team_id')
-    
-    start_date = None
-    end_date = None
-    
-    if start_date_str:
-        try:
-            from datetime import datetime
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-        except ValueError:
-            flash('Invalid start date format', 'error')
-    
-    if end_date_str:
-        try:
-            from datetime import datetime
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-        except ValueError:
-            flash('Invalid end date format', 'error')
-    
-    # Provide default dates if not specified
-    if start_date is None or end_date is None:
-        from datetime import datetime, timedelta
-        start_date = datetime.now() - timedelta(days=30)
-        end_date = datetime.now()
+    start_date, end_date = _report_date_range()
     
     # Handle team_id parameter - data_manager expects a string, use empty string if None
     team_filter = team_id if team_id else ""
     
-    report_data = data_manager.get_time_report_data(team_filter, start_date, end_date)
+    page = request.args.get('page', 1, type=int)
+    report_data = data_manager.get_time_report_data(team_filter, start_date, end_date, page=page)
     teams = data_manager.get_all_teams()
     
     return render_template('time_report.html', 
@@ -1053,10 +1162,48 @@ def time_report():
                          start_date=start_date_str,
                          end_date=end_date_str)
 
+@app.route('/time/report/export')
+def export_time_report():
+    """Stream the time logs behind the report as CSV or XLSX"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return redirect(url_for('login'))
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unsupported export format'}), 400
+    allowed, team_filter = _export_team_filter(current_user)
+    if not allowed:
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    start_date, end_date = _report_date_range()
+    filename = f"time_report_{start_date:%Y%m%d}_{end_date:%Y%m%d}"
+    return export_response(time_log_rows(team_filter, start_date, end_date), TIME_LOG_COLUMNS,
+                           filename, export_format, sheet_title='Time Logs')
+
+@app.route('/tasks/export')
+def export_tasks():
+    """Stream tasks as CSV or XLSX, optionally filtered by team, status and creation date"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return redirect(url_for('login'))
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unsupported export format'}), 400
+    allowed, team_filter = _export_team_filter(current_user)
+    if not allowed:
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    rows = task_rows(team_filter, request.args.get('status') or None,
+                     _parse_date_arg('start_date', 'start date'), _parse_date_arg('end_date', 'end date'))
+    filename = f"tasks_{datetime.now():%Y%m%d}"
+    return export_response(rows, TASK_COLUMNS, filename, export_format, sheet_title='Tasks')
+
 @app.route('/task/estimate/<task_id>', methods=['POST'])
 def update_task_estimate(task_id):
     """Update task time estimate"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Not logged in'}), 401
     
@@ -1080,7 +1227,7 @@ def update_task_estimate(task_id):
 @app.route('/update_task_priority/<task_id>', methods=['POST'])
 def update_task_priority(task_id):
     """Update task priority"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Not logged in'}), 401
     
@@ -1121,7 +1268,7 @@ def update_task_priority(task_id):
 @app.route('/task/<int:task_id>/detail')
 def task_detail(task_id):
     """Display detailed task view with comments and history"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
@@ -1158,7 +1305,7 @@ def task_detail(task_id):
 @app.route('/task/<int:task_id>/comment', methods=['POST'])
 def add_task_comment(task_id):
     """Add a comment to a task"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return redirect(url_for('login'))
     
@@ -1185,7 +1332,7 @@ def add_task_comment(task_id):
 @app.route('/task/<int:task_id>/update_description', methods=['POST'])
 def update_task_description(task_id):
     """Update task description from inline editing"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'error': 'Unauthorized'}), 401
@@ -1218,18 +1365,11 @@ def update_task_description(task_id):
     task.description = new_description if new_description else None
     
     try:
-        db.session.commit()
-        
-        # Log the change in task history
-        from models import TaskHistory
-        history_entry = TaskHistory()
-        history_entry.task_id = task.id
-        history_entry.user_id = current_user.id
-        history_entry.action = 'updated'
-        history_entry.field_name = 'description'
-        history_entry.old_value = old_description or ''
-        history_entry.new_value = new_description or ''
-        db.session.add(history_entry)
+        # Log the change in task history, written in the same commit
+        data_manager.add_task_history(str(task.id), str(current_user.id), 'updated',
+                                      field_name='description',
+                                      old_value=old_description or '',
+                                      new_value=new_description or '')
         db.session.commit()
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -1248,7 +1388,7 @@ def update_task_description(task_id):
 @app.route('/task/<int:task_id>/update', methods=['POST'])
 def update_task_detail(task_id):
     """Update task details from the detail page"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'error': 'Unauthorized'}), 401
@@ -1286,7 +1426,9 @@ def update_task_detail(task_id):
     # Update fields and track changes
     if status and status != task.status:
         changes.append(('status', task.status, status))
+        old_status = task.status
         task.status = status
+        data_manager.sync_subtask_rollup(task, old_status)
         if status == 'completed':
             task.completed_at = datetime.utcnow()
         elif status == 'in_progress' and not task.started_at:
@@ -1327,9 +1469,8 @@ def update_task_detail(task_id):
     try:
         # Update timestamp
         task.updated_at = datetime.utcnow()
-        db.session.commit()
         
-        # Add history entries for each change
+        # Add history entries for each change; all are inserted with the task update
         for field_name, old_value, new_value in changes:
             data_manager.add_task_history(
                 str(task_id), 
@@ -1339,6 +1480,7 @@ def update_task_detail(task_id):
                 old_value=old_value, 
                 new_value=new_value
             )
+        db.session.commit()
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'success': True, 'message': 'Task updated successfully'})
@@ -1359,7 +1501,7 @@ def update_task_detail(task_id):
 @app.route('/user/<int:user_id>/update', methods=['POST'])
 def update_user_inline(user_id):
     """Update user details via inline editing"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         return jsonify({'error': 'Unauthorized'}), 403
     
@@ -1389,7 +1531,7 @@ def update_user_inline(user_id):
 @app.route('/edit_team/<int:team_id>', methods=['POST'])
 def edit_team_inline(team_id):
     """Update team details via inline editing"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user or not current_user.is_administrator:
         return jsonify({'error': 'Unauthorized'}), 403
     
@@ -1422,7 +1564,7 @@ def edit_team_inline(team_id):
 @app.route('/api/team-users')
 def api_team_users():
     """API endpoint to get team users for autocomplete"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify([]), 401
     
@@ -1447,8 +1589,8 @@ def api_team_users():
 
 @app.context_processor
 def inject_current_user():
-    """Make current user available in all templates"""
-    return dict(current_user=data_manager.get_current_user())
+    """Make current user available in all templates (the session identity; see SessionIdentity)"""
+    return dict(current_user=data_manager.get_current_identity())
 
 
 
@@ -1456,12 +1598,13 @@ def inject_current_user():
 @app.before_request
 def require_login():
     allowed_endpoints = ['login', 'static', 'time_report', 'download_file', 'upload_file', 'delete_file']
-    if request.endpoint not in allowed_endpoints and not data_manager.get_current_user():
+    if request.endpoint not in allowed_endpoints and not data_manager.get_current_identity():
         return redirect(url_for('login'))
 
-# File upload configuration
-UPLOAD_FOLDER = 'uploads'
+# File upload configuration (files are stored by attachment_storage under ATTACHMENT_STORAGE_ROOT)
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+# Room for multipart boundaries and headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
 ALLOWED_EXTENSIONS = {
     'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 
     'xls', 'xlsx', 'ppt', 'pptx', 'zip', 'rar', '7z', 'csv'
@@ -1490,7 +1633,7 @@ def get_file_icon(file_type):
 @app.route('/upload_file/<task_id>', methods=['POST'])
 def upload_file(task_id):
     """Upload file attachment to task"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Authentication required'}), 401
     
@@ -1503,8 +1646,13 @@ def upload_file(task_id):
     if not current_user.is_administrator and current_user.team_id != task.team_id:
         return jsonify({'error': 'Access denied'}), 403
     
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+    # Stop reading the body as soon as it cannot hold an allowed file
+    request.max_content_length = MAX_FILE_SIZE + MULTIPART_OVERHEAD
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'File too large (max 16MB)'}), 413
     
     file = request.files['file']
     if file.filename == '':
@@ -1513,34 +1661,26 @@ def upload_file(task_id):
     if not allowed_file(file.filename):
         return jsonify({'error': 'File type not allowed'}), 400
     
-    # Create uploads directory if it doesn't exist
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    
-    # Generate secure filename
     original_filename = secure_filename(file.filename) if file.filename else "unknown"
-    file_extension = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
-    unique_filename = f"{uuid.uuid4().hex}.{file_extension}" if file_extension else uuid.uuid4().hex
     
-    file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
+    # Hash and size-check while copying into the store; identical content is kept once
+    try:
+        stored = get_storage().save(file.stream, max_size=MAX_FILE_SIZE)
+    except FileTooLarge:
+        return jsonify({'error': 'File too large (max 16MB)'}), 400
+    except OSError as e:
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
     
     try:
-        # Save file
-        file.save(file_path)
-        file_size = os.path.getsize(file_path)
-        
-        # Check file size
-        if file_size > MAX_FILE_SIZE:
-            os.remove(file_path)
-            return jsonify({'error': 'File too large (max 16MB)'}), 400
-        
-        # Create attachment record
+        add_blob_reference(stored)
         attachment = TaskAttachment(
             task_id=int(task_id),
-            filename=unique_filename,
+            filename=stored.key,
             original_filename=original_filename,
-            file_size=file_size,
+            file_size=stored.size,
             file_type=file.content_type,
-            uploaded_by=current_user.id
+            uploaded_by=current_user.id,
+            content_hash=stored.sha256
         )
         
         db.session.add(attachment)
@@ -1553,15 +1693,43 @@ def upload_file(task_id):
         })
         
     except Exception as e:
-        # Clean up file if database insert fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # A file this upload stored is left to attachment_gc, since a concurrent upload may share it
+        db.session.rollback()
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
+def _attachment_etag(attachment, file_path):
+    """Strong validator: the content hash, or size and mtime for files not yet migrated"""
+    if attachment.content_hash:
+        return attachment.content_hash
+    stat = os.stat(file_path)
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+def _send_attachment(attachment, file_path):
+    """Download response with ETag, 304 and Range handling, or a handoff to the proxy"""
+    etag = _attachment_etag(attachment, file_path)
+    mode = app.config.get('ATTACHMENT_SENDFILE')
+    if not mode:
+        return send_file(file_path, as_attachment=True, download_name=attachment.original_filename,
+                         etag=etag, conditional=True)
+    
+    # The proxy serves the body and any Range itself; only revalidation is answered here
+    if not is_resource_modified(request.environ, etag=etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    response = send_file_from_environ(file_path, request.environ, as_attachment=True,
+                                      download_name=attachment.original_filename,
+                                      use_x_sendfile=True, etag=etag, conditional=False)
+    if mode == 'x-accel':
+        del response.headers['X-Sendfile']
+        prefix = app.config['ATTACHMENT_ACCEL_PREFIX'].rstrip('/')
+        response.headers['X-Accel-Redirect'] = f"{prefix}/{attachment.filename}"
+    return response
+
 @app.route('/download_file/<attachment_id>')
 def download_file(attachment_id):
     """Download file attachment"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         flash('Authentication required', 'error')
         return redirect(url_for('login'))
@@ -1574,18 +1742,18 @@ def download_file(attachment_id):
         flash('Access denied', 'error')
         return redirect(url_for('index'))
     
-    file_path = os.path.join(UPLOAD_FOLDER, attachment.filename)
+    file_path = get_storage().path(attachment.filename)
     
     if not os.path.exists(file_path):
         flash('File not found', 'error')
         return redirect(url_for('index'))
     
-    return send_file(file_path, as_attachment=True, download_name=attachment.original_filename)
+    return _send_attachment(attachment, file_path)
 
 @app.route('/delete_file/<attachment_id>', methods=['POST', 'DELETE'])
 def delete_file(attachment_id):
     """Delete file attachment"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Authentication required'}), 401
     
@@ -1603,12 +1771,10 @@ def delete_file(attachment_id):
         return jsonify({'error': 'Permission denied'}), 403
     
     try:
-        # Remove file from filesystem
-        file_path = os.path.join(UPLOAD_FOLDER, attachment.filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        
-        # Remove database record
+        # Only the record and its blob reference go here. An upload of the same content may be
+        # reusing the file right now, so attachment_gc removes it once unreferenced past its grace period
+        if attachment.content_hash:
+            release_blob_reference(attachment.content_hash)
         db.session.delete(attachment)
         db.session.commit()
         
@@ -1618,12 +1784,134 @@ def delete_file(attachment_id):
         })
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Delete failed: {str(e)}'}), 500
 
+def _get_upload_session(upload_id, current_user):
+    """Upload session owned by the user, or None"""
+    upload = db.session.get(UploadSession, upload_id)
+    if upload and (upload.user_id == current_user.id or current_user.is_administrator):
+        return upload
+    return None
+
+@app.route('/api/task/<task_id>/uploads', methods=['POST'])
+def start_chunked_upload(task_id):
+    """Start a resumable upload; the client then PUTs chunks and finalizes"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    task = data_manager.get_task(task_id)
+    if not task:
+        return jsonify({'error': 'Task not found'}), 404
+    
+    # Check if user can access this task (team-based access)
+    if not current_user.is_administrator and current_user.team_id != task.team_id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or request.form
+    filename = secure_filename(data.get('filename') or '')
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'File size is required'}), 400
+    
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    max_size = app.config['MAX_CHUNKED_UPLOAD_SIZE']
+    if size <= 0 or size > max_size:
+        return jsonify({'error': f'File size must be between 1 byte and {max_size // (1024 * 1024)}MB'}), 400
+    
+    upload = start_upload(task.id, current_user.id, filename, size, data.get('content_type') or None)
+    return jsonify({
+        'success': True,
+        'upload': upload.to_dict(),
+        'chunk_size': app.config['UPLOAD_CHUNK_SIZE']
+    }), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    """Acknowledged offset of an upload, for resuming"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    upload = _get_upload_session(upload_id, current_user)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    return jsonify({'success': True, 'upload': upload.to_dict()})
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """Append the request body at ?offset=, which must be the acknowledged offset"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    upload = _get_upload_session(upload_id, current_user)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'offset is required'}), 400
+    
+    request.max_content_length = app.config['UPLOAD_CHUNK_SIZE']
+    try:
+        received = append_chunk(upload, offset, request.stream)
+    except UploadConflict as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), 409
+    except FileTooLarge as e:
+        return jsonify({'error': str(e), 'offset': upload.received}), 400
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Chunk too large', 'offset': upload.received}), 413
+    
+    return jsonify({'success': True, 'offset': received, 'complete': received == upload.total_size})
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    """Create the attachment from a completely received upload"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    upload = _get_upload_session(upload_id, current_user)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    try:
+        attachment = finalize_upload(upload)
+    except UploadConflict as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), 409
+    except Exception as e:
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+    
+    return jsonify({
+        'success': True,
+        'attachment': attachment.to_dict(),
+        'message': f'File "{attachment.original_filename}" uploaded successfully'
+    })
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    """Cancel an upload and discard what was received"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    upload = _get_upload_session(upload_id, current_user)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    abort_upload(upload)
+    return jsonify({'success': True})
+
 @app.route('/api/task/<task_id>/attachments')
 def get_task_attachments(task_id):
     """Get task attachments"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Authentication required'}), 401
     
@@ -1653,11 +1941,49 @@ def get_task_attachments(task_id):
         'attachments': attachment_data
     })
 
+@app.route('/task/<int:task_id>/attachments.zip')
+def download_task_attachments(task_id):
+    """Download all attachments of a task as one ZIP, streamed"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        flash('Authentication required', 'error')
+        return redirect(url_for('login'))
+    
+    task = data_manager.get_task(str(task_id))
+    if not task:
+        flash('Task not found', 'error')
+        return redirect(url_for('index'))
+    
+    # Check if user can access this task (team-based access)
+    if not current_user.is_administrator and current_user.team_id != task.team_id:
+        flash('Access denied', 'error')
+        return redirect(url_for('index'))
+    
+    return archive_response(attachment_rows(task_id=task_id), f'task-{task_id}-attachments')
+
+@app.route('/team/<int:team_id>/attachments.zip')
+def download_team_attachments(team_id):
+    """Download the attachments of all the team's tasks as one ZIP, a folder per task"""
+    current_user = data_manager.get_current_identity()
+    if not current_user:
+        flash('Authentication required', 'error')
+        return redirect(url_for('login'))
+    
+    team = Team.query.get_or_404(team_id)
+    
+    # Same team-based access as for a single task
+    if not current_user.is_administrator and current_user.team_id != team.id:
+        flash('Access denied', 'error')
+        return redirect(url_for('team'))
+    
+    return archive_response(attachment_rows(team_id=team.id), f'team-{team.id}-attachments',
+                            folder_per_task=True)
+
 # Sub-task Management Routes
 @app.route('/task/<int:task_id>/subtask/create', methods=['POST'])
 def create_subtask(task_id):
     """Create a new subtask for a parent task"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Unauthorized'}), 401
     
@@ -1681,26 +2007,8 @@ def create_subtask(task_id):
         return jsonify({'error': 'Subtask title is required'}), 400
     
     try:
-        # Create subtask using SQLAlchemy directly
-        subtask = Task(
-            title=title,
-            description=description,
-            status='todo',
-            priority='medium',
-            complexity='medium',
-            created_by=current_user.id,
-            team_id=parent_task.team_id,
-            parent_task_id=parent_task.id,
-            assignee_id=parent_task.assignee_id  # Default to parent task assignee
-        )
-        
-        db.session.add(subtask)
-        db.session.commit()
-        
-        # Add to task history
-        data_manager.add_task_history(str(parent_task.id), str(current_user.id), 'subtask_created', 
-                                    field_name='subtask', 
-                                    new_value=f'Created subtask: {title}')
+        # Also records the parent's history entry, in the same commit
+        subtask = data_manager.create_subtask(parent_task, title, description, current_user.id)
         
         return jsonify({
             'success': True,
@@ -1723,7 +2031,7 @@ def create_subtask(task_id):
 @app.route('/task/<int:task_id>/subtasks')
 def get_subtasks(task_id):
     """Get all subtasks for a parent task"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Unauthorized'}), 401
     
@@ -1731,17 +2039,17 @@ def get_subtasks(task_id):
     if not parent_task:
         return jsonify({'error': 'Task not found'}), 404
     
-    subtasks = Task.query.filter_by(parent_task_id=task_id).order_by(Task.created_at).all()
+    subtasks = Task.query.filter_by(parent_task_id=task_id).options(
+        joinedload(Task.assignee)
+    ).order_by(Task.created_at).all()
     
-    subtasks_data = []
-    for subtask in subtasks:
-        subtask_data = subtask.to_dict()
+    subtasks_data = serialize_tasks(subtasks)
+    for subtask, subtask_data in zip(subtasks, subtasks_data):
         # Add assignee name
         if subtask.assignee:
             subtask_data['assignee_name'] = subtask.assignee.display_name or subtask.assignee.username
         else:
             subtask_data['assignee_name'] = 'Unassigned'
-        subtasks_data.append(subtask_data)
     
     return jsonify({
         'subtasks': subtasks_data,
@@ -1752,7 +2060,7 @@ def get_subtasks(task_id):
 @app.route('/subtask/<int:subtask_id>/update', methods=['POST'])
 def update_subtask(subtask_id):
     """Update a subtask"""
-    current_user = data_manager.get_current_user()
+    current_user = data_manager.get_current_identity()
     if not current_user:
         return jsonify({'error': 'Unauthorized'}), 401
     
@@ -1770,27 +2078,20 @@ def update_subtask(subtask_id):
         return jsonify({'error': 'Permission denied'}), 403
     
     try:
-        # Get update fields
+        fields = {}
         if 'status' in request.form:
-            old_status = subtask.status
-            subtask.status = request.form.get('status')
-            if old_status != subtask.status:
-                data_manager.add_task_history(str(subtask.id), str(current_user.id), 'status_changed', 
-                                            field_name='status', 
-                                            old_value=old_status, 
-                                            new_value=subtask.status)
+            fields['status'] = request.form.get('status')
         
         if 'title' in request.form:
-            subtask.title = request.form.get('title').strip()
+            fields['title'] = request.form.get('title').strip()
         
         if 'description' in request.form:
-            subtask.description = request.form.get('description', '').strip()
+            fields['description'] = request.form.get('description', '').strip()
         
         if 'priority' in request.form:
-            subtask.priority = request.form.get('priority')
+            fields['priority'] = request.form.get('priority')
         
-        subtask.updated_at = datetime.utcnow()
-        db.session.commit()
+        subtask = data_manager.update_subtask(subtask, current_user.id, **fields)
         
         return jsonify({
             'success': True,
@@ -0,0 +1,267 @@
+"""
+Versioned schema changes for databases created before the models declared them.
+
+db.create_all() only creates missing tables, so a column or index added to a
+model never reaches an existing database. Each Migration below is a numbered list
+of steps; migrate.py applies the pending ones in order and records each version in
+schema_migrations once all of its steps succeeded. Steps are idempotent (IF [NOT]
+EXISTS, columns added only if missing, backfills recompute from source rows), so a
+migration interrupted halfway is simply run again. A fresh database gets everything
+from create_all() and is stamped with every version at startup, except migrations
+marked outside_models (e.g. the search index), which it runs.
+
+Backfills fill the columns added before them in the same migration. The rebuild
+scripts (rebuild_rollups.py, migrate_tag_keys.py, ...) rerun the same data
+rebuilds on demand but never change the schema.
+
+On PostgreSQL indexes are built and dropped CONCURRENTLY, outside a transaction,
+so writes to the table carry on while the index is built. A concurrent build that
+failed leaves an INVALID index behind; the next run drops and rebuilds it.
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Sequence
+
+from sqlalchemy import inspect, insert, text
+from sqlalchemy.engine import Connection
+
+from app import db
+from models import SchemaMigration
+
+
+class CreateIndex:
+    """CREATE INDEX; columns are SQL expressions, where makes it a partial index"""
+
+    def __init__(self, name: str, table: str, columns: Sequence[str], unique: bool = False, where: str = None,
+                 using: str = None):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.unique = unique
+        self.where = where
+        self.using = using  # index method, e.g. GIN (PostgreSQL only)
+
+    def statements(self, connection: Connection) -> List[str]:
+        concurrently = ''
+        statements = []
+        if connection.dialect.name == 'postgresql':
+            concurrently = 'CONCURRENTLY '
+            if _postgresql_index_invalid(connection, self.name):
+                statements.append(f"DROP INDEX CONCURRENTLY IF EXISTS {self.name}")
+        unique = 'UNIQUE ' if self.unique else ''
+        where = f" WHERE {self.where}" if self.where else ''
+        using = f" USING {self.using}" if self.using else ''
+        statements.append(f"CREATE {unique}INDEX {concurrently}IF NOT EXISTS {self.name} "
+                          f"ON {self.table}{using} ({', '.join(self.columns)}){where}")
+        return statements
+
+
+class DropIndex:
+    """DROP INDEX, e.g. one made redundant by a wider composite index"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def statements(self, connection: Connection) -> List[str]:
+        concurrently = 'CONCURRENTLY ' if connection.dialect.name == 'postgresql' else ''
+        return [f"DROP INDEX {concurrently}IF EXISTS {self.name}"]
+
+
+class AddColumn:
+    """ALTER TABLE ADD COLUMN; ddl is the column type and constraints"""
+
+    def __init__(self, table: str, name: str, ddl: str):
+        self.table = table
+        self.name = name
+        self.ddl = ddl
+
+    def statements(self, connection: Connection) -> List[str]:
+        existing = {column['name'] for column in inspect(connection).get_columns(self.table)}
+        if self.name in existing:
+            return []
+        return [f"ALTER TABLE {self.table} ADD COLUMN {self.name} {self.ddl}"]
+
+
+class CreateSearchSchema:
+    """Full-text index structures for search_index: FTS5 table on SQLite, tsvector + GIN on PostgreSQL"""
+
+    def statements(self, connection: Connection) -> List[str]:
+        dialect = connection.dialect.name
+        if dialect == 'sqlite':
+            if not connection.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+                logging.warning("SQLite was built without FTS5; task search stays on LIKE")
+                return []
+            return ["CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+                    "title, description, tokenize = 'unicode61 remove_diacritics 2')"]
+        if dialect == 'postgresql':
+            return (["ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector"] +
+                    CreateIndex('idx_task_search_vector', 'tasks', ['search_vector'], using='GIN')
+                    .statements(connection))
+        return []
+
+
+class Backfill:
+    """Data step run in Python in the app context; function commits its own work"""
+
+    def __init__(self, description: str, function: Callable[[], object]):
+        self.description = description
+        self.function = function
+
+    def statements(self, connection: Connection) -> List[str]:
+        return [f"-- backfill: {self.description}"]
+
+
+def _rebuild_task_rollups():
+    from data_manager import DataManager
+    DataManager().rebuild_task_rollups()
+
+
+def _rekey_tags():
+    from tag_resolver import rekey_tags
+    rekey_tags()
+
+
+def _rebuild_search_index():
+    from search_index import detect_search_backend, rebuild_search_index
+    if detect_search_backend() != 'like':
+        rebuild_search_index()
+
+
+def _rebuild_time_log_daily():
+    from data_manager import DataManager
+    DataManager().rebuild_time_log_daily()
+
+
+def _rebuild_tag_usage_counts():
+    from data_manager import DataManager
+    DataManager().rebuild_tag_usage_counts()
+
+
+class Migration:
+    def __init__(self, version: int, name: str, steps: Sequence, outside_models: bool = False):
+        self.version = version
+        self.name = name
+        self.steps = steps
+        # Structures create_all() cannot build, so a fresh database runs it instead of stamping it
+        self.outside_models = outside_models
+
+
+# Append only; never renumber or edit a migration that has been released
+MIGRATIONS = [
+    Migration(1, 'hot query indexes', [
+        # Board columns and per-status counts for one team
+        CreateIndex('idx_task_team_status', 'tasks', ['team_id', 'status', 'id']),
+        CreateIndex('idx_task_assignee_status', 'tasks', ['assignee_id', 'status']),
+        # Subtasks of a task in creation order
+        CreateIndex('idx_task_parent_created', 'tasks', ['parent_task_id', 'created_at']),
+        CreateIndex('idx_task_due_date', 'tasks', ['due_date'], where='due_date IS NOT NULL'),
+        CreateIndex('idx_time_log_active', 'time_logs', ['user_id', 'task_id'], where='end_time IS NULL'),
+        CreateIndex('idx_users_email_lower', 'users', ['lower(email)']),
+        # Leading columns of the composites above
+        DropIndex('idx_task_team'),
+        DropIndex('idx_task_assignee'),
+    ]),
+    Migration(2, 'task rollup columns', [
+        AddColumn('tasks', 'total_time_logged', 'FLOAT NOT NULL DEFAULT 0'),
+        AddColumn('tasks', 'subtask_total', 'INTEGER NOT NULL DEFAULT 0'),
+        AddColumn('tasks', 'subtask_completed', 'INTEGER NOT NULL DEFAULT 0'),
+        Backfill('task time and subtask rollups from time_logs and subtasks', _rebuild_task_rollups),
+    ]),
+    Migration(3, 'tag name keys and usage counts', [
+        AddColumn('tags', 'name_key', 'VARCHAR(100)'),
+        AddColumn('tags', 'usage_count', 'INTEGER NOT NULL DEFAULT 0'),
+        # Keys first: merging case-duplicates is what lets the unique index build
+        Backfill('tags.name_key, merging tags that differ only in case', _rekey_tags),
+        CreateIndex('idx_tags_name_key', 'tags', ['name_key'], unique=True),
+        CreateIndex('idx_task_tags_tag', 'task_tags', ['tag_id', 'task_id']),
+        Backfill('tags.usage_count from task_tags', _rebuild_tag_usage_counts),
+    ]),
+    Migration(4, 'attachment content hashes', [
+        # Legacy attachments keep a NULL hash until migrate_attachments.py moves their files
+        AddColumn('task_attachments', 'content_hash', 'VARCHAR(64) REFERENCES attachment_blobs (sha256)'),
+        CreateIndex('ix_task_attachments_content_hash', 'task_attachments', ['content_hash']),
+    ]),
+    Migration(5, 'task search index', [
+        CreateSearchSchema(),
+        Backfill('search index entries for existing tasks', _rebuild_search_index),
+    ], outside_models=True),
+    # create_all() adds time_log_daily empty; reports read only the rollup
+    Migration(6, 'time report daily rollup', [
+        Backfill('time_log_daily from closed time logs', _rebuild_time_log_daily),
+    ]),
+]
+
+
+def _postgresql_index_invalid(connection: Connection, name: str) -> bool:
+    return connection.execute(text(
+        "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name"
+    ), {'name': name}).scalar() or False
+
+
+def applied_versions() -> set:
+    return {row.version for row in db.session.query(SchemaMigration.version)}
+
+
+def pending_migrations() -> List[Migration]:
+    applied = applied_versions()
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def migration_statements(migration: Migration) -> List[str]:
+    """The SQL apply_migration would run against the database as it is now"""
+    with db.engine.connect() as connection:
+        return [statement for step in migration.steps for statement in step.statements(connection)]
+
+
+def _record(connection: Connection, migrations: Sequence[Migration]):
+    connection.execute(insert(SchemaMigration), [
+        {'version': migration.version, 'name': migration.name, 'applied_at': datetime.utcnow()}
+        for migration in migrations
+    ])
+
+
+def apply_migration(migration: Migration):
+    """Run every step, then record the version"""
+    engine = db.engine
+    if engine.dialect.name == 'postgresql':
+        # CONCURRENTLY refuses to run inside a transaction block
+        engine = engine.execution_options(isolation_level='AUTOCOMMIT')
+    for step in migration.steps:
+        if isinstance(step, Backfill):
+            # Backfills go through the ORM session, in ordinary transactions
+            step.function()
+            db.session.remove()
+            continue
+        with engine.begin() as connection:
+            for statement in step.statements(connection):
+                connection.execute(text(statement))
+    with db.engine.begin() as connection:
+        _record(connection, [migration])
+
+
+def run_migrations() -> List[Migration]:
+    """Apply pending migrations in version order; returns those applied"""
+    pending = pending_migrations()
+    db.session.remove()
+    for migration in pending:
+        apply_migration(migration)
+    return pending
+
+
+def stamp_migrations() -> List[Migration]:
+    """Record pending migrations as applied without running them (schema built by create_all).
+
+    Migrations for structures outside the models are run instead; on an empty
+    database that is quick.
+    """
+    pending = pending_migrations()
+    db.session.remove()
+    stamped = [migration for migration in pending if not migration.outside_models]
+    if stamped:
+        with db.engine.begin() as connection:
+            _record(connection, stamped)
+    for migration in pending:
+        if migration.outside_models:
+            apply_migration(migration)
+    return pending
@@ -0,0 +1,166 @@
+"""
+Full-text search index for tasks.
+
+SQLite uses an FTS5 virtual table (tasks_fts) keyed by task id; PostgreSQL uses a
+weighted tsvector column on tasks with a GIN index. Both store accent-folded text
+(Vietnamese diacritics and đ removed, lowercased) and fold the query the same way,
+so "tin dung" matches "Tín dụng". Other databases fall back to LIKE matching, as
+does a database whose search structures migrate.py has not created yet (migration
+5 in schema_migrations); detect_search_backend() picks the backend at startup.
+
+The index follows ORM inserts, updates and deletes of tasks through a session
+after_flush hook. Bulk statements bypass the ORM; they either call
+index_task_rows() for the rows they wrote or rely on rebuild_search_index.py.
+"""
+import logging
+import re
+import unicodedata
+from typing import Optional
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from app import db
+from models import Task
+
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Set by detect_search_backend(): 'fts5', 'tsvector' or 'like'
+_backend = None
+
+
+def fold_text(value: Optional[str]) -> str:
+    """Lowercase and strip diacritics, including the Vietnamese đ"""
+    if not value:
+        return ''
+    value = value.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def query_terms(query: str):
+    return re.findall(r'\w+', fold_text(query))
+
+
+def get_backend() -> str:
+    return _backend or 'like'
+
+
+def detect_search_backend() -> str:
+    """Use the index structures the database has; never changes the schema"""
+    global _backend
+    dialect = db.engine.dialect.name
+    _backend = 'like'
+    if dialect == 'sqlite' and inspect(db.engine).has_table('tasks_fts'):
+        _backend = 'fts5'
+    elif dialect == 'postgresql':
+        columns = {column['name'] for column in inspect(db.engine).get_columns('tasks')}
+        if 'search_vector' in columns:
+            _backend = 'tsvector'
+    if _backend == 'like' and dialect in ('sqlite', 'postgresql'):
+        logging.warning("Task search index is missing, search falls back to LIKE; run migrate.py")
+    return _backend
+
+
+def _index_rows(tasks):
+    return [
+        {'id': task.id, 'title': fold_text(task.title), 'description': fold_text(task.description)}
+        for task in tasks
+    ]
+
+
+def _write_index(connection, rows):
+    if not rows:
+        return
+    if _backend == 'fts5':
+        connection.execute(text("DELETE FROM tasks_fts WHERE rowid = :id"), [{'id': r['id']} for r in rows])
+        connection.execute(
+            text("INSERT INTO tasks_fts (rowid, title, description) VALUES (:id, :title, :description)"),
+            rows
+        )
+    elif _backend == 'tsvector':
+        connection.execute(text(
+            "UPDATE tasks SET search_vector = "
+            "setweight(to_tsvector('simple', :title), 'A') || "
+            "setweight(to_tsvector('simple', :description), 'B') "
+            "WHERE id = :id"
+        ), rows)
+
+
+def _remove_from_index(connection, task_ids):
+    if task_ids and _backend == 'fts5':
+        connection.execute(text("DELETE FROM tasks_fts WHERE rowid = :id"), [{'id': i} for i in task_ids])
+
+
+def index_task_rows(rows):
+    """Index (id, title, description) rows written with bulk statements"""
+    _write_index(db.session.connection(), _index_rows(rows))
+
+
+def rebuild_search_index(batch_size: int = 1000) -> int:
+    """Re-index every task in batches; returns the number of tasks indexed"""
+    if _backend == 'fts5':
+        db.session.execute(text("DELETE FROM tasks_fts"))
+
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = db.session.query(Task.id, Task.title, Task.description).filter(
+            Task.id > last_id
+        ).order_by(Task.id).limit(batch_size).all()
+        if not batch:
+            break
+        _write_index(db.session.connection(), _index_rows(batch))
+        indexed += len(batch)
+        last_id = batch[-1].id
+    db.session.commit()
+    return indexed
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_search_index(session, flush_context):
+    if _backend not in ('fts5', 'tsvector'):
+        return
+
+    changed = [obj for obj in session.new if isinstance(obj, Task)]
+    for obj in session.dirty:
+        if isinstance(obj, Task):
+            state = inspect(obj)
+            if state.attrs.title.history.has_changes() or state.attrs.description.history.has_changes():
+                changed.append(obj)
+    removed = [obj.id for obj in session.deleted if isinstance(obj, Task)]
+
+    if changed or removed:
+        connection = session.connection()
+        _write_index(connection, _index_rows(changed))
+        _remove_from_index(connection, removed)
+
+
+def search_query(query: str):
+    """Task query matching the search text, best matches first"""
+    terms = query_terms(query)
+    if not terms:
+        return Task.query.filter(db.false())
+
+    if _backend == 'fts5':
+        match = ' AND '.join('"%s"*' % term.replace('"', '""') for term in terms)
+        fts = db.table('tasks_fts', db.column('rowid'))
+        rank = db.literal_column(f'bm25(tasks_fts, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT})')
+        return Task.query.join(fts, fts.c.rowid == Task.id).filter(
+            text('tasks_fts MATCH :match').bindparams(match=match)
+        ).order_by(rank, Task.id.desc())
+
+    if _backend == 'tsvector':
+        vector = db.literal_column('tasks.search_vector')
+        tsquery = db.func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+        return Task.query.filter(vector.op('@@')(tsquery)).order_by(
+            db.func.ts_rank(vector, tsquery).desc(), Task.id.desc()
+        )
+
+    return Task.query.filter(
+        db.or_(
+            Task.title.contains(query),
+            Task.description.contains(query)
+        )
+    ).order_by(Task.id.desc())
@@ -0,0 +1,82 @@
+"""
+Streaming reader for task sheets (.xlsx via openpyxl read-only mode, or .csv).
+
+Rows are yielded as DataFrame chunks of at most ``chunk_size`` rows, so memory
+stays bounded by the chunk size rather than the sheet size. Chunks are indexed
+by data row number (0 = first row under the header) and carry the sheet offset
+to resume from once they have been imported.
+"""
+import csv
+import os
+from typing import Iterator, List, NamedTuple
+
+import pandas as pd
+from openpyxl import load_workbook
+
+REQUIRED_COLUMNS = ['Summary', 'Description', 'Complexity', 'Priority', 'Team', 'Assignee']
+
+
+class SheetChunk(NamedTuple):
+    frame: pd.DataFrame
+    next_offset: int
+
+
+def _clean_value(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _validate_header(header, path: str) -> List[str]:
+    columns = [str(name).strip() if name is not None else '' for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"{path} is missing required columns: {', '.join(missing)}")
+    return columns
+
+
+def _iter_rows(path: str):
+    """Yield the header row, then every data row, as tuples of cell values"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from (tuple(row) for row in csv.reader(f))
+    elif extension in ('.xlsx', '.xlsm'):
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported sheet format: {extension or path}")
+
+
+def iter_sheet_chunks(path: str, chunk_size: int = 1000, start_offset: int = 0) -> Iterator[SheetChunk]:
+    """Stream the sheet in validated chunks, skipping the first start_offset data rows"""
+    rows = _iter_rows(path)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError(f"{path} is empty")
+    columns = _validate_header(header, path)
+    width = len(columns)
+
+    offset = 0
+    index, values = [], []
+    for row in rows:
+        offset += 1
+        if offset <= start_offset:
+            continue
+        row = [_clean_value(v) for v in row[:width]]
+        if not any(v is not None for v in row):
+            continue
+        row.extend([None] * (width - len(row)))
+        index.append(offset - 1)
+        values.append(row)
+        if len(values) >= chunk_size:
+            yield SheetChunk(pd.DataFrame(values, columns=columns, index=index)[REQUIRED_COLUMNS], offset)
+            index, values = [], []
+
+    if values:
+        yield SheetChunk(pd.DataFrame(values, columns=columns, index=index)[REQUIRED_COLUMNS], offset)
+
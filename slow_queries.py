@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Rank statements recorded in the slow query log by total time
+"""
+
+import argparse
+
+from app import app, db
+from models import SlowQuery
+
+def show_slow_queries(limit=20, endpoint=None, plans=False):
+    with app.app_context():
+        query = SlowQuery.query
+        if endpoint:
+            query = query.filter(SlowQuery.endpoint == endpoint)
+        entries = query.order_by(SlowQuery.total_ms.desc()).limit(limit).all()
+        if not entries:
+            print("No slow queries recorded")
+            return
+
+        for rank, entry in enumerate(entries, 1):
+            print(f"#{rank}  total {entry.total_ms:.1f} ms  calls {entry.calls}  "
+                  f"avg {entry.total_ms / entry.calls:.1f} ms  max {entry.max_ms:.1f} ms  endpoint {entry.endpoint}")
+            print(f"    last seen {entry.last_seen:%Y-%m-%d %H:%M:%S}  parameters {entry.parameter_shape or '-'}")
+            print(f"    {entry.statement}")
+            if plans:
+                if entry.plan:
+                    for line in entry.plan.splitlines():
+                        print(f"      {line}")
+                else:
+                    print("      (no plan captured)")
+            print()
+
+def reset_slow_queries():
+    with app.app_context():
+        removed = SlowQuery.query.delete()
+        db.session.commit()
+        print(f"Removed {removed} slow query entries")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--endpoint', help='only statements issued by this endpoint')
+    parser.add_argument('--plans', action='store_true', help='print the captured query plans')
+    parser.add_argument('--reset', action='store_true', help='clear the log, e.g. after adding indexes')
+    args = parser.parse_args()
+    if args.reset:
+        reset_slow_queries()
+    else:
+        show_slow_queries(args.limit, args.endpoint, args.plans)
@@ -0,0 +1,214 @@
+"""
+Slow query log with captured query plans.
+
+Statements that take SLOW_QUERY_THRESHOLD_MS or longer are handed from the cursor
+event to a queue; nothing is written on the request's connection or in its
+transaction. A background thread aggregates them into slow_queries, one row per
+statement shape (see sql_profiler.statement_shape) and endpoint, with call
+count, total and worst time, and the types of the bound parameters (never their
+values). The first time a shape is stored, the thread also runs EXPLAIN on it
+with the original parameters (SQLite EXPLAIN QUERY PLAN, PostgreSQL EXPLAIN
+(FORMAT JSON)); plain EXPLAIN only plans the statement and does not run it.
+
+slow_queries.py ranks the recorded shapes by total time and prints their plans.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import Flask, has_request_context, request
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+
+from app import app, db
+from models import SlowQuery
+from sql_profiler import statement_shape
+
+SLOW_QUERY_QUEUE_SIZE = 1000
+SLOW_QUERY_BATCH_SIZE = 100
+
+# Statements EXPLAIN can plan without side effects
+_EXPLAINABLE = ('select', 'with', 'update', 'delete')
+
+SlowStatement = namedtuple('SlowStatement', 'statement parameters endpoint ms seen_at')
+
+_queue: 'queue.Queue[SlowStatement]' = queue.Queue(maxsize=SLOW_QUERY_QUEUE_SIZE)
+# Set in the recorder thread so its own statements are not recorded
+_recorder = threading.local()
+_dropped = 0
+
+
+def _endpoint() -> str:
+    if has_request_context():
+        return request.endpoint or request.path
+    thread = threading.current_thread()
+    if thread is threading.main_thread():
+        return os.path.basename(sys.argv[0]) or 'main'
+    return thread.name
+
+
+def _parameter_shape(parameters) -> Optional[str]:
+    if isinstance(parameters, dict):
+        return json.dumps({name: type(value).__name__ for name, value in parameters.items()})
+    if isinstance(parameters, (list, tuple)):
+        return json.dumps([type(value).__name__ for value in parameters])
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context (see sql_profiler), so a statement that raises leaves nothing behind
+    if context is not None and not getattr(_recorder, 'active', False):
+        context._slow_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    global _dropped
+    started = getattr(context, '_slow_query_start', None)
+    if getattr(_recorder, 'active', False) or started is None:
+        return
+    ms = (time.perf_counter() - started) * 1000
+    if ms < app.config['SLOW_QUERY_THRESHOLD_MS']:
+        return
+    try:
+        # executemany batches are recorded but never explained
+        _queue.put_nowait(SlowStatement(statement, None if executemany else parameters, _endpoint(), ms,
+                                        datetime.utcnow()))
+    except queue.Full:
+        _dropped += 1
+
+
+def explain(connection: Connection, statement: str, parameters) -> Optional[str]:
+    """Query plan of a driver-level statement, or None if it is not a statement EXPLAIN can plan"""
+    if parameters is None or not statement.lstrip().lower().startswith(_EXPLAINABLE):
+        return None
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        return plan if isinstance(plan, str) else json.dumps(plan, indent=2)
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[node_id] + detail)
+        return '\n'.join(lines)
+    return None
+
+
+def _upsert(connection: Connection, rows: List[Dict]):
+    table = SlowQuery.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        dialect_insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        statement = dialect_insert(table)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['shape_hash', 'endpoint'],
+            set_={
+                'calls': table.c.calls + statement.excluded.calls,
+                'total_ms': table.c.total_ms + statement.excluded.total_ms,
+                'max_ms': db.case((statement.excluded.max_ms > table.c.max_ms, statement.excluded.max_ms),
+                                  else_=table.c.max_ms),
+                'parameter_shape': statement.excluded.parameter_shape,
+                'last_seen': statement.excluded.last_seen
+            }
+        ), rows)
+        return
+    for row in rows:
+        updated = connection.execute(update(table).where(
+            table.c.shape_hash == row['shape_hash'], table.c.endpoint == row['endpoint']
+        ).values(
+            calls=table.c.calls + row['calls'],
+            total_ms=table.c.total_ms + row['total_ms'],
+            max_ms=db.case((table.c.max_ms < row['max_ms'], row['max_ms']), else_=table.c.max_ms),
+            parameter_shape=row['parameter_shape'],
+            last_seen=row['last_seen']
+        ))
+        if updated.rowcount == 0:
+            connection.execute(insert(table).values(row))
+
+
+def record_slow_statements(batch: List[SlowStatement]):
+    """Fold a batch into slow_queries and capture plans for shapes that have none"""
+    rows = {}
+    examples = {}
+    for item in batch:
+        shape = statement_shape(item.statement)
+        key = (hashlib.sha1(shape.encode()).hexdigest(), item.endpoint[:200])
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {
+                'shape_hash': key[0], 'endpoint': key[1], 'statement': shape, 'calls': 0,
+                'total_ms': 0.0, 'max_ms': 0.0, 'first_seen': item.seen_at
+            }
+        row['calls'] += 1
+        row['total_ms'] += item.ms
+        row['max_ms'] = max(row['max_ms'], item.ms)
+        row['parameter_shape'] = _parameter_shape(item.parameters)
+        row['last_seen'] = item.seen_at
+        if item.parameters is not None:
+            examples[key] = item
+
+    table = SlowQuery.__table__
+    with db.engine.begin() as connection:
+        _upsert(connection, list(rows.values()))
+        unplanned = connection.execute(select(table.c.id, table.c.shape_hash, table.c.endpoint).where(
+            table.c.shape_hash.in_({key[0] for key in examples}), table.c.plan.is_(None)
+        )).all()
+
+    for row in unplanned:
+        example = examples.get((row.shape_hash, row.endpoint))
+        if example is None:
+            continue
+        try:
+            with db.engine.connect() as connection:
+                plan = explain(connection, example.statement, example.parameters)
+                connection.rollback()
+        except Exception as e:
+            logging.warning(f"Could not explain slow query {row.shape_hash[:8]}: {e}")
+            continue
+        if plan:
+            with db.engine.begin() as connection:
+                connection.execute(update(table).where(table.c.id == row.id).values(
+                    plan=plan, plan_captured_at=datetime.utcnow()))
+
+
+def _next_batch() -> List[SlowStatement]:
+    batch = [_queue.get()]
+    while len(batch) < SLOW_QUERY_BATCH_SIZE:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _record_continuously():
+    global _dropped
+    _recorder.active = True
+    while True:
+        batch = _next_batch()
+        try:
+            with app.app_context():
+                record_slow_statements(batch)
+        except Exception as e:
+            logging.warning(f"Slow query log write failed: {e}")
+        if _dropped:
+            logging.warning(f"Slow query log queue full; {_dropped} statements not recorded")
+            _dropped = 0
+
+
+def init_slow_query_log(app: Flask):
+    """Record statements slower than SLOW_QUERY_THRESHOLD_MS from every engine of this process"""
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    threading.Thread(target=_record_continuously, name='slow-query-log', daemon=True).start()
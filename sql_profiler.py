@@ -0,0 +1,138 @@
+"""
+Per-request SQL profiling with N+1 detection.
+
+For a sampled request, cursor events on every engine count the statements run,
+add up their database time and keep the slowest ones. Statements are grouped by
+shape (the SQL with literals and IN-list lengths folded away); a shape run
+SQL_PROFILER_REPEAT_THRESHOLD times or more in one request is reported as a
+likely N+1, e.g. a relationship loaded once per row of a list.
+
+The results go out as a Server-Timing header (visible in the browser's network
+panel) and as one JSON log line per request. Queries run while a streamed
+response is being generated happen after the header is sent and are not counted.
+"""
+import heapq
+import json
+import logging
+import random
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+STATEMENT_LOG_LENGTH = 500
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\([^)]*\)s|%s|:\w+|\$\d+|\?')
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement: str) -> str:
+    """statement with literals and placeholders replaced by ?, so repeats differing only in values match"""
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('?, ...', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class RequestProfile:
+    """Statements run while handling one request"""
+
+    def __init__(self, slowest: int):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self._slowest_size = slowest
+        self._slowest: List[Tuple[float, int, str]] = []
+        self._shapes: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def record(self, statement: str, seconds: float):
+        self.query_count += 1
+        self.db_seconds += seconds
+        # The counter breaks ties so statements themselves are never compared
+        entry = (seconds, self.query_count, statement)
+        if len(self._slowest) < self._slowest_size:
+            heapq.heappush(self._slowest, entry)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+        totals = self._shapes[statement_shape(statement)]
+        totals[0] += 1
+        totals[1] += seconds
+
+    def slowest(self) -> List[Dict]:
+        return [{'ms': round(seconds * 1000, 2), 'statement': statement[:STATEMENT_LOG_LENGTH]}
+                for seconds, _, statement in sorted(self._slowest, reverse=True)]
+
+    def repeated(self, threshold: int) -> List[Dict]:
+        """Shapes run at least threshold times, most frequent first"""
+        shapes = [(count, seconds, shape) for shape, (count, seconds) in self._shapes.items() if count >= threshold]
+        return [{'count': count, 'ms': round(seconds * 1000, 2), 'statement': shape[:STATEMENT_LOG_LENGTH]}
+                for count, seconds, shape in sorted(shapes, reverse=True)]
+
+
+def _current_profile():
+    return g.get('sql_profile') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The start lives on the execution context, so a statement that raises leaves nothing behind
+    if context is not None and _current_profile() is not None:
+        context._sql_profiler_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    started = getattr(context, '_sql_profiler_start', None)
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def init_sql_profiler(app: Flask):
+    """Profile SQL_PROFILER_SAMPLE_RATE of the requests app handles"""
+    sample_rate = app.config['SQL_PROFILER_SAMPLE_RATE']
+    slowest = app.config['SQL_PROFILER_SLOWEST']
+    threshold = app.config['SQL_PROFILER_REPEAT_THRESHOLD']
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def _start_sql_profile():
+        if random.random() < sample_rate:
+            g.sql_profile = RequestProfile(slowest)
+
+    @app.after_request
+    def _report_sql_profile(response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+
+        request_ms = (time.perf_counter() - profile.started) * 1000
+        db_ms = profile.db_seconds * 1000
+        response.headers.add('Server-Timing', f'db;desc="{profile.query_count} queries";dur={db_ms:.2f}')
+        response.headers.add('Server-Timing', f'app;dur={request_ms:.2f}')
+
+        repeated = profile.repeated(threshold)
+        log_line = json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'queries': profile.query_count,
+            'db_ms': round(db_ms, 2),
+            'request_ms': round(request_ms, 2),
+            'slowest': profile.slowest(),
+            'repeated': repeated
+        })
+        if repeated:
+            logging.warning(f"SQL profile (possible N+1): {log_line}")
+        else:
+            logging.info(f"SQL profile: {log_line}")
+        return response
@@ -0,0 +1,69 @@
+// Resumable chunked uploads (/api/task/<id>/uploads, PUT chunks, finalize)
+
+const CHUNKED_UPLOAD_THRESHOLD = 16 * 1024 * 1024;
+const CHUNK_RETRY_LIMIT = 5;
+
+function chunkedUploadKey(taskId, file) {
+    return ['chunked-upload', taskId, file.name, file.size, file.lastModified].join(':');
+}
+
+async function uploadRequest(url, options) {
+    const response = await fetch(url, options);
+    return { status: response.status, data: await response.json() };
+}
+
+// Resume the upload of this file if one was interrupted, otherwise start a new one
+async function openUploadSession(taskId, file) {
+    const savedId = localStorage.getItem(chunkedUploadKey(taskId, file));
+    if (savedId) {
+        const { data } = await uploadRequest(`/api/uploads/${savedId}`);
+        if (data.success) return { id: savedId, offset: data.upload.offset, chunkSize: null };
+    }
+
+    const { data } = await uploadRequest(`/api/task/${taskId}/uploads`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type })
+    });
+    if (!data.success) throw new Error(data.error || 'Could not start upload');
+    localStorage.setItem(chunkedUploadKey(taskId, file), data.upload.upload_id);
+    return { id: data.upload.upload_id, offset: 0, chunkSize: data.chunk_size };
+}
+
+async function uploadFileInChunks(taskId, file, onProgress) {
+    const session = await openUploadSession(taskId, file);
+    const chunkSize = session.chunkSize || 8 * 1024 * 1024;
+    let offset = session.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+        if (onProgress) onProgress(offset / file.size);
+        const chunk = file.slice(offset, Math.min(offset + chunkSize, file.size));
+        try {
+            const { status, data } = await uploadRequest(`/api/uploads/${session.id}?offset=${offset}`, {
+                method: 'PUT',
+                body: chunk
+            });
+            // A 409 carries the offset the server acknowledged; continue from there
+            if ((status !== 200 && status !== 409) || data.offset === undefined) {
+                throw new Error(data.error || 'Upload failed');
+            }
+            offset = data.offset;
+            retries = 0;
+        } catch (error) {
+            if (++retries > CHUNK_RETRY_LIMIT) throw error;
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            const { data } = await uploadRequest(`/api/uploads/${session.id}`);
+            if (!data.success) throw error;
+            offset = data.upload.offset;
+        }
+    }
+    if (onProgress) onProgress(1);
+
+    const { data } = await uploadRequest(`/api/uploads/${session.id}/finalize`, { method: 'POST' });
+    if (data.success) localStorage.removeItem(chunkedUploadKey(taskId, file));
+    return data;
+}
+
+window.CHUNKED_UPLOAD_THRESHOLD = CHUNKED_UPLOAD_THRESHOLD;
+window.uploadFileInChunks = uploadFileInChunks;
@@ -2,6 +2,7 @@
 
 let statusChart = null;
 let priorityChart = null;
+let hoursChart = null;
 
 function initializeDashboard() {
     console.log('Initializing dashboard...');
@@ -9,6 +10,7 @@ function initializeDashboard() {
     // Initialize charts
     initializeStatusChart();
     initializePriorityChart();
+    initializeHoursChart();
     
     // Initialize animations
     animateMetrics();
@@ -157,6 +159,51 @@ function initializePriorityChart() {
     });
 }
 
+function initializeHoursChart() {
+    const canvas = document.getElementById('hoursChart');
+    if (!canvas || !window.dashboardData || !window.dashboardData.hoursData) return;
+    
+    const ctx = canvas.getContext('2d');
+    const data = window.dashboardData.hoursData;
+    
+    hoursChart = new Chart(ctx, {
+        type: 'line',
+        data: {
+            labels: data.dates,
+            datasets: [{
+                label: 'Hours',
+                data: data.hours,
+                borderColor: '#0052CC',
+                backgroundColor: 'rgba(0, 82, 204, 0.1)',
+                fill: true,
+                tension: 0.3
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: {
+                    display: false
+                }
+            },
+            scales: {
+                y: {
+                    beginAtZero: true,
+                    grid: {
+                        color: 'rgba(0, 0, 0, 0.1)'
+                    }
+                },
+                x: {
+                    grid: {
+                        display: false
+                    }
+                }
+            }
+        }
+    });
+}
+
 function animateMetrics() {
     const metricValues = document.querySelectorAll('.metric-value');
     
@@ -187,28 +234,32 @@ function initializeRefresh() {
     const refreshBtn = document.getElementById('refreshDashboard');
     if (refreshBtn) {
         refreshBtn.addEventListener('click', function() {
+            const label = this.innerHTML;
             this.disabled = true;
             this.innerHTML = '<i class="spinner-border spinner-border-sm me-2"></i>Refreshing...';
             
-            // Simulate refresh (in a real app, this would fetch new data)
-            setTimeout(() => {
-                location.reload();
-            }, 1000);
+            updateDashboardData().finally(() => {
+                this.disabled = false;
+                this.innerHTML = label;
+            });
         });
     }
     
-    // Auto-refresh every 5 minutes
-    setInterval(() => {
-        console.log('Auto-refreshing dashboard data...');
-        // In a real application, you would fetch new data here
-        // updateDashboardData();
-    }, 5 * 60 * 1000);
+    // Refresh when tasks change, or every 5 minutes without live events
+    if (typeof liveBoardEventsEnabled === 'function' && liveBoardEventsEnabled()) {
+        const refresh = debounceBoardEvents(updateDashboardData, 2000);
+        ['task.created', 'task.updated', 'task.status', 'task.priority', 'task.deleted', 'timelog.stopped'].forEach(type => {
+            onBoardEvent(type, refresh);
+        });
+    } else {
+        setInterval(updateDashboardData, 5 * 60 * 1000);
+    }
 }
 
 function updateDashboardData() {
     // This function would fetch new data from the server
     // and update the charts without a full page reload
-    fetch('/api/dashboard-data')
+    return fetch('/api/dashboard-data')
         .then(response => response.json())
         .then(data => {
             updateCharts(data);
@@ -238,6 +289,12 @@ function updateCharts(data) {
         ];
         priorityChart.update('none');
     }
+    
+    if (hoursChart && data.hoursData) {
+        hoursChart.data.labels = data.hoursData.dates;
+        hoursChart.data.datasets[0].data = data.hoursData.hours;
+        hoursChart.update('none');
+    }
 }
 
 function updateMetrics(data) {
@@ -317,6 +374,9 @@ function handleResize() {
     if (priorityChart) {
         priorityChart.resize();
     }
+    if (hoursChart) {
+        hoursChart.resize();
+    }
 }
 
 // Initialize resize handling
@@ -330,6 +390,9 @@ window.addEventListener('beforeunload', function() {
     if (priorityChart) {
         priorityChart.destroy();
     }
+    if (hoursChart) {
+        hoursChart.destroy();
+    }
 });
 
 // Export functions for global use
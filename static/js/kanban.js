@@ -544,8 +544,19 @@ function initializeTimeTracking() {
     // Check for active time tracking on page load
     checkActiveTimeLog();
     
-    // Set up periodic checks
-    setInterval(checkActiveTimeLog, 30000); // Check every 30 seconds
+    // Re-check when this user's tracking starts or stops elsewhere (another tab or device)
+    if (typeof liveBoardEventsEnabled === 'function' && liveBoardEventsEnabled()) {
+        onBoardEvent('timelog.started', syncActiveTimeLog);
+        onBoardEvent('timelog.stopped', syncActiveTimeLog);
+    } else {
+        setInterval(checkActiveTimeLog, 30000); // Check every 30 seconds
+    }
+}
+
+function syncActiveTimeLog(payload) {
+    if (payload.user_id === String(window.currentUserId)) {
+        checkActiveTimeLog();
+    }
 }
 
 function checkActiveTimeLog() {
@@ -0,0 +1,50 @@
+// Live board updates pushed by the server (/events/board)
+
+const BOARD_EVENT_TYPES = [
+    'task.created', 'task.updated', 'task.status', 'task.priority', 'task.time', 'task.deleted',
+    'timelog.started', 'timelog.stopped', 'resync'
+];
+
+let boardEventSource = null;
+const boardEventHandlers = {};
+
+// False when the server has live events turned off; pages then poll instead
+function liveBoardEventsEnabled() {
+    return Boolean(window.LIVE_EVENTS_ENABLED && window.EventSource);
+}
+
+function connectBoardEvents() {
+    if (boardEventSource || !liveBoardEventsEnabled()) return;
+
+    // Follow the same team as the page being viewed
+    let url = '/events/board';
+    const teamFilter = new URLSearchParams(window.location.search).get('team');
+    if (teamFilter) url += '?team=' + encodeURIComponent(teamFilter);
+
+    boardEventSource = new EventSource(url);
+    BOARD_EVENT_TYPES.forEach(type => {
+        boardEventSource.addEventListener(type, function(e) {
+            const payload = e.data ? JSON.parse(e.data) : {};
+            (boardEventHandlers[type] || []).forEach(handler => handler(payload));
+        });
+    });
+}
+
+// Register a handler for one event type; the stream opens on first use
+function onBoardEvent(type, handler) {
+    (boardEventHandlers[type] = boardEventHandlers[type] || []).push(handler);
+    connectBoardEvents();
+}
+
+// Call handler at most once per delay for a burst of events
+function debounceBoardEvents(handler, delay) {
+    let timer = null;
+    return function(payload) {
+        clearTimeout(timer);
+        timer = setTimeout(() => handler(payload), delay);
+    };
+}
+
+window.liveBoardEventsEnabled = liveBoardEventsEnabled;
+window.onBoardEvent = onBoardEvent;
+window.debounceBoardEvents = debounceBoardEvents;
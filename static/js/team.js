@@ -15,6 +15,9 @@ function initializeTeam() {
     // Initialize inline editing
     initializeInlineEditing();
     
+    // Keep member task counts current from live board events
+    initializeLiveTaskCounts();
+    
     // Initialize feather icons
     if (typeof feather !== 'undefined') {
         feather.replace();
@@ -39,22 +42,20 @@ function initializeRoleManagement() {
             // Submit the form
             fetch(this.action, {
                 method: 'POST',
+                headers: {'X-Requested-With': 'XMLHttpRequest'},
                 body: formData
             })
-            .then(response => {
-                if (response.ok) {
-                    // Close modal and reload page
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    // Close modal and update the member's badges in place
                     const modal = bootstrap.Modal.getInstance(document.getElementById('roleModal'));
                     modal.hide();
                     
+                    renderRoleBadges(data.user.id, data.user.role, data.user.is_administrator);
                     showNotification('User role updated successfully!', 'success');
-                    
-                    // Reload page after a short delay
-                    setTimeout(() => {
-                        window.location.reload();
-                    }, 1000);
                 } else {
-                    throw new Error('Failed to update role');
+                    throw new Error(data.error || 'Failed to update role');
                 }
             })
             .catch(error => {
@@ -69,6 +70,61 @@ function initializeRoleManagement() {
     }
 }
 
+function renderRoleBadges(userId, role, isAdministrator) {
+    const container = document.querySelector(`[data-role-badges="${userId}"]`);
+    if (!container) return;
+    
+    const roleBadges = {
+        'manager': '<span class="badge bg-warning text-dark">Manager</span>',
+        'director': '<span class="badge bg-secondary">Director</span>'
+    };
+    let html = isAdministrator
+        ? '<span class="badge bg-dark"><i data-feather="shield" style="width: 12px; height: 12px;"></i> Admin</span>'
+        : '';
+    html += roleBadges[role] || '<span class="badge bg-primary">Analyst</span>';
+    container.innerHTML = html;
+    
+    // Keep the edit button opening the modal with the new role
+    const editButton = document.querySelector(`button[onclick^="setRoleModalData('${userId}'"]`);
+    if (editButton) {
+        const onclick = editButton.getAttribute('onclick');
+        editButton.setAttribute('onclick', onclick.replace(
+            /setRoleModalData\('([^']*)', '([^']*)', '[^']*', \w+\)/,
+            `setRoleModalData('$1', '$2', '${role}', ${isAdministrator})`
+        ));
+    }
+    
+    if (typeof feather !== 'undefined') {
+        feather.replace();
+    }
+}
+
+function initializeLiveTaskCounts() {
+    if (typeof onBoardEvent !== 'function' || !document.querySelector('[data-member-tasks]')) return;
+    
+    onBoardEvent('task.created', p => adjustMemberTaskCount(p.assignee_id, p.status, 1));
+    onBoardEvent('task.deleted', p => adjustMemberTaskCount(p.assignee_id, p.status, -1));
+    onBoardEvent('task.status', p => {
+        const oldAssignee = 'old_assignee_id' in p ? p.old_assignee_id : p.assignee_id;
+        adjustMemberTaskCount(oldAssignee, p.old_status, -1);
+        adjustMemberTaskCount(p.assignee_id, p.status, 1);
+    });
+    onBoardEvent('task.updated', p => {
+        // Reassignments only; a status change in the same update is handled by task.status
+        if (!('old_assignee_id' in p) || 'old_status' in p) return;
+        adjustMemberTaskCount(p.old_assignee_id, p.status, -1);
+        adjustMemberTaskCount(p.assignee_id, p.status, 1);
+    });
+}
+
+function adjustMemberTaskCount(userId, status, delta) {
+    if (!userId || !status) return;
+    const badge = document.querySelector(`[data-member-tasks="${userId}"] [data-status="${status}"]`);
+    if (badge) {
+        badge.textContent = Math.max(0, (parseInt(badge.textContent) || 0) + delta);
+    }
+}
+
 function initializeTeamStats() {
     // Animate progress bars
     const progressBars = document.querySelectorAll('.progress-bar');
@@ -225,11 +281,6 @@ function bulkUpdateRole(newRole) {
         
         showNotification(`Updated ${selectedIds.length} member(s) successfully!`, 'success');
         toggleMemberSelection(); // Exit selection mode
-        
-        // Reload page to show changes
-        setTimeout(() => {
-            window.location.reload();
-        }, 1000);
     }
 }
 
@@ -0,0 +1,210 @@
+"""
+Bulk tag resolution by normalized name.
+
+resolve_tag_ids() maps a list of tag names to ids with one IN query on the unique
+name_key index, for whatever the process cache does not already know. Missing tags
+are created with one multi-row INSERT ... ON CONFLICT DO NOTHING and read back, so
+two requests creating the same tag at once both end up with the row that won.
+Tagging thousands of tasks costs a few queries instead of a scan per tag.
+
+The name_key -> id cache is per process. Ids looked up or created in a transaction
+only enter it when that transaction commits. Tags renamed or deleted through the
+ORM leave it on commit, and resolve_tags() forgets ids that no longer exist
+(a tag deleted by another process).
+"""
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import delete, event, inspect, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import db
+from models import Tag, tag_name_key, task_tags
+
+# Keeps IN lists and multi-row inserts under the bound-parameter limits
+TAG_BATCH_SIZE = 500
+TAG_CACHE_SIZE = 10000
+
+_PENDING_KEY = 'tag_cache_pending'
+_STALE_KEY = 'tag_cache_stale'
+
+_cache: Dict[str, int] = {}
+_cache_lock = threading.Lock()
+
+
+def _batches(items: Sequence, size: int = TAG_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def invalidate_tag_cache(keys: Iterable[str] = None):
+    """Forget the given name keys, or everything; for scripts that change tags in bulk"""
+    with _cache_lock:
+        if keys is None:
+            _cache.clear()
+        else:
+            for key in keys:
+                _cache.pop(key, None)
+
+
+def _lookup(keys: Sequence[str]) -> Dict[str, int]:
+    found = {}
+    for batch in _batches(keys):
+        found.update(db.session.query(Tag.name_key, Tag.id).filter(Tag.name_key.in_(batch)).all())
+    return found
+
+
+def _insert_missing(names_by_key: Dict[str, str]):
+    now = datetime.utcnow()
+    rows = [{'name': name, 'name_key': key, 'created_at': now} for key, name in names_by_key.items()]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        dialect_insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        for batch in _batches(rows):
+            db.session.execute(dialect_insert(Tag.__table__).values(batch).on_conflict_do_nothing())
+        return
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Tag.__table__).values(row))
+        except IntegrityError:
+            # Created by a concurrent request; read back below
+            pass
+
+
+def resolve_tag_ids(names: Iterable[str], create: bool = True) -> Dict[str, int]:
+    """tag_name_key(name) -> tag id for each name, creating missing tags unless create is False"""
+    wanted = {}
+    for name in names:
+        key = tag_name_key(name)
+        if key and key not in wanted:
+            wanted[key] = name.strip()
+
+    session = db.session()
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    resolved = {}
+    with _cache_lock:
+        for key in wanted:
+            tag_id = pending.get(key) or _cache.get(key)
+            if tag_id:
+                resolved[key] = tag_id
+
+    missing = [key for key in wanted if key not in resolved]
+    if missing:
+        found = _lookup(missing)
+        if create and len(found) < len(missing):
+            _insert_missing({key: wanted[key] for key in missing if key not in found})
+            found = _lookup(missing)
+        pending.update(found)
+        resolved.update(found)
+    return resolved
+
+
+def resolve_tags(names: Sequence[str]) -> List[Tag]:
+    """Tag objects for names (created if needed), in the order given, one per distinct key"""
+    keys = list(dict.fromkeys(key for key in map(tag_name_key, names) if key))
+    ids = resolve_tag_ids(names)
+
+    tags = {}
+    for batch in _batches(list(set(ids.values()))):
+        tags.update((tag.id, tag) for tag in Tag.query.filter(Tag.id.in_(batch)))
+
+    stale = [key for key in keys if ids.get(key) not in tags]
+    if stale:
+        invalidate_tag_cache(stale)
+        pending = db.session().info.get(_PENDING_KEY, {})
+        for key in stale:
+            pending.pop(key, None)
+        ids.update(resolve_tag_ids([name for name in names if tag_name_key(name) in stale]))
+        for tag in Tag.query.filter(Tag.id.in_([ids[key] for key in stale])):
+            tags[tag.id] = tag
+
+    return [tags[ids[key]] for key in keys]
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_stale_tags(session, flush_context):
+    stale = set()
+    for obj in session.deleted:
+        if isinstance(obj, Tag):
+            stale.add(obj.name_key)
+    for obj in session.dirty:
+        if isinstance(obj, Tag):
+            history = inspect(obj).attrs.name_key.history
+            stale.update(key for key in history.deleted or () if key)
+    if stale:
+        session.info.setdefault(_STALE_KEY, set()).update(stale)
+
+
+@event.listens_for(Session, 'after_commit')
+def _update_tag_cache(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    stale = session.info.pop(_STALE_KEY, None)
+    if not pending and not stale:
+        return
+    with _cache_lock:
+        if pending:
+            if len(_cache) + len(pending) > TAG_CACHE_SIZE:
+                _cache.clear()
+            _cache.update(pending)
+        for key in stale or ():
+            _cache.pop(key, None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_tags(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_STALE_KEY, None)
+
+
+def merge_duplicate_tags(tag_ids: Sequence[int]):
+    """Move every task of tag_ids onto the first (lowest) id and delete the rest"""
+    keep, duplicates = tag_ids[0], tag_ids[1:]
+    tagged = select(task_tags.c.task_id).where(task_tags.c.tag_id == keep)
+    moving = select(task_tags.c.task_id).where(
+        task_tags.c.tag_id.in_(duplicates), task_tags.c.task_id.not_in(tagged)
+    ).distinct()
+    db.session.execute(insert(task_tags).from_select(['task_id', 'tag_id'],
+                                                     select(moving.subquery().c.task_id, db.literal(keep))))
+    db.session.execute(delete(task_tags).where(task_tags.c.tag_id.in_(duplicates)))
+    db.session.execute(delete(Tag.__table__).where(Tag.id.in_(duplicates)))
+
+
+def rekey_tags(batch_size: int = TAG_BATCH_SIZE, dry_run: bool = False) -> Tuple[int, int, int]:
+    """Recompute name_key for every tag and merge tags whose keys collide.
+
+    Python computes the key (NFC + casefold), which SQL lower() cannot reproduce.
+    Returns (tags keyed, duplicates merged, tags they were merged into).
+    """
+    tags = Tag.__table__
+    ids_by_key = defaultdict(list)
+    keyed = 0
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(tags.c.id, tags.c.name).where(tags.c.id > last_id).order_by(tags.c.id).limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        rows = [{'tag_id': tag_id, 'key': tag_name_key(name)} for tag_id, name in batch]
+        for row in rows:
+            ids_by_key[row['key']].append(row['tag_id'])
+        if not dry_run:
+            db.session.execute(update(tags).where(tags.c.id == db.bindparam('tag_id'))
+                               .values(name_key=db.bindparam('key')), rows)
+            db.session.commit()
+        keyed += len(rows)
+
+    duplicate_groups = [ids for ids in ids_by_key.values() if len(ids) > 1]
+    if not dry_run:
+        for ids in duplicate_groups:
+            merge_duplicate_tags(sorted(ids))
+        db.session.commit()
+        invalidate_tag_cache()
+    return keyed, sum(len(ids) - 1 for ids in duplicate_groups), len(duplicate_groups)
@@ -0,0 +1,110 @@
+"""
+Task history recorded with the transaction that makes the change.
+
+record_history() only queues an entry on the ORM session. Just before the
+session commits, everything queued is written with a single multi-row INSERT,
+so a status + priority + assignee edit costs one commit instead of four, and
+history never exists for a change that was rolled back.
+
+With TASK_HISTORY_OUTBOX_THRESHOLD set, a transaction that queued at least that
+many entries (bulk edits, imports) writes them instead as one JSON row in
+task_history_outbox. A background worker (or drain_history_outbox.py) moves
+outbox rows into task_history in batches, keeping the task_history indexes out
+of the bulk edit's transaction. Those entries show up in a task's history a few
+seconds after the edit.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, event, insert
+from sqlalchemy.orm import Session
+
+from app import app, db
+from models import TaskHistory, TaskHistoryOutbox
+
+OUTBOX_BATCH_SIZE = 100
+
+_SESSION_KEY = 'task_history'
+
+
+def record_history(task_id, user_id, action: str, field_name: str = None, old_value: Any = None,
+                   new_value: Any = None, session: Session = None):
+    """Queue a history entry; it is written when the session next commits"""
+    session = session or db.session()
+    session.info.setdefault(_SESSION_KEY, []).append({
+        'task_id': int(task_id),
+        'user_id': int(user_id),
+        'action': action,
+        'field_name': field_name,
+        'old_value': None if old_value is None else str(old_value),
+        'new_value': None if new_value is None else str(new_value),
+        'created_at': datetime.utcnow()
+    })
+
+
+def _encode_entries(entries: List[Dict]) -> str:
+    return json.dumps([dict(entry, created_at=entry['created_at'].isoformat()) for entry in entries])
+
+
+def _decode_entries(payload: str) -> List[Dict]:
+    return [dict(entry, created_at=datetime.fromisoformat(entry['created_at'])) for entry in json.loads(payload)]
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_history(session):
+    entries = session.info.pop(_SESSION_KEY, None)
+    if not entries:
+        return
+    threshold = app.config.get('TASK_HISTORY_OUTBOX_THRESHOLD', 0)
+    if threshold and len(entries) >= threshold:
+        session.execute(insert(TaskHistoryOutbox), [{
+            'entries': _encode_entries(entries),
+            'created_at': datetime.utcnow()
+        }])
+    else:
+        session.execute(insert(TaskHistory), entries)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_history(session):
+    session.info.pop(_SESSION_KEY, None)
+
+
+def drain_history_outbox(batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Move outbox rows into task_history; returns the number of history entries written"""
+    written = 0
+    while True:
+        ids = [row.id for row in db.session.query(TaskHistoryOutbox.id).order_by(
+            TaskHistoryOutbox.id).limit(batch_size)]
+        if not ids:
+            return written
+        # DELETE ... RETURNING claims the rows, so concurrent drains never copy one twice
+        claimed = db.session.execute(
+            delete(TaskHistoryOutbox).where(TaskHistoryOutbox.id.in_(ids)).returning(TaskHistoryOutbox.entries),
+            execution_options={'synchronize_session': False}
+        ).scalars().all()
+        entries = [entry for payload in claimed for entry in _decode_entries(payload)]
+        if entries:
+            db.session.execute(insert(TaskHistory), entries)
+        db.session.commit()
+        written += len(entries)
+
+
+def _drain_periodically(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                drain_history_outbox()
+        except Exception as e:
+            logging.warning(f"Task history outbox drain failed: {e}")
+
+
+def start_history_outbox_worker(interval_seconds: float):
+    """Drain the outbox every interval_seconds in a background thread of this process"""
+    threading.Thread(target=_drain_periodically, args=(interval_seconds,),
+                     name='task-history-outbox', daemon=True).start()
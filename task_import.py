@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Bulk import of tasks from the Excel task export (Summary, Description, Complexity,
+Priority, Team, Assignee columns).
+
+The sheet is streamed in chunks (see sheet_reader), so memory use does not grow
+with the sheet. Rows are mapped with vectorized pandas operations, teams and users
+are upserted per chunk with one IN lookup and one multi-row insert each, and tasks
+go in as multi-row inserts of ``chunk_size`` rows, one transaction per chunk.
+The sheet offset is checkpointed in import_checkpoints in the same transaction as
+the chunk's tasks, so a rerun on the same file resumes exactly after the last
+committed chunk, without importing any row twice.
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.security import generate_password_hash
+
+from app import app, db
+from models import ImportCheckpoint, User, Task, Team
+from search_index import index_task_rows
+from sheet_reader import iter_sheet_chunks
+
+DEFAULT_WORKBOOK = 'attached_assets/Book4_1749639551792.xlsx'
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_PASSWORD = '123'
+
+COMPLEXITY_MAP = {
+    'Very Simple': 'very_simple',
+    'Simple': 'simple',
+    'Medium': 'medium',
+    'Complex': 'complex',
+    'Very Complex': 'very_complex'
+}
+
+PRIORITY_MAP = {
+    'Low': 'low',
+    'Medium': 'medium',
+    'High': 'high',
+    'Urgent': 'urgent'
+}
+
+# Estimated hours are drawn uniformly from these ranges per complexity
+COMPLEXITY_HOURS = {
+    'very_simple': (1, 3),
+    'simple': (2, 6),
+    'medium': (4, 12),
+    'complex': (8, 24),
+    'very_complex': (16, 40)
+}
+
+# Status distribution (40% todo, 35% in_progress, 25% completed)
+STATUS_OPTIONS = ['todo', 'in_progress', 'completed']
+STATUS_WEIGHTS = [0.40, 0.35, 0.25]
+
+
+def _clean_names(series: pd.Series) -> pd.Series:
+    return series.where(series.notna(), None).map(lambda v: str(v).strip() if v is not None else None)
+
+
+def prepare_tasks(df: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """Map a sheet chunk (indexed by data row number) to task column values without iterating rows"""
+    count = len(df)
+    summary = df['Summary']
+    fallback_titles = pd.Series([f"Task {i + 1}" for i in df.index], index=df.index)
+
+    frame = pd.DataFrame(index=df.index)
+    frame['title'] = summary.where(summary.notna(), fallback_titles).astype(str).str.slice(0, 200)
+    frame['description'] = df['Description'].where(df['Description'].notna(), '').astype(str)
+    frame['complexity'] = df['Complexity'].map(COMPLEXITY_MAP).fillna('medium')
+    frame['priority'] = df['Priority'].map(PRIORITY_MAP).fillna('medium')
+    frame['status'] = rng.choice(STATUS_OPTIONS, size=count, p=STATUS_WEIGHTS)
+
+    low = frame['complexity'].map(lambda c: COMPLEXITY_HOURS[c][0]).to_numpy(dtype=float)
+    high = frame['complexity'].map(lambda c: COMPLEXITY_HOURS[c][1]).to_numpy(dtype=float)
+    frame['estimated_hours'] = rng.uniform(low, high)
+
+    frame['team_name'] = _clean_names(df['Team'])
+    frame['assignee'] = _clean_names(df['Assignee'])
+    return frame
+
+
+def _insert_ignore(table):
+    """INSERT that skips rows violating a unique constraint"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+def upsert_teams(names: Iterable[str], cache: Dict[str, int]) -> Dict[str, int]:
+    """Resolve team names to ids, creating missing teams in one statement"""
+    missing = {name for name in names if name and name not in cache}
+    if not missing:
+        return cache
+
+    existing = db.session.query(Team.name, Team.id).filter(Team.name.in_(missing)).all()
+    cache.update(dict(existing))
+    to_create = sorted(missing - set(cache))
+    if to_create:
+        db.session.execute(_insert_ignore(Team.__table__), [
+            {'name': name, 'description': f"Banking team: {name}", 'is_active': True}
+            for name in to_create
+        ])
+        cache.update(dict(db.session.query(Team.name, Team.id).filter(Team.name.in_(to_create)).all()))
+    return cache
+
+
+def upsert_users(usernames: Iterable[str], cache: Dict[str, int], password_hash: str) -> Dict[str, int]:
+    """Resolve usernames to ids, creating missing analysts in one statement"""
+    missing = {name for name in usernames if name and name not in cache}
+    if not missing:
+        return cache
+
+    existing = db.session.query(User.username, User.id).filter(User.username.in_(missing)).all()
+    cache.update(dict(existing))
+    to_create = sorted(missing - set(cache))
+    if to_create:
+        db.session.execute(_insert_ignore(User.__table__), [
+            {
+                'username': name,
+                'email': f"{name}@bidv.com.vn",
+                'password_hash': password_hash,
+                'role': 'analyst',
+                'is_administrator': False,
+                'is_active': True
+            }
+            for name in to_create
+        ])
+        cache.update(dict(db.session.query(User.username, User.id).filter(User.username.in_(to_create)).all()))
+    return cache
+
+
+def resolve_creator_id(creator_username: Optional[str] = None) -> int:
+    """Creator for imported tasks: the named user, else the first administrator"""
+    if creator_username:
+        creator = db.session.query(User.id).filter_by(username=creator_username).scalar()
+        if creator:
+            return creator
+    admin_id = db.session.query(User.id).filter_by(is_administrator=True).order_by(User.id).limit(1).scalar()
+    return admin_id or 1
+
+
+class SheetCheckpoint:
+    """Resume point of one sheet file, kept in import_checkpoints"""
+
+    def __init__(self, path: str):
+        self.source = os.path.abspath(path)
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime = int(stat.st_mtime)
+
+    def load(self) -> int:
+        """Offset to resume from, or 0 if there is no checkpoint for this file version"""
+        checkpoint = db.session.get(ImportCheckpoint, self.source)
+        if checkpoint is None or (checkpoint.source_size, checkpoint.source_mtime) != (self.size, self.mtime):
+            return 0
+        return checkpoint.next_offset
+
+    def save(self, next_offset: int, imported: int):
+        """Stage the offset in the current transaction; it is committed with the chunk it follows"""
+        db.session.merge(ImportCheckpoint(source=self.source, source_size=self.size, source_mtime=self.mtime,
+                                          next_offset=next_offset, imported=imported))
+
+    def clear(self):
+        ImportCheckpoint.query.filter_by(source=self.source).delete()
+        db.session.commit()
+
+
+class TaskImporter:
+    """Import task sheet chunks; keeps team/user id caches across chunks"""
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, creator_username: Optional[str] = None,
+                 seed: Optional[int] = None, checkpoint: Optional[SheetCheckpoint] = None):
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.creator_username = creator_username
+        self.rng = np.random.default_rng(seed)
+        self.team_ids: Dict[str, int] = {}
+        self.user_ids: Dict[str, int] = {}
+        self.creator_id = None
+        self.password_hash = None
+        self.imported = 0
+
+    def import_chunk(self, df: pd.DataFrame, next_offset: Optional[int] = None) -> int:
+        """Import one DataFrame chunk in its own transaction, checkpointing next_offset with it"""
+        if df.empty:
+            return 0
+        if self.creator_id is None:
+            self.creator_id = resolve_creator_id(self.creator_username)
+            # Hash the default password once instead of once per created user
+            self.password_hash = generate_password_hash(DEFAULT_PASSWORD)
+
+        frame = prepare_tasks(df, self.rng)
+
+        upsert_teams(frame['team_name'].dropna().unique(), self.team_ids)
+        upsert_users(frame['assignee'].dropna().unique(), self.user_ids, self.password_hash)
+
+        frame['team_id'] = frame['team_name'].map(self.team_ids)
+        frame['assignee_id'] = frame['assignee'].map(self.user_ids)
+
+        columns = ['title', 'description', 'status', 'priority', 'complexity', 'estimated_hours',
+                   'team_id', 'assignee_id']
+        records = frame[columns].astype(object).where(frame[columns].notna(), None).to_dict('records')
+        for record in records:
+            record['created_by'] = self.creator_id
+            record['actual_hours'] = 0.0
+
+        inserted = 0
+        statement = insert(Task.__table__).returning(Task.id, Task.title, Task.description)
+        for start in range(0, len(records), self.chunk_size):
+            batch = records[start:start + self.chunk_size]
+            rows = db.session.execute(statement, batch).all()
+            index_task_rows(rows)
+            inserted += len(batch)
+        if self.checkpoint is not None and next_offset is not None:
+            self.checkpoint.save(next_offset, self.imported + inserted)
+        db.session.commit()
+
+        self.imported += inserted
+        return inserted
+
+    def import_frames(self, frames: Iterable[pd.DataFrame]) -> int:
+        for frame in frames:
+            self.import_chunk(frame)
+        return self.imported
+
+
+def import_tasks(path: str = DEFAULT_WORKBOOK, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 creator_username: Optional[str] = None, seed: Optional[int] = None,
+                 restart: bool = False) -> int:
+    """Stream the sheet into the database, resuming from a checkpoint if one exists"""
+    with app.app_context():
+        started = time.perf_counter()
+        checkpoint = SheetCheckpoint(path)
+        if restart:
+            checkpoint.clear()
+        start_offset = checkpoint.load()
+        if start_offset:
+            print(f"Resuming {path} after row {start_offset}...")
+        else:
+            print(f"Importing tasks from {path}...")
+
+        importer = TaskImporter(chunk_size=chunk_size, creator_username=creator_username, seed=seed,
+                                checkpoint=checkpoint)
+        for chunk in iter_sheet_chunks(path, chunk_size=chunk_size, start_offset=start_offset):
+            importer.import_chunk(chunk.frame, chunk.next_offset)
+            print(f"Imported {importer.imported} tasks (sheet row {chunk.next_offset})...")
+        checkpoint.clear()
+
+        elapsed = time.perf_counter() - started
+        rate = importer.imported / elapsed if elapsed > 0 else 0
+        print(f"\nCompleted! Imported {importer.imported} tasks with {len(importer.team_ids)} teams "
+              f"and {len(importer.user_ids)} users in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+        return importer.imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', nargs='?', default=DEFAULT_WORKBOOK, help='.xlsx or .csv task sheet')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--creator', help='username recorded as task creator (default: first administrator)')
+    parser.add_argument('--seed', type=int, help='seed for the random status and estimate assignment')
+    parser.add_argument('--restart', action='store_true', help='ignore any checkpoint and import from the first row')
+    args = parser.parse_args()
+    import_tasks(args.path, chunk_size=args.chunk_size, creator_username=args.creator, seed=args.seed,
+                 restart=args.restart)
@@ -0,0 +1,105 @@
+"""
+Fixtures shared by the test suite.
+
+app.py reads its configuration from the environment when it is first imported,
+so the database and attachment store are pointed at a temporary directory here,
+before any application module is imported. Every test starts from empty tables
+and an empty store.
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_TMP_DIR = tempfile.mkdtemp(prefix='taskflow-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ['ATTACHMENT_STORAGE_ROOT'] = os.path.join(_TMP_DIR, 'uploads')
+os.environ['SESSION_SECRET'] = 'test-secret'
+
+from sqlalchemy import inspect, text  # noqa: E402
+
+from app import app as flask_app, db  # noqa: E402
+from models import Task, Team, User  # noqa: E402
+from tag_resolver import invalidate_tag_cache  # noqa: E402
+
+PASSWORD = 'secret'
+
+
+def _clear_database():
+    db.session.remove()
+    with db.engine.begin() as connection:
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name != 'schema_migrations':
+                connection.execute(table.delete())
+        if inspect(connection).has_table('tasks_fts'):
+            connection.execute(text('DELETE FROM tasks_fts'))
+    invalidate_tag_cache()
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _remove_tmp_dir():
+    yield
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        yield flask_app
+        _clear_database()
+    shutil.rmtree(flask_app.config['ATTACHMENT_STORAGE_ROOT'], ignore_errors=True)
+
+
+@pytest.fixture
+def team(app):
+    team = Team(name='Credit Risk')
+    db.session.add(team)
+    db.session.commit()
+    return team
+
+
+@pytest.fixture
+def admin(app, team):
+    return _create_user('admin', team, role='director', is_administrator=True)
+
+
+@pytest.fixture
+def analyst(app, team):
+    return _create_user('analyst', team)
+
+
+def _create_user(username, team, role='analyst', is_administrator=False):
+    user = User(username=username, email=f'{username}@example.com', role=role, team_id=team.id,
+                is_administrator=is_administrator)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def task(app, team, admin):
+    task = Task(title='Review credit policy', status='todo', priority='medium', complexity='medium',
+                created_by=admin.id, team_id=team.id)
+    db.session.add(task)
+    db.session.commit()
+    return task
+
+
+@pytest.fixture
+def login_as(app):
+    """Log a user in on a new test client"""
+    def login(user):
+        client = app.test_client()
+        response = client.post('/login', data={'username': user.username, 'password': PASSWORD})
+        assert response.status_code == 302
+        return client
+    return login
+
+
+@pytest.fixture
+def client(login_as, admin):
+    """Test client logged in as the administrator"""
+    return login_as(admin)
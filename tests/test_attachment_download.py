@@ -0,0 +1,109 @@
+"""Attachment downloads: ETag revalidation, Range requests and proxy handoff"""
+import io
+import os
+
+from app import db
+from attachment_storage import get_storage
+from models import TaskAttachment
+
+BODY = bytes(range(256)) * 40
+
+
+def upload(client, task, data=BODY):
+    response = client.post(f'/upload_file/{task.id}', data={'file': (io.BytesIO(data), 'data.csv')},
+                           content_type='multipart/form-data')
+    return response.get_json()['attachment']
+
+
+def test_etag_is_the_content_hash_and_revalidates(client, task):
+    attachment = upload(client, task)
+    url = f"/download_file/{attachment['id']}"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == BODY
+    assert response.headers['ETag'] == f'"{attachment["content_hash"]}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+    response = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    response = client.get(url, headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+
+
+def test_range_requests_return_partial_content(client, task):
+    attachment = upload(client, task)
+    url = f"/download_file/{attachment['id']}"
+
+    response = client.get(url, headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == BODY[100:200]
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(BODY)}'
+
+    response = client.get(url, headers={'Range': 'bytes=-10'})
+    assert response.status_code == 206
+    assert response.data == BODY[-10:]
+
+
+def test_unsatisfiable_range(client, task):
+    attachment = upload(client, task)
+
+    response = client.get(f"/download_file/{attachment['id']}", headers={'Range': f'bytes={len(BODY)}-'})
+
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(BODY)}'
+
+
+def test_stale_if_range_sends_the_whole_file(client, task):
+    attachment = upload(client, task)
+
+    response = client.get(f"/download_file/{attachment['id']}",
+                          headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+
+    assert response.status_code == 200
+    assert response.data == BODY
+
+
+def test_legacy_file_etag_uses_size_and_mtime(client, task, admin):
+    store = get_storage()
+    os.makedirs(store.root, exist_ok=True)
+    with open(store.path('legacy.txt'), 'wb') as legacy:
+        legacy.write(b'legacy content')
+    attachment = TaskAttachment(task_id=task.id, filename='legacy.txt', original_filename='legacy.txt',
+                                file_size=14, file_type='text/plain', uploaded_by=admin.id)
+    db.session.add(attachment)
+    db.session.commit()
+    url = f'/download_file/{attachment.id}'
+
+    etag = client.get(url).headers['ETag']
+    stat = os.stat(store.path('legacy.txt'))
+    assert etag == f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_missing_file_is_not_served(client, task):
+    attachment = upload(client, task)
+    get_storage().delete(attachment['filename'])
+
+    response = client.get(f"/download_file/{attachment['id']}")
+
+    assert response.status_code == 302
+    assert client.get('/download_file/999999').status_code == 404
+
+
+def test_x_accel_hands_the_body_to_the_proxy(app, client, task, monkeypatch):
+    monkeypatch.setitem(app.config, 'ATTACHMENT_SENDFILE', 'x-accel')
+    attachment = upload(client, task)
+    url = f"/download_file/{attachment['id']}"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == f"/protected-attachments/{attachment['filename']}"
+    assert 'X-Sendfile' not in response.headers
+    assert response.data == b''
+
+    response = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert 'X-Accel-Redirect' not in response.headers
@@ -0,0 +1,121 @@
+"""Garbage collection of attachment rows, blobs and stored files"""
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+from app import db
+from attachment_gc import _delete_file_batch, _exclusive_sweep, collect_garbage
+from attachment_storage import get_storage
+from models import AttachmentBlob, Task, TaskAttachment
+
+GRACE = timedelta(hours=1)
+
+
+def upload(client, task, data, name='notes.txt'):
+    response = client.post(f'/upload_file/{task.id}', data={'file': (io.BytesIO(data), name)},
+                           content_type='multipart/form-data')
+    return response.get_json()['attachment']
+
+
+def age_store(hours=2):
+    """Make every stored file and blob row look older than the grace period"""
+    old = time.time() - hours * 3600
+    for directory, _, files in os.walk(get_storage().root):
+        for name in files:
+            os.utime(os.path.join(directory, name), (old, old))
+    AttachmentBlob.query.update({AttachmentBlob.created_at: datetime.utcnow() - timedelta(hours=hours)})
+    db.session.commit()
+
+
+def write_stray(key, data=b'stray'):
+    path = get_storage().path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as stray:
+        stray.write(data)
+    return path
+
+
+def test_sweep_removes_what_nothing_refers_to(client, task, admin):
+    doomed = Task(title='Doomed', created_by=admin.id, team_id=task.team_id)
+    db.session.add(doomed)
+    db.session.commit()
+    kept = upload(client, task, b'kept')
+    shared = upload(client, task, b'shared')
+    upload(client, doomed, b'shared')
+    orphan = upload(client, doomed, b'only on the doomed task')
+    stray = write_stray('stray.bin', b'x' * 100)
+    # A bulk delete leaves the doomed task's attachment rows behind
+    Task.query.filter_by(id=doomed.id).delete()
+    db.session.commit()
+    age_store()
+
+    assert collect_garbage(GRACE, dry_run=True)['attachments'] == 2
+    assert os.path.exists(stray)
+
+    result = collect_garbage(GRACE, batch_size=1)
+
+    assert (result['attachments'], result['blobs'], result['files']) == (2, 1, 2)
+    assert TaskAttachment.query.count() == 2
+    assert db.session.get(AttachmentBlob, shared['content_hash']).ref_count == 1
+    assert db.session.get(AttachmentBlob, orphan['content_hash']) is None
+    assert not get_storage().exists(orphan['filename'])
+    assert not os.path.exists(stray)
+    for attachment in (kept, shared):
+        assert client.get(f"/download_file/{attachment['id']}").status_code == 200
+
+    assert collect_garbage(GRACE)['files'] == 0
+
+
+def test_files_within_the_grace_period_are_kept(app):
+    stray = write_stray('stray.bin')
+
+    assert collect_garbage(GRACE)['files'] == 0
+    assert os.path.exists(stray)
+
+
+def test_batch_skips_files_touched_or_referenced_since_the_walk(client, task):
+    cutoff = time.time() - 3600
+    touched = write_stray('touched.bin')
+    claimed = upload(client, task, b'claimed')
+    stale = write_stray('stale.bin')
+    old = cutoff - 60
+    for path in (stale, get_storage().path(claimed['filename'])):
+        os.utime(path, (old, old))
+    batch = [(key, get_storage().path(key), 5) for key in ('touched.bin', claimed['filename'], 'stale.bin')]
+
+    assert _delete_file_batch(batch, cutoff) == (1, 5)
+    assert os.path.exists(touched)
+    assert get_storage().exists(claimed['filename'])
+    assert not os.path.exists(stale)
+
+
+def test_placing_content_again_restores_a_collected_file(app):
+    store = get_storage()
+    first = store.save(io.BytesIO(b'reused content'))
+    os.remove(store.path(first.key))
+
+    again = store.save(io.BytesIO(b'reused content'))
+
+    assert (again.key, again.created) == (first.key, True)
+    with store.open(again.key) as stored:
+        assert stored.read() == b'reused content'
+
+
+def test_placing_existing_content_restarts_its_grace_period(app):
+    store = get_storage()
+    stored = store.save(io.BytesIO(b'reused content'))
+    old = time.time() - 7200
+    os.utime(store.path(stored.key), (old, old))
+
+    assert store.save(io.BytesIO(b'reused content')).created is False
+    assert os.stat(store.path(stored.key)).st_mtime > time.time() - 60
+    assert collect_garbage(GRACE)['files'] == 0
+    assert store.exists(stored.key)
+
+
+def test_only_one_sweep_runs_at_a_time(app):
+    os.makedirs(get_storage().root, exist_ok=True)
+    with _exclusive_sweep() as acquired:
+        assert acquired
+        assert collect_garbage(GRACE) is None
@@ -0,0 +1,89 @@
+"""Content-addressed attachment storage and blob reference counting"""
+import hashlib
+import io
+import os
+
+import pytest
+
+from app import db
+from attachment_storage import FileTooLarge, LocalContentStore, get_storage
+from models import AttachmentBlob, TaskAttachment
+
+
+def upload(client, task, data, name='report.xlsx'):
+    return client.post(f'/upload_file/{task.id}', data={'file': (io.BytesIO(data), name)},
+                       content_type='multipart/form-data')
+
+
+def blob_files(root):
+    return [name for _, dirs, files in os.walk(root) for name in files
+            if not name.startswith('.') and not name.endswith('.part')]
+
+
+def test_identical_uploads_share_one_blob(client, task):
+    body = os.urandom(300000)
+    sha256 = hashlib.sha256(body).hexdigest()
+
+    first = upload(client, task, body).get_json()['attachment']
+    second = upload(client, task, body, 'copy.xlsx').get_json()['attachment']
+
+    assert first['filename'] == second['filename'] == LocalContentStore.key_for(sha256)
+    assert first['content_hash'] == sha256
+    assert db.session.get(AttachmentBlob, sha256).ref_count == 2
+    assert blob_files(get_storage().root) == [sha256]
+    with get_storage().open(first['filename']) as stored:
+        assert stored.read() == body
+
+
+def test_deleting_attachments_releases_the_blob(client, task):
+    body = b'quarterly figures'
+    sha256 = hashlib.sha256(body).hexdigest()
+    first = upload(client, task, body).get_json()['attachment']
+    second = upload(client, task, body).get_json()['attachment']
+
+    assert client.post(f"/delete_file/{first['id']}").status_code == 200
+    assert db.session.get(AttachmentBlob, sha256).ref_count == 1
+
+    assert client.post(f"/delete_file/{second['id']}").status_code == 200
+    assert db.session.get(AttachmentBlob, sha256) is None
+    assert TaskAttachment.query.count() == 0
+    # The file itself is left for attachment_gc
+    assert get_storage().exists(first['filename'])
+
+
+def test_oversized_upload_is_rejected_without_leftovers(client, task, monkeypatch):
+    monkeypatch.setattr('routes.MAX_FILE_SIZE', 1000)
+
+    response = upload(client, task, b'x' * 1001)
+
+    assert response.status_code == 400
+    assert 'too large' in response.get_json()['error']
+    assert AttachmentBlob.query.count() == 0
+    assert TaskAttachment.query.count() == 0
+    assert os.listdir(get_storage().temp_dir()) == []
+
+
+def test_disallowed_file_type_is_rejected(client, task):
+    response = upload(client, task, b'MZ', 'setup.exe')
+
+    assert response.status_code == 400
+    assert AttachmentBlob.query.count() == 0
+
+
+def test_save_stops_at_the_size_limit(tmp_path):
+    store = LocalContentStore(str(tmp_path))
+
+    with pytest.raises(FileTooLarge):
+        store.save(io.BytesIO(b'x' * 11), max_size=10)
+
+    assert os.listdir(store.temp_dir()) == []
+    stored = store.save(io.BytesIO(b'x' * 10), max_size=10)
+    assert (stored.size, stored.created) == (10, True)
+    assert store.save(io.BytesIO(b'x' * 10)).created is False
+
+
+def test_keys_cannot_leave_the_storage_root(tmp_path):
+    store = LocalContentStore(str(tmp_path))
+
+    with pytest.raises(ValueError):
+        store.path('../outside.txt')
@@ -0,0 +1,121 @@
+"""Resumable chunked uploads: offsets, conflicts and finalizing"""
+import hashlib
+import os
+
+import pytest
+
+from app import db
+from chunked_upload import part_path
+from models import AttachmentBlob, TaskAttachment, UploadSession
+
+BODY = os.urandom(5000)
+
+
+def start(client, task, filename='export.csv', size=len(BODY)):
+    return client.post(f'/api/task/{task.id}/uploads',
+                       json={'filename': filename, 'size': size, 'content_type': 'text/csv'})
+
+
+@pytest.fixture
+def upload_id(client, task):
+    response = start(client, task)
+    assert response.status_code == 201
+    return response.get_json()['upload']['upload_id']
+
+
+def put(client, upload_id, offset, data):
+    return client.put(f'/api/uploads/{upload_id}?offset={offset}', data=data)
+
+
+def test_chunks_are_appended_and_finalized(client, upload_id):
+    assert put(client, upload_id, 0, BODY[:2000]).get_json()['offset'] == 2000
+    state = client.get(f'/api/uploads/{upload_id}').get_json()['upload']
+    assert (state['offset'], state['complete']) == (2000, False)
+
+    response = put(client, upload_id, 2000, BODY[2000:])
+    assert response.get_json() == {'success': True, 'offset': len(BODY), 'complete': True}
+
+    response = client.post(f'/api/uploads/{upload_id}/finalize')
+    assert response.status_code == 200
+    attachment = response.get_json()['attachment']
+    assert attachment['content_hash'] == hashlib.sha256(BODY).hexdigest()
+    assert (attachment['file_size'], attachment['original_filename']) == (len(BODY), 'export.csv')
+    assert db.session.get(AttachmentBlob, attachment['content_hash']).ref_count == 1
+    assert not os.path.exists(part_path(upload_id))
+    assert client.get(f"/download_file/{attachment['id']}").data == BODY
+
+    assert client.post(f'/api/uploads/{upload_id}/finalize').status_code == 404
+
+
+def test_wrong_offset_is_a_conflict(client, upload_id):
+    put(client, upload_id, 0, BODY[:2000])
+
+    # A retried chunk the server already acknowledged
+    response = put(client, upload_id, 0, BODY[:2000])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 2000
+
+    response = put(client, upload_id, 3000, BODY[3000:])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 2000
+
+    assert put(client, upload_id, 2000, BODY[2000:]).status_code == 200
+
+
+def test_offset_is_required(client, upload_id):
+    assert client.put(f'/api/uploads/{upload_id}', data=BODY).status_code == 400
+
+
+def test_chunk_past_the_declared_size_is_rejected(client, upload_id):
+    put(client, upload_id, 0, BODY[:2000])
+
+    response = put(client, upload_id, 2000, BODY[2000:] + b'extra')
+
+    assert response.status_code == 400
+    assert response.get_json()['offset'] == 2000
+    assert os.path.getsize(part_path(upload_id)) == 2000
+
+
+def test_incomplete_upload_cannot_be_finalized(client, upload_id):
+    put(client, upload_id, 0, BODY[:2000])
+
+    response = client.post(f'/api/uploads/{upload_id}/finalize')
+
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 2000
+    assert TaskAttachment.query.count() == 0
+
+
+def test_failed_finalize_ends_the_session(client, upload_id, monkeypatch):
+    put(client, upload_id, 0, BODY)
+
+    def fail(stored):
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr('chunked_upload.add_blob_reference', fail)
+
+    assert client.post(f'/api/uploads/{upload_id}/finalize').status_code == 500
+    assert db.session.get(UploadSession, upload_id) is None
+    assert TaskAttachment.query.count() == 0
+    assert client.post(f'/api/uploads/{upload_id}/finalize').status_code == 404
+
+
+def test_abort_discards_the_upload(client, upload_id):
+    put(client, upload_id, 0, BODY[:2000])
+
+    assert client.delete(f'/api/uploads/{upload_id}').status_code == 200
+    assert not os.path.exists(part_path(upload_id))
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+
+
+def test_start_rejects_bad_files(client, task):
+    assert start(client, task, filename='setup.exe').status_code == 400
+    assert start(client, task, size=0).status_code == 400
+    assert start(client, task, size=2 ** 40).status_code == 400
+    assert UploadSession.query.count() == 0
+
+
+def test_sessions_belong_to_their_uploader(upload_id, analyst, login_as):
+    other = login_as(analyst)
+
+    assert other.get(f'/api/uploads/{upload_id}').status_code == 404
+    assert put(other, upload_id, 0, BODY).status_code == 404
@@ -0,0 +1,147 @@
+"""The migration runner, against a database created before the models grew new columns"""
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import Column, MetaData, Table, inspect
+
+from app import db
+from models import Tag, Task, TimeLogDaily
+from schema_migrations import (MIGRATIONS, AddColumn, applied_versions, migration_statements,
+                               pending_migrations, run_migrations)
+from search_index import detect_search_backend
+from tag_resolver import invalidate_tag_cache
+
+# Columns the models gained after the database was first created
+LEGACY_DROPPED = {
+    'tasks': {'total_time_logged', 'subtask_total', 'subtask_completed'},
+    'tags': {'name_key', 'usage_count'},
+    'task_attachments': {'content_hash'},
+}
+ALL_VERSIONS = {migration.version for migration in MIGRATIONS}
+
+
+def legacy_table(table, metadata):
+    columns = [Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                      unique=column.unique)
+               for column in table.columns if column.name not in LEGACY_DROPPED[table.name]]
+    return Table(table.name, metadata, *columns)
+
+
+def index_names(table):
+    return {index['name'] for index in inspect(db.engine).get_indexes(table)}
+
+
+def column_names(table):
+    return {column['name'] for column in inspect(db.engine).get_columns(table)}
+
+
+@pytest.fixture
+def legacy_db(app, tmp_path):
+    """App context on a separate database with the old tasks, tags and task_attachments tables"""
+    legacy_app = Flask(__name__)
+    legacy_app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'legacy.db'}",
+                             SQLALCHEMY_TRACK_MODIFICATIONS=False)
+    db.init_app(legacy_app)
+    with legacy_app.app_context():
+        metadata = MetaData()
+        legacy = {name: legacy_table(db.metadata.tables[name], metadata) for name in LEGACY_DROPPED}
+        metadata.create_all(db.engine)
+        db.create_all()
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("CREATE INDEX idx_task_team ON tasks (team_id)")
+            _insert_legacy_rows(connection, legacy)
+        invalidate_tag_cache()
+        yield legacy
+        db.session.remove()
+        invalidate_tag_cache()
+    # The search backend is per process; point it back at the test database
+    detect_search_backend()
+
+
+def _insert_legacy_rows(connection, legacy):
+    now = datetime.utcnow()
+    connection.execute(db.metadata.tables['teams'].insert(), [{'id': 1, 'name': 'Credit Risk', 'is_active': True,
+                                                               'created_at': now}])
+    connection.execute(db.metadata.tables['users'].insert(), [{
+        'id': 1, 'username': 'admin', 'email': 'admin@example.com', 'password_hash': 'x', 'role': 'director',
+        'is_administrator': True, 'is_active': True, 'created_at': now, 'team_id': 1}])
+    task = {'status': 'todo', 'priority': 'medium', 'complexity': 'medium', 'created_at': now, 'updated_at': now,
+            'created_by': 1, 'team_id': 1, 'actual_hours': 2.0, 'parent_task_id': None}
+    connection.execute(legacy['tasks'].insert(), [
+        dict(task, id=1, title='Parent review'),
+        dict(task, id=2, title='Step one', parent_task_id=1),
+        dict(task, id=3, title='Step two', parent_task_id=1, status='completed'),
+    ])
+    connection.execute(legacy['tags'].insert(), [
+        {'id': 1, 'name': 'Urgent', 'created_at': now},
+        {'id': 2, 'name': 'urgent', 'created_at': now},
+        {'id': 3, 'name': 'Backend', 'created_at': now},
+    ])
+    connection.execute(db.metadata.tables['task_tags'].insert(), [
+        {'task_id': 1, 'tag_id': 1}, {'task_id': 1, 'tag_id': 3}, {'task_id': 2, 'tag_id': 2},
+    ])
+    connection.execute(db.metadata.tables['time_logs'].insert(), [
+        {'task_id': 1, 'user_id': 1, 'start_time': now - timedelta(hours=3), 'end_time': now - timedelta(hours=1),
+         'duration_hours': 2.0, 'created_at': now},
+        # Still running: counted nowhere
+        {'task_id': 1, 'user_id': 1, 'start_time': now - timedelta(minutes=30), 'end_time': None,
+         'duration_hours': None, 'created_at': now},
+    ])
+
+
+def test_fresh_database_is_stamped(app):
+    assert applied_versions() == ALL_VERSIONS
+    assert pending_migrations() == []
+
+
+def test_migrations_bring_a_legacy_database_up_to_date(legacy_db):
+    assert [migration.version for migration in pending_migrations()] == sorted(ALL_VERSIONS)
+    statements = migration_statements(MIGRATIONS[1])
+    assert 'ALTER TABLE tasks ADD COLUMN total_time_logged FLOAT NOT NULL DEFAULT 0' in statements
+    assert statements[-1].startswith('-- backfill:')
+
+    applied = run_migrations()
+
+    assert [migration.version for migration in applied] == sorted(ALL_VERSIONS)
+    assert applied_versions() == ALL_VERSIONS
+    for table, columns in LEGACY_DROPPED.items():
+        assert columns <= column_names(table)
+    assert 'idx_task_team_status' in index_names('tasks')
+    assert 'idx_task_team' not in index_names('tasks')
+    assert 'idx_tags_name_key' in index_names('tags')
+
+    parent = db.session.get(Task, 1)
+    assert (parent.total_time_logged, parent.subtask_total, parent.subtask_completed) == (2.0, 2, 1)
+    assert {tag.name_key: tag.usage_count for tag in Tag.query} == {'urgent': 2, 'backend': 1}
+    assert db.session.query(db.func.sum(TimeLogDaily.hours)).scalar() == 2.0
+
+    assert run_migrations() == []
+
+
+def test_failed_migration_is_not_recorded_and_reruns(legacy_db, monkeypatch):
+    rollups = MIGRATIONS[1]
+    backfill = rollups.steps[-1]
+
+    def fail():
+        raise RuntimeError('backfill failed')
+    monkeypatch.setattr(backfill, 'function', fail)
+
+    with pytest.raises(RuntimeError):
+        run_migrations()
+
+    # The columns went in, but the version stays pending
+    assert applied_versions() == {1}
+    assert LEGACY_DROPPED['tasks'] <= column_names('tasks')
+    assert migration_statements(rollups) == [backfill.statements(None)[0]]
+
+    monkeypatch.undo()
+    assert [migration.version for migration in run_migrations()] == sorted(ALL_VERSIONS - {1})
+    assert db.session.get(Task, 1).subtask_total == 2
+
+
+def test_add_column_skips_existing_columns(app):
+    with db.engine.connect() as connection:
+        assert AddColumn('tasks', 'subtask_total', 'INTEGER').statements(connection) == []
+        assert AddColumn('tasks', 'archived', 'BOOLEAN').statements(connection) == [
+            'ALTER TABLE tasks ADD COLUMN archived BOOLEAN']
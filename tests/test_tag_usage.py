@@ -0,0 +1,87 @@
+"""Tag usage counters maintained as task tags change"""
+from app import db
+from data_manager import data_manager
+from models import Tag, Task, Team, task_tags
+
+
+def usage():
+    db.session.expire_all()
+    return {tag.name: tag.usage_count for tag in Tag.query}
+
+
+def recounted():
+    """usage_count as rebuilt from task_tags"""
+    rows = db.session.query(Tag.name, db.func.count(task_tags.c.task_id)).outerjoin(
+        task_tags, task_tags.c.tag_id == Tag.id
+    ).group_by(Tag.id, Tag.name)
+    return dict(rows.all())
+
+
+def test_counters_follow_task_tag_changes(admin):
+    first = data_manager.create_task('First', '', str(admin.id), tags=['Audit', 'Q3'])
+    second = data_manager.create_task('Second', '', str(admin.id), tags=['audit', 'AUDIT'])
+    assert usage() == {'Audit': 2, 'Q3': 1}
+
+    data_manager.update_task(str(first.id), tags=['Q3', 'Fraud'])
+    assert usage() == {'Audit': 1, 'Q3': 1, 'Fraud': 1}
+
+    data_manager.update_task(str(first.id), tags=[])
+    data_manager.delete_task(str(second.id))
+    assert usage() == {'Audit': 0, 'Q3': 0, 'Fraud': 0}
+    assert usage() == recounted()
+
+
+def test_counters_never_go_below_zero(admin):
+    data_manager.create_task('Task', '', str(admin.id), tags=['Audit'])
+    tag = Tag.query.filter_by(name='Audit').one()
+
+    data_manager._adjust_tag_usage([tag.id], -1)
+    data_manager._adjust_tag_usage([tag.id], -1)
+    db.session.commit()
+
+    assert usage() == {'Audit': 0}
+
+
+def test_deleting_a_team_releases_its_tasks_tags(client, admin):
+    team = Team(name='Closed Desk')
+    db.session.add(team)
+    db.session.commit()
+    kept = data_manager.create_task('Kept', '', str(admin.id), tags=['Audit'])
+    for title in ('Gone 1', 'Gone 2'):
+        task = data_manager.create_task(title, '', str(admin.id), tags=['Audit', 'Desk'])
+        task.team_id = team.id
+    db.session.commit()
+    assert usage() == {'Audit': 3, 'Desk': 2}
+
+    assert client.post(f'/delete_team/{team.id}').status_code == 302
+
+    assert Task.query.count() == 1
+    assert usage() == {'Audit': 1, 'Desk': 0}
+    assert usage() == recounted()
+    assert [tag.name for tag in db.session.get(Task, kept.id).tags] == ['Audit']
+
+
+def test_rebuild_recounts_every_tag(admin):
+    data_manager.create_task('First', '', str(admin.id), tags=['Audit', 'Q3'])
+    data_manager.create_task('Second', '', str(admin.id), tags=['Audit'])
+    Tag.query.update({Tag.usage_count: 7})
+    db.session.commit()
+
+    data_manager.rebuild_tag_usage_counts()
+
+    assert usage() == {'Audit': 2, 'Q3': 1}
+
+
+def test_tag_api_reads_the_counters(client, admin):
+    data_manager.create_task('First', '', str(admin.id), tags=['Audit', 'Q3'])
+    data_manager.create_task('Second', '', str(admin.id), tags=['Audit', 'Unused'])
+    data_manager.update_task(str(Task.query.filter_by(title='Second').one().id), tags=['Audit'])
+
+    tags = client.get('/api/tags').get_json()['tags']
+    assert [(tag['name'], tag['usage_count']) for tag in tags] == [('Audit', 2), ('Q3', 1)]
+
+    audit = Tag.query.filter_by(name='Audit').one()
+    response = client.get(f'/api/tags/{audit.id}/tasks').get_json()
+    assert (response['total'], [task['title'] for task in response['tasks']]) == (2, ['Second', 'First'])
+
+    assert client.get('/api/tags/999999/tasks').status_code == 404
@@ -0,0 +1,90 @@
+"""Maintained task rollups: logged time and subtask counters"""
+from datetime import timedelta
+
+import pytest
+
+from app import db
+from data_manager import data_manager
+from models import Task, TimeLog
+
+
+def log_hours(task, user, hours):
+    """Start and stop a timer on task that ran for the given number of hours"""
+    time_log = data_manager.start_time_tracking(str(task.id), str(user.id))
+    time_log.start_time -= timedelta(hours=hours)
+    db.session.commit()
+    return data_manager.stop_time_tracking(str(time_log.id))
+
+
+def reload(task):
+    db.session.expire_all()
+    return db.session.get(Task, task.id)
+
+
+def test_subtask_counters_follow_create_complete_and_delete(task, admin):
+    subtasks = [data_manager.create_subtask(task, f'Step {i}', '', str(admin.id)) for i in range(4)]
+    data_manager.update_subtask(subtasks[0], str(admin.id), status='completed')
+    data_manager.update_task(str(subtasks[1].id), status='completed')
+    data_manager.update_task(str(subtasks[1].id), status='in_progress')
+    data_manager.update_task(str(subtasks[2].id), status='completed')
+
+    task = reload(task)
+    assert (task.subtask_total, task.subtask_completed) == (4, 2)
+
+    data_manager.delete_task(str(subtasks[2].id))
+    data_manager.delete_task(str(subtasks[3].id))
+    task = reload(task)
+    assert (task.subtask_total, task.subtask_completed) == (2, 1)
+
+
+def test_subtask_counters_never_go_below_zero(task):
+    data_manager._adjust_subtask_counts(task.id, total=-1, completed=-1)
+    db.session.commit()
+
+    task = reload(task)
+    assert (task.subtask_total, task.subtask_completed) == (0, 0)
+
+
+def test_stopped_timers_add_to_the_task(task, admin, analyst):
+    log_hours(task, admin, 2)
+    log_hours(task, analyst, 1)
+
+    task = reload(task)
+    assert task.total_time_logged == pytest.approx(3, abs=0.01)
+    assert task.actual_hours == pytest.approx(3, abs=0.01)
+
+
+def test_stopping_a_stopped_timer_adds_nothing(task, admin):
+    time_log = log_hours(task, admin, 2)
+    data_manager.stop_time_tracking(str(time_log.id))
+
+    assert reload(task).total_time_logged == pytest.approx(2, abs=0.01)
+
+
+def test_deleting_a_user_releases_their_hours(app, task, admin, analyst, client):
+    log_hours(task, admin, 2)
+    log_hours(task, analyst, 1)
+
+    response = client.post(f'/delete_user/{analyst.id}')
+
+    assert response.status_code == 302
+    assert TimeLog.query.filter_by(user_id=analyst.id).count() == 0
+    task = reload(task)
+    assert task.total_time_logged == pytest.approx(2, abs=0.01)
+    assert task.actual_hours == pytest.approx(2, abs=0.01)
+
+
+def test_rebuild_matches_maintained_rollups(task, admin):
+    subtask = data_manager.create_subtask(task, 'Step', '', str(admin.id))
+    data_manager.complete_task_with_time(str(subtask.id))
+    log_hours(task, admin, 2)
+    maintained = reload(task)
+    expected = (maintained.total_time_logged, maintained.subtask_total, maintained.subtask_completed)
+
+    Task.query.update({Task.total_time_logged: 0, Task.subtask_total: 0, Task.subtask_completed: 0})
+    db.session.commit()
+    data_manager.rebuild_task_rollups()
+
+    rebuilt = reload(task)
+    assert rebuilt.total_time_logged == pytest.approx(expected[0])
+    assert (rebuilt.subtask_total, rebuilt.subtask_completed) == expected[1:]
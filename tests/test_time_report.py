@@ -0,0 +1,89 @@
+"""Time report totals from the time_log_daily rollup"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from data_manager import data_manager
+from models import Task, Team, TimeLogDaily
+
+
+def log_hours(task, user, hours, days_ago=0):
+    """A closed time log of the given length that started days_ago days back"""
+    time_log = data_manager.start_time_tracking(str(task.id), str(user.id))
+    time_log.start_time = datetime.utcnow() - timedelta(days=days_ago, hours=hours)
+    db.session.commit()
+    return data_manager.stop_time_tracking(str(time_log.id))
+
+
+def report(team_id='', days=7):
+    end_date = datetime.utcnow()
+    return data_manager.get_time_report_data(team_id, end_date - timedelta(days=days), end_date)
+
+
+def test_totals_match_the_detail_list(task, admin, analyst):
+    log_hours(task, admin, 2)
+    log_hours(task, analyst, 1)
+    log_hours(task, admin, 3, days_ago=20)  # outside the report range
+
+    data = report()
+
+    assert data['total_hours'] == pytest.approx(3, abs=0.01)
+    assert (data['total_tasks'], data['total_users']) == (1, 2)
+    assert data['user_stats'][admin.id]['total_hours'] == pytest.approx(2, abs=0.01)
+    assert data['time_logs'].total == 2
+    assert sum(log.duration_hours for log in data['time_logs'].items) == pytest.approx(data['total_hours'])
+    assert sum(data['daily_data']['hours']) == pytest.approx(data['total_hours'])
+    assert data['team_data']['names'] == ['Credit Risk']
+
+
+def test_running_timers_are_left_out(task, admin, analyst):
+    log_hours(task, admin, 2)
+    data_manager.start_time_tracking(str(task.id), str(analyst.id))
+
+    data = report()
+
+    assert data['total_hours'] == pytest.approx(2, abs=0.01)
+    assert data['total_users'] == 1
+    assert data['time_logs'].total == 1
+
+
+def test_team_filter(task, admin):
+    other_team = Team(name='Market Risk')
+    db.session.add(other_team)
+    db.session.flush()
+    other_task = Task(title='Stress test', created_by=admin.id, team_id=other_team.id)
+    db.session.add(other_task)
+    db.session.commit()
+    log_hours(task, admin, 2)
+    log_hours(other_task, admin, 1)
+
+    data = report(str(other_team.id))
+
+    assert data['total_hours'] == pytest.approx(1, abs=0.01)
+    assert [log.task_id for log in data['time_logs'].items] == [other_task.id]
+
+
+def test_rebuild_matches_maintained_buckets(task, admin, analyst):
+    log_hours(task, admin, 2)
+    log_hours(task, admin, 1)
+    log_hours(task, analyst, 1, days_ago=3)
+    maintained = report()['total_hours']
+
+    TimeLogDaily.query.delete()
+    db.session.commit()
+    assert report()['total_hours'] == 0
+
+    data_manager.rebuild_time_log_daily()
+
+    assert report()['total_hours'] == pytest.approx(maintained)
+    assert db.session.query(db.func.sum(TimeLogDaily.log_count)).scalar() == 3
+
+
+def test_report_page_ignores_invalid_dates(task, admin, client):
+    log_hours(task, admin, 2)
+
+    response = client.get('/time/report?start_date=yesterday&end_date=2024-13-45')
+
+    assert response.status_code == 200
+    assert b'2.0' in response.data